@@ -0,0 +1,168 @@
+__doc__ = """
+Headless batch runner for WGUPS simulations.
+
+Reads a CSV of scenarios and runs each one in its own Simulation across a
+process pool, writing one summary row per run.
+
+Scenario columns (blank cells use the defaults):
+    name, start, end, trucks, drivers, speed, package_file, distance_file,
+    planner (greedy, insertion, multistart or cluster), max_weight (kilos
+    per truck), max_volume (litres per truck)
+
+usage: python batch.py scenarios.csv [-o summary.csv] [-w workers]
+                       [--cache-dir DIR] [--profile-dir DIR]
+"""
+
+from simulation import Simulation
+
+import argparse
+import csv
+import sys
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+SUMMARY_FIELDS = [
+    "name",
+    "mileage",
+    "delivered",
+    "on_time",
+    "late_packages",
+    "wall_time",
+    "error",
+]
+
+
+def parse_time(value: str, default: str) -> datetime:
+    """Parses an HH:MM AM/PM time onto today's date"""
+
+    value = (value or "").strip() or default
+    parsed = datetime.strptime(value.lower(), "%I:%M %p").time()
+    return datetime.combine(date.today(), parsed)
+
+
+def load_scenarios(path: Path) -> Iterator[Dict]:
+    """Loads the CSV file of scenarios to run."""
+
+    with open(path, newline="", encoding="utf-8") as scenario_data:
+        for idx, row in enumerate(csv.DictReader(scenario_data), start=1):
+            yield {
+                "name": (row.get("name") or "").strip() or f"scenario-{idx}",
+                "start": parse_time(row.get("start"), "08:00 AM"),
+                "end": parse_time(row.get("end"), "11:59 PM"),
+                "trucks": int(row.get("trucks") or 2),
+                "drivers": int(row["drivers"]) if row.get("drivers") else None,
+                "speed": int(row.get("speed") or 18),
+                "package_file": (row.get("package_file") or "").strip()
+                or None,
+                "distance_file": (row.get("distance_file") or "").strip()
+                or None,
+                "planner": (row.get("planner") or "").strip() or "greedy",
+                "max_weight": float(row["max_weight"])
+                if row.get("max_weight")
+                else None,
+                "max_volume": float(row["max_volume"])
+                if row.get("max_volume")
+                else None,
+            }
+
+
+def run_scenario(scenario: Dict) -> Dict:
+    """
+    Runs a single scenario in a fresh Simulation, meant to be called in a
+    worker process.
+    """
+
+    started = clock.perf_counter()
+    row = {"name": scenario["name"]}
+
+    try:
+        simulation = Simulation()
+        simulation.initialize(
+            simulation_start=scenario["start"],
+            simulation_end=scenario["end"],
+            truck_count=scenario["trucks"],
+            driver_count=scenario["drivers"],
+            truck_speed=scenario["speed"],
+            truck_weight_limit=scenario.get("max_weight"),
+            truck_volume_limit=scenario.get("max_volume"),
+            package_path=scenario["package_file"],
+            distance_path=scenario["distance_file"],
+            cache_dir=scenario.get("cache_dir"),
+            planner=scenario.get("planner", "greedy"),
+            profile_dir=scenario.get("profile_dir"),
+            profile_name=scenario["name"],
+            # only the summary is kept, skip building the event log
+            log_sinks=[],
+        )
+        simulation.run_simulation(print_events=False)
+
+        summary = simulation.summary()
+        summary["late_packages"] = " ".join(
+            str(package_id) for package_id in summary["late_packages"]
+        )
+        row.update(summary)
+    except Exception as error:  # a bad scenario should not stop the batch
+        row["error"] = f"{type(error).__name__}: {error}"
+
+    row["wall_time"] = round(clock.perf_counter() - started, 4)
+    return row
+
+
+def run_batch(
+    scenarios: List[Dict], workers: Optional[int] = None
+) -> Iterator[Dict]:
+    """Runs every scenario across a process pool, yielding rows in order"""
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(run_scenario, scenarios)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the batch runner"""
+
+    parser = argparse.ArgumentParser(description="Run WGUPS scenarios.")
+    parser.add_argument("scenarios", type=Path, help="scenario CSV file")
+    parser.add_argument(
+        "-o", "--output", type=Path, help="summary CSV (default: stdout)"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, help="worker processes (default: cores)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="compiled data cache shared by the workers",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        help="write a <name>.json and <name>.folded profile per scenario",
+    )
+    args = parser.parse_args(argv)
+
+    scenarios = list(load_scenarios(args.scenarios))
+    for scenario in scenarios:
+        scenario["cache_dir"] = args.cache_dir
+        scenario["profile_dir"] = args.profile_dir
+
+    output = (
+        open(args.output, "w", newline="", encoding="utf-8")
+        if args.output
+        else sys.stdout
+    )
+    try:
+        writer = csv.DictWriter(output, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for row in run_batch(scenarios, args.workers):
+            writer.writerow(row)
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
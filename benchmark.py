@@ -0,0 +1,206 @@
+__doc__ = """
+Benchmark suite for the WGUPS simulation.
+
+Generates seeded synthetic data sets at several sizes and times each stage
+(parse, graph build, shortest path, multi-target search, initialize,
+loading, routing, reporting, route gaps), recording peak traced memory
+per stage. The route gap stage measures every trip against the optimal
+tour of its stops, or a lower bound on it, so a change to routing or
+loading shows its quality next to its time. Results are written to a
+JSON file so runs can be compared between versions.
+
+usage: python benchmark.py [--sizes 40 1000 ...] [--planner NAME]
+                           [-o results.json]
+"""
+
+from data.data import parse_package_data, parse_distance_data
+from data.generator import generate
+from classes import Hashtable, Graph
+from dijkstas_sp import RoadNetwork, distances_to, shortest_path
+from optimality import gap_report, summarize
+from simulation import PLANNERS, Simulation
+
+import argparse
+import json
+import platform
+import tempfile
+import time as clock
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+DEFAULT_SIZES = [40, 1000, 10000, 100000]
+
+
+def instance_shape(packages: int) -> Dict[str, int]:
+    """Number of locations and trucks used for a package count"""
+
+    return {
+        "packages": packages,
+        "locations": min(max(27, packages // 20), 1000),
+        "trucks": max(2, min(100, packages // 100)),
+    }
+
+
+@contextmanager
+def stage(results: Dict, name: str, trace_memory: bool) -> Iterator[None]:
+    """Times a block and records its peak traced memory"""
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+    started = clock.perf_counter()
+    try:
+        yield
+    finally:
+        results[name] = {"seconds": round(clock.perf_counter() - started, 6)}
+        if trace_memory:
+            results[name]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+
+
+def run_size(
+    shape: Dict[str, int],
+    data_dir: Path,
+    seed: int,
+    trace_memory: bool,
+    progress: Callable[[str], None] = print,
+    planner: str = "greedy",
+) -> Dict:
+    """Runs every stage for one instance size"""
+
+    package_path, distance_path = generate(
+        shape["locations"], shape["packages"], data_dir, seed
+    )
+    stages: Dict = {}
+
+    with stage(stages, "parse", trace_memory):
+        parse_package_data(Hashtable(), package_path)
+
+    with stage(stages, "graph_build", trace_memory):
+        graph = Graph()
+        parse_distance_data(graph, distance_path)
+        graph.distance_matrix()
+
+    with stage(stages, "shortest_path", trace_memory):
+        shortest_path(graph.get_node(address="HUB"), graph)
+
+    with stage(stages, "multi_target", trace_memory):
+        # a truck's worth of stops, as a bounded search from the hub
+        network = RoadNetwork.from_graph(graph)
+        distances_to(
+            network,
+            network.node_ids[graph.get_node(address="HUB")],
+            range(1, min(17, network.size)),
+        )
+
+    simulation = Simulation()
+    with stage(stages, "initialize", trace_memory):
+        simulation.initialize(
+            simulation_start=datetime(2025, 8, 24, 8),
+            simulation_end=datetime(2025, 8, 24, 23, 59),
+            truck_count=shape["trucks"],
+            package_path=package_path,
+            distance_path=distance_path,
+            planner=planner,
+        )
+
+    with stage(stages, "loading", trace_memory):
+        simulation.start_day()
+
+    with stage(stages, "routing", trace_memory):
+        simulation.run_events()
+
+    with stage(stages, "reporting", trace_memory):
+        simulation.final_report(print_events=False)
+        summary = simulation.summary()
+
+    with stage(stages, "route_gap", trace_memory):
+        summary["route_gap"] = summarize(
+            gap_report(simulation.driven_routes(), simulation.distances)
+        )
+
+    summary["late_packages"] = len(summary["late_packages"])
+    progress(
+        f"{shape['packages']} packages: "
+        + ", ".join(
+            f"{name} {result['seconds']:.3f}s"
+            for name, result in stages.items()
+        )
+        + f", gap {summary['route_gap']['gap']:.1%}"
+    )
+
+    return {**shape, "stages": stages, "summary": summary}
+
+
+def run_benchmarks(
+    sizes: List[int],
+    seed: int = 0,
+    trace_memory: bool = True,
+    data_dir: Optional[Path] = None,
+    planner: str = "greedy",
+) -> Dict:
+    """Runs the benchmark at each size and returns the JSON-ready results"""
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "seed": seed,
+        "planner": planner,
+        "trace_memory": trace_memory,
+        "runs": [],
+    }
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for packages in sizes:
+                results["runs"].append(
+                    run_size(
+                        instance_shape(packages),
+                        Path(data_dir or temp_dir),
+                        seed,
+                        trace_memory,
+                        planner=planner,
+                    )
+                )
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the benchmark suite"""
+
+    parser = argparse.ArgumentParser(description="Benchmark WGUPS stages.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--planner", choices=PLANNERS, default="greedy")
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip tracemalloc, which slows every stage down",
+    )
+    parser.add_argument(
+        "--data-dir", type=Path, help="keep generated CSVs here"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("benchmark_results.json")
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.sizes, args.seed, not args.no_memory, args.data_dir, args.planner
+    )
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(results, output, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,60 @@
 from .hashtable import Hashtable
 from .graph import Graph, Weight, Node
-from .package import Package
+from .distance_matrix import DistanceMatrix
+from .clock import SimClock
+from .package import Package, PackageStatus
+from .package_store import PackageStore
 from .truck import Truck
-from .simulation_manager import SimulationManager
+from .loading import LoadingQueue, TripQueue
+from .simulation_manager import SimulationManager, Event
+from .event_log import (
+    EventLog,
+    LogLevel,
+    LogRecord,
+    MemorySink,
+    StreamSink,
+    JsonlSink,
+)
+from .stop_index import StopIndex
+from .timeline import PackageTimeline, PackageState
+from .changes import PackageChange, RoadChange, ReplanReport
+from .checkpoint import Checkpoint
+from .profiler import Profiler, PhaseStats, PROFILER, phase, profiled
+from .fleet import Fleet, HubDispatcher
 
 __all__ = [
     "Hashtable",
     "Graph",
+    "SimClock",
     "Package",
+    "PackageStatus",
+    "PackageStore",
     "Truck",
+    "LoadingQueue",
+    "TripQueue",
     "SimulationManager",
+    "Event",
+    "EventLog",
+    "LogLevel",
+    "LogRecord",
+    "MemorySink",
+    "StreamSink",
+    "JsonlSink",
+    "StopIndex",
+    "PackageTimeline",
+    "PackageState",
+    "PackageChange",
+    "RoadChange",
+    "ReplanReport",
+    "Checkpoint",
+    "Profiler",
+    "PhaseStats",
+    "PROFILER",
+    "phase",
+    "profiled",
+    "Fleet",
+    "HubDispatcher",
     "Weight",
     "Node",
+    "DistanceMatrix",
 ]
@@ -0,0 +1,86 @@
+from .package import Package
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional
+
+# every kind of change the simulation knows how to apply
+CHANGE_KINDS = ("address", "new", "cancel", "delay")
+# the field a kind of change cannot do without
+REQUIRED_FIELDS = {
+    "address": "address",
+    "new": "package",
+    "delay": "available_at",
+}
+ADDRESS_KEYS = frozenset(("address", "city", "zip"))
+
+
+@dataclass
+class PackageChange:
+    """
+    A correction to package data that arrives while trucks are out. Only
+    the fields for its kind are set:
+
+    address: new address, city and zip in address
+    new: the package to add in package
+    cancel: nothing beyond package_id
+    delay: the time the package reaches the hub in available_at
+    """
+
+    time: datetime
+    kind: str
+    package_id: int
+    address: Dict[str, str] = field(default_factory=dict)
+    package: Optional[Package] = None
+    available_at: Optional[datetime] = None
+
+    def __post_init__(self) -> None:
+        if self.kind not in CHANGE_KINDS:
+            raise ValueError(f"Unknown package change kind: {self.kind}")
+
+        # caught here rather than when the change is applied mid-run
+        required = REQUIRED_FIELDS.get(self.kind)
+        if required is not None and not getattr(self, required):
+            raise ValueError(
+                f"The {self.kind} change for package {self.package_id} "
+                + f"needs {required}"
+            )
+        missing = ADDRESS_KEYS.difference(self.address)
+        if self.kind == "address" and missing:
+            raise ValueError(
+                f"The address change for package {self.package_id} "
+                + f"needs {', '.join(sorted(missing))} in address"
+            )
+
+
+@dataclass
+class RoadChange:
+    """
+    A new distance for the road between two addresses, such as a closure
+    or traffic, that takes effect at time
+    """
+
+    time: datetime
+    from_address: str
+    to_address: str
+    distance: float
+
+
+@dataclass
+class ReplanReport:
+    """How one applied change affected the plan and how long it took"""
+
+    time: datetime
+    kind: str
+    # None for road changes
+    package_id: Optional[int]
+    truck_id: Optional[int] = None
+    distance_before: float = 0.0
+    distance_after: float = 0.0
+    late_before: int = 0
+    late_after: int = 0
+    latency_ms: float = 0.0
+    # False when the change could not take effect: the package was
+    # delivered or cancelled, the new address is off the map, or the
+    # delayed package is already loaded
+    applied: bool = True
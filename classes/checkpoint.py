@@ -0,0 +1,119 @@
+from .graph import Graph, Node
+from .hashtable import _DELETED
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List
+import io
+import pickle
+
+CHECKPOINT_VERSION = 1
+
+
+class _StatePickler(pickle.Pickler):
+    """
+    Pickles run state with the graph and its nodes left out as references,
+    so a checkpoint never copies the road network
+    """
+
+    def __init__(self, file, graph: Graph) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.graph = graph
+        self.node_ids = graph.node_ids
+
+    def persistent_id(self, obj: Any) -> Any:
+        if obj is self.graph:
+            return ("graph",)
+        if obj is _DELETED:
+            # hashtable tombstones are compared by identity
+            return ("deleted",)
+        if type(obj) is Node:
+            index = self.node_ids.get(obj)
+            if index is not None:
+                return ("node", index)
+        return None
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, graph: Graph, nodes: List[Node]) -> None:
+        super().__init__(file)
+        self.graph = graph
+        self.nodes = nodes
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid[0] == "graph":
+            return self.graph
+        if pid[0] == "deleted":
+            return _DELETED
+        return self.nodes[pid[1]]
+
+
+@dataclass
+class Checkpoint:
+    """
+    The state of a run at an event boundary, serialized once and restored
+    as often as needed. Every restore is an independent deep copy of the
+    state, while the graph is shared by all of them and must be treated
+    as read-only by the branches.
+    """
+
+    time: datetime
+    # records the event log had emitted when the checkpoint was taken
+    log_position: int
+    state: bytes
+    graph: Graph
+
+    @classmethod
+    def capture(
+        cls, state: Any, graph: Graph, time: datetime, log_position: int
+    ) -> "Checkpoint":
+        """
+        Serializes state, which may refer to graph and its nodes
+
+        Overall complexity: O(size of the state)
+        """
+
+        buffer = io.BytesIO()
+        _StatePickler(buffer, graph).dump(state)
+        return cls(time, log_position, buffer.getvalue(), graph)
+
+    def restore(self) -> Any:
+        """
+        A fresh copy of the state bound to the shared graph
+
+        Overall complexity: O(size of the state)
+        """
+
+        nodes = sorted(self.graph.node_ids, key=self.graph.node_ids.get)
+        return _StateUnpickler(
+            io.BytesIO(self.state), self.graph, nodes
+        ).load()
+
+    def save(self, path: Path) -> None:
+        """Writes the checkpoint and its graph to one file"""
+
+        with open(path, "wb") as checkpoint_file:
+            pickle.dump(
+                {
+                    "version": CHECKPOINT_VERSION,
+                    "time": self.time,
+                    "log_position": self.log_position,
+                    "state": self.state,
+                    "graph": self.graph,
+                },
+                checkpoint_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        """Reads a checkpoint written by save"""
+
+        with open(path, "rb") as checkpoint_file:
+            data = pickle.load(checkpoint_file)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {path}")
+        return cls(
+            data["time"], data["log_position"], data["state"], data["graph"]
+        )
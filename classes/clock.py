@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Tuple
+
+SECONDS_PER_MINUTE = 60
+SECONDS_PER_HOUR = 3600
+
+
+def seconds_of(value) -> int:
+    """whole seconds since midnight for a datetime or time"""
+    return (
+        value.hour * SECONDS_PER_HOUR
+        + value.minute * SECONDS_PER_MINUTE
+        + value.second
+    )
+
+
+def parse_clock(value: str) -> int:
+    """seconds since midnight for an "HH:MM" string"""
+
+    hours, minutes = value.split(":")
+    return int(hours) * SECONDS_PER_HOUR + int(minutes) * SECONDS_PER_MINUTE
+
+
+def to_minutes(seconds: int) -> float:
+    """minutes since midnight for a simulation time in seconds"""
+    return seconds / SECONDS_PER_MINUTE
+
+
+def available_times(special_cases: Dict) -> Dict[int, int]:
+    """package id -> the second a delayed package reaches the hub, O(d)"""
+
+    available: Dict[int, int] = {}
+    for time_str, package_ids in special_cases["delayed"].items():
+        arrival = parse_clock(time_str)
+        for package_id in package_ids:
+            available[package_id] = arrival
+    return available
+
+
+def travel_seconds(distance: float, speed: float) -> int:
+    """seconds to drive distance miles at speed mph, to the nearest second"""
+    return round(SECONDS_PER_HOUR * distance / speed)
+
+
+@dataclass
+class SimClock:
+    """
+    Maps the simulation's fixed-point time, whole seconds since midnight
+    of the simulated day, to datetimes and back. The simulation keeps
+    plain ints everywhere and only converts for reports and user input.
+    Times past midnight keep counting up instead of wrapping.
+    """
+
+    day: date
+    # the last conversion, log lines come in runs at the same time
+    _last: Tuple[int, datetime] = field(
+        default=(-1, datetime.min), repr=False
+    )
+
+    @classmethod
+    def starting(cls, moment: datetime) -> "SimClock":
+        return cls(moment.date())
+
+    @property
+    def midnight(self) -> datetime:
+        return datetime.combine(self.day, time.min)
+
+    def seconds(self, moment: datetime) -> int:
+        """a datetime as seconds since the day's midnight"""
+        return (moment - self.midnight) // timedelta(seconds=1)
+
+    def to_datetime(self, seconds: int) -> datetime:
+        """seconds since the day's midnight as a datetime, O(1)"""
+
+        if self._last[0] != seconds:
+            self._last = (
+                seconds,
+                self.midnight + timedelta(seconds=seconds),
+            )
+        return self._last[1]
@@ -0,0 +1,167 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .graph import Node, Weight
+
+
+def weight_value(weight: "Weight | float") -> float:
+    """helper to read a raw float from a Weight or a plain number"""
+    return float(getattr(weight, "value", weight))
+
+
+@dataclass
+class DistanceMatrix:
+    """Dense all-pairs shortest path distances indexed by node id"""
+
+    node_ids: Dict["Node", int] = field(default_factory=dict)
+    matrix: np.ndarray = field(
+        default_factory=lambda: np.zeros((0, 0), dtype=np.float64)
+    )
+
+    @classmethod
+    def from_adjacency(
+        cls,
+        adjacency_list: Dict["Node", Dict["Node", "Weight"]],
+        node_ids: Dict["Node", int],
+    ) -> "DistanceMatrix":
+        """
+        Builds the matrix with a vectorized Floyd-Warshall pass.
+
+        Overall complexity: O(V^3), vectorized over O(V^2) rows per pivot
+        """
+
+        size = len(node_ids)
+        matrix = np.full((size, size), np.inf, dtype=np.float64)
+        np.fill_diagonal(matrix, 0.0)
+
+        # O(V + E) - seed with direct edges
+        for node, edges in adjacency_list.items():
+            row = node_ids[node]
+            for adjacent_node, weight in edges.items():
+                column = node_ids[adjacent_node]
+                matrix[row, column] = min(
+                    matrix[row, column], weight_value(weight)
+                )
+
+        # O(V) pivots, each an O(V^2) numpy operation
+        for pivot in range(size):
+            np.minimum(
+                matrix,
+                matrix[:, pivot, None] + matrix[None, pivot, :],
+                out=matrix,
+            )
+
+        return cls(node_ids=dict(node_ids), matrix=matrix)
+
+    def _writable(self) -> np.ndarray:
+        """the matrix, copied first if it is a read-only mapping"""
+
+        if not self.matrix.flags.writeable:
+            self.matrix = self.matrix.copy()
+        return self.matrix
+
+    def decrease_edge(self, one: int, two: int, weight: float) -> np.ndarray:
+        """
+        Repairs the matrix after the edge between ids one and two got
+        shorter: every pair can only improve by going over the edge.
+        Returns the ids whose rows changed.
+
+        Overall complexity: O(V^2), vectorized
+        """
+
+        matrix = self._writable()
+        through = np.minimum(
+            matrix[:, one, None] + weight + matrix[None, two, :],
+            matrix[:, two, None] + weight + matrix[None, one, :],
+        )
+        changed = through < matrix
+        np.minimum(matrix, through, out=matrix)
+        return np.flatnonzero(changed.any(axis=1))
+
+    def affected_by(self, one: int, two: int, weight: float) -> np.ndarray:
+        """
+        Ids whose shortest path to some node runs over the edge between
+        one and two at its current weight, the rows an increase can change
+
+        Overall complexity: O(V^2), vectorized
+        """
+
+        matrix = self.matrix
+        tolerance = 1e-9
+        uses = (
+            matrix[:, one, None] + weight + matrix[None, two, :]
+            <= matrix + tolerance
+        ) | (
+            matrix[:, two, None] + weight + matrix[None, one, :]
+            <= matrix + tolerance
+        )
+        return np.flatnonzero(uses.any(axis=1))
+
+    def repair_rows(self, rows: np.ndarray, direct: np.ndarray) -> None:
+        """
+        Recomputes the pairs among rows after edges between them got
+        longer, Floyd-Warshall style. direct holds the current edge weights
+        from each row to every node, inf where there is none.
+
+        Pairs with an end outside rows kept their distance, so those rows
+        are exact. A shortest path between two affected nodes either stays
+        among affected nodes or leaves them for the first time at some k
+        and finishes along the exact row of k, so closing the affected
+        block and then routing it through every other k covers both.
+
+        Overall complexity: O(a^3 + a^2 * V) for a affected rows
+        """
+
+        if not len(rows):
+            return
+        matrix = self._writable()
+        outside = np.ones(len(matrix), dtype=bool)
+        outside[rows] = False
+
+        # O(a^3) - paths that stay among the affected nodes
+        block = direct[:, rows].copy()
+        np.fill_diagonal(block, 0.0)
+        for pivot in range(len(rows)):
+            np.minimum(
+                block,
+                block[:, pivot, None] + block[None, pivot, :],
+                out=block,
+            )
+
+        # O(a^2 * V) - reach each node outside, then finish on its row
+        leave = direct[:, outside]
+        exits = np.full(leave.shape, np.inf)
+        for pivot in range(len(rows)):
+            np.minimum(
+                exits, block[:, pivot, None] + leave[None, pivot, :], out=exits
+            )
+        rest = matrix[np.ix_(outside, rows)]
+        for exit_node in range(exits.shape[1]):
+            np.minimum(
+                block,
+                exits[:, exit_node, None] + rest[None, exit_node, :],
+                out=block,
+            )
+
+        matrix[np.ix_(rows, rows)] = block
+
+    def distance(self, node_one: "Node", node_two: "Node") -> float:
+        """
+        Return the shortest distance between two nodes, inf if unreachable
+
+        Overall complexity: O(1)
+        """
+        return float(
+            self.matrix[self.node_ids[node_one], self.node_ids[node_two]]
+        )
+
+    def row(self, node: "Node") -> np.ndarray:
+        """Return every distance from a node, ordered by node id"""
+        return self.matrix[self.node_ids[node]]
+
+    def nodes(self) -> List["Node"]:
+        """Nodes ordered by their id"""
+        return sorted(self.node_ids, key=self.node_ids.get)
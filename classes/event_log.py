@@ -0,0 +1,175 @@
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import IntEnum
+from pathlib import Path
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+import json
+import sys
+
+# records the default memory sink keeps before dropping the oldest
+DEFAULT_MEMORY_RECORDS = 10000
+
+
+class LogLevel(IntEnum):
+    """Minimum level a record needs to reach the sinks"""
+
+    # per-package lines: deliveries, truck contents, package states
+    DETAIL = 10
+    # truck movements, reloads, delays and the final summary
+    INFO = 20
+
+
+@dataclass
+class LogRecord:
+    """
+    A structured simulation event. The message may be a callable so the
+    text is only built when a sink actually needs it.
+    """
+
+    time: datetime
+    kind: str
+    message: Union[str, Callable[[], str]]
+    level: int = LogLevel.INFO
+    truck_id: Optional[int] = None
+    package_ids: Tuple[int, ...] = ()
+
+    def text(self) -> str:
+        """the message, formatting it on first use"""
+
+        if callable(self.message):
+            self.message = self.message()
+        return self.message
+
+    def format(self) -> str:
+        return f"{self.time}: {self.text()}"
+
+    def __getstate__(self) -> Dict:
+        # callables do not pickle, render the message first
+        self.text()
+        return self.__dict__
+
+    def to_dict(self) -> Dict:
+        return {
+            "time": self.time.isoformat(),
+            "kind": self.kind,
+            "level": int(self.level),
+            "truck": self.truck_id,
+            "packages": list(self.package_ids),
+            "message": self.text(),
+        }
+
+
+@dataclass
+class MemorySink:
+    """Keeps records in memory, the oldest drop off once maxlen is hit"""
+
+    maxlen: Optional[int] = None
+    records: Deque[LogRecord] = field(default_factory=deque)
+
+    def __post_init__(self) -> None:
+        self.records = deque(self.records, maxlen=self.maxlen)
+
+    def write(self, record: LogRecord) -> None:
+        self.records.append(record)
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class StreamSink:
+    """Writes formatted records to a text stream as they happen"""
+
+    stream: TextIO = sys.stdout
+
+    def write(self, record: LogRecord) -> None:
+        self.stream.write(f"{record.format()}\n\n")
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+@dataclass
+class JsonlSink:
+    """Appends one JSON object per record to a file"""
+
+    path: Path
+    _file: Optional[TextIO] = field(default=None, repr=False)
+
+    def write(self, record: LogRecord) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record.to_dict()) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@dataclass
+class EventLog:
+    """Routes simulation records at or above a level to pluggable sinks"""
+
+    sinks: List = field(
+        default_factory=lambda: [MemorySink(DEFAULT_MEMORY_RECORDS)]
+    )
+    level: int = LogLevel.DETAIL
+    # records handed to the sinks so far
+    emitted: int = 0
+
+    def enabled(self, level: int) -> bool:
+        """True if records at this level reach the sinks"""
+        return level >= self.level and bool(self.sinks)
+
+    def record(
+        self,
+        time: datetime,
+        kind: str,
+        message: Union[str, Callable[[], str]],
+        level: int = LogLevel.INFO,
+        truck_id: Optional[int] = None,
+        package_ids: Iterable[int] = (),
+    ) -> None:
+        """
+        Hands a record to every sink, O(s) for s sinks. Nothing is built
+        when the level is filtered out.
+        """
+
+        if not self.enabled(level):
+            return
+
+        record = LogRecord(
+            time, kind, message, level, truck_id, tuple(package_ids)
+        )
+        for sink in self.sinks:
+            sink.write(record)
+        self.emitted += 1
+
+    def __getstate__(self) -> Dict:
+        # streams and files stay with the process that opened them
+        state = dict(self.__dict__)
+        state["sinks"] = [x for x in self.sinks if isinstance(x, MemorySink)]
+        return state
+
+    def records(self) -> Iterable[LogRecord]:
+        """Records retained by the memory sinks, oldest first"""
+
+        for sink in self.sinks:
+            if isinstance(sink, MemorySink):
+                yield from sink.records
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,153 @@
+from .graph import Node
+from .truck import Truck
+
+from dataclasses import dataclass, field
+from math import inf
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+
+
+@dataclass
+class HubDispatcher:
+    """
+    Decides which idle trucks head back to the hub to reload.
+
+    Idle trucks sit in a heap keyed on priority(), by default the time they
+    would reach the hub, so picking the next one is O(log T) no matter how
+    large the fleet is. Subclasses can override priority() to change the
+    policy.
+    """
+
+    heap: List[Tuple] = field(default_factory=list)
+    idle: Dict[int, Tuple] = field(default_factory=dict)
+
+    def priority(self, truck: Truck, hub_arrival: int) -> Tuple:
+        """Earliest hub arrival first, lowest truck id on ties"""
+        return (hub_arrival, truck.id)
+
+    def truck_idle(self, truck: Truck, hub_arrival: int) -> None:
+        """Registers an empty truck out on the road, O(log T)"""
+
+        key = self.priority(truck, hub_arrival)
+        self.idle[truck.id] = key
+        heapq.heappush(self.heap, (key, truck.id))
+
+    def next_truck(self) -> Optional[int]:
+        """
+        Pops the idle truck that should return next, skipping stale
+        entries.
+
+        Overall complexity: O(log T) amortized
+        """
+
+        while self.heap:
+            key, truck_id = heapq.heappop(self.heap)
+            if self.idle.get(truck_id) == key:
+                del self.idle[truck_id]
+                return truck_id
+        return None
+
+    def withdraw(self, truck_id: int) -> None:
+        """Forgets an idle truck, its heap entry is dropped lazily"""
+        self.idle.pop(truck_id, None)
+
+
+@dataclass
+class Fleet:
+    """Trucks, the drivers assigned to them, and the reload dispatcher"""
+
+    trucks: List[Truck] = field(default_factory=list)
+    drivers: int = 0
+    dispatcher: HubDispatcher = field(default_factory=HubDispatcher)
+    truck_capacity: int = 16
+    # trucks that currently have a driver
+    driven: Set[int] = field(default_factory=set)
+    # driven trucks heading back to the hub
+    hub_bound: Set[int] = field(default_factory=set)
+    # trucks at the hub without a driver
+    parked: Set[int] = field(default_factory=set)
+    # driven trucks sitting empty at the hub
+    waiting: Set[int] = field(default_factory=set)
+
+    @classmethod
+    def create(
+        cls,
+        truck_count: int,
+        driver_count: int,
+        hub: Node,
+        start_time: int,
+        speed: int = 18,
+        dispatcher: Optional[HubDispatcher] = None,
+        weight_limit: Optional[float] = None,
+        volume_limit: Optional[float] = None,
+    ) -> "Fleet":
+        """
+        Builds a fleet parked at the hub, the first driver_count trucks
+        get a driver. Without a weight or volume limit trucks are only
+        bounded by their package count.
+        """
+
+        trucks = [
+            Truck(
+                id=x,
+                current_location=hub,
+                speed=speed,
+                truck_time=start_time,
+                weight_limit=inf if weight_limit is None else weight_limit,
+                volume_limit=inf if volume_limit is None else volume_limit,
+            )
+            for x in range(0, truck_count)
+        ]
+        drivers = min(driver_count, truck_count)
+
+        return cls(
+            trucks=trucks,
+            drivers=drivers,
+            dispatcher=dispatcher or HubDispatcher(),
+            truck_capacity=trucks[0].capacity if trucks else 16,
+            driven=set(range(drivers)),
+            parked=set(range(drivers, truck_count)),
+        )
+
+    def switch_driver(self, from_truck: Truck, to_truck: Truck) -> None:
+        """Moves a driver at the hub onto a parked truck, O(1)"""
+
+        self.driven.discard(from_truck.id)
+        self.parked.add(from_truck.id)
+        self.parked.discard(to_truck.id)
+        self.driven.add(to_truck.id)
+
+    def parked_loaded(self) -> List[Truck]:
+        """Loaded trucks at the hub waiting for a driver, O(parked)"""
+
+        return sorted(
+            (self.trucks[x] for x in self.parked if self.trucks[x].contents),
+            key=lambda truck: truck.id,
+        )
+
+    def drivers_needed(self, leftover: int) -> int:
+        """
+        How many more drivers should head back to the hub: one per loaded
+        parked truck plus enough trucks for leftovers that will not fit in
+        the parked empty trucks, minus drivers already there or on the way.
+
+        Overall complexity: O(parked)
+        """
+
+        parked_loaded = 0
+        parked_room = 0
+        for truck_id in self.parked:
+            truck = self.trucks[truck_id]
+            if truck.contents:
+                parked_loaded += 1
+            else:
+                parked_room += truck.capacity
+
+        overflow = max(0, leftover - parked_room)
+        trucks_for_overflow = -(-overflow // max(self.truck_capacity, 1))
+        needed = parked_loaded + trucks_for_overflow
+        if overflow == 0 and leftover > 0 and parked_loaded == 0:
+            # the parked trucks will still need someone to drive them
+            needed += 1
+
+        return needed - len(self.hub_bound) - len(self.waiting)
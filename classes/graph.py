@@ -1,5 +1,28 @@
+import re
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Iterable
+from typing import Dict, List, Optional, Iterable, Sequence
+
+import numpy as np
+
+from .distance_matrix import DistanceMatrix, weight_value
+from .profiler import phase
+
+
+_CARDINALS = {"n": "north", "s": "south", "e": "east", "w": "west"}
+_CARDINAL_PATTERN = re.compile(r"\b([NSEW])\b", flags=re.IGNORECASE)
+
+
+def normalize_address(address: str) -> str:
+    """
+    Builds a lookup key that ignores case, spacing and abbreviated
+    cardinal directions.
+    """
+    if not address:
+        return address
+    address = _CARDINAL_PATTERN.sub(
+        lambda match: _CARDINALS[match.group(1).lower()], address
+    )
+    return " ".join(address.lower().split())
 
 
 @dataclass(frozen=True)
@@ -29,17 +52,87 @@ class Graph:
     adjacenty_list: Dict[Node, Dict[Node, Weight]] = field(
         default_factory=dict
     )
+    node_ids: Dict[Node, int] = field(default_factory=dict)
+    name_index: Dict[str, Node] = field(default_factory=dict, repr=False)
+    address_index: Dict[str, Node] = field(default_factory=dict, repr=False)
+    normalized_index: Dict[str, Node] = field(
+        default_factory=dict, repr=False
+    )
+    _distance_matrix: Optional[DistanceMatrix] = field(
+        default=None, repr=False, compare=False
+    )
 
     def add_node(self, node: Node) -> None:
         """
         Adds a node (vertex) to the graph
 
-        Overall complexity O(V) - due to get_node method
+        Overall complexity O(1) - indexed get_node lookup
         """
 
         if node is not None:
             if self.get_node(node.name, node.address) is None:
                 self.adjacenty_list[node] = {}
+                self.node_ids[node] = len(self.node_ids)
+                self._index_node(node)
+                self._distance_matrix = None
+
+    def add_nodes(self, nodes: Iterable[Node]) -> None:
+        """
+        Adds many nodes (vertices) to the graph
+
+        Overall complexity O(V)
+        """
+
+        for node in nodes:
+            self.add_node(node)
+
+    def add_weights(
+        self, nodes: Sequence[Node], matrix: Sequence[Sequence]
+    ) -> None:
+        """
+        Adds edges from a square or lower triangular distance matrix where
+        matrix[i][j] is the weight between nodes[i] and nodes[j]. Blank
+        (None or empty string) cells are skipped.
+
+        Overall complexity O(V^2) - linear in the number of matrix cells
+        """
+
+        for row_idx, row in enumerate(matrix):
+            from_node = nodes[row_idx]
+            from_edges = self.adjacenty_list[from_node]
+            for column_idx, weight in enumerate(row):
+                if weight is None or (
+                    isinstance(weight, str) and not weight.strip()
+                ):
+                    continue
+                to_node = nodes[column_idx]
+                weight = float(weight)
+                from_edges[to_node] = weight
+                self.adjacenty_list[to_node][from_node] = weight
+
+        self._distance_matrix = None
+
+    @classmethod
+    def from_matrix(
+        cls, nodes: Sequence[Node], matrix: Sequence[Sequence]
+    ) -> "Graph":
+        """
+        Builds a graph from a list of nodes and a distance matrix
+
+        Overall complexity O(V^2)
+        """
+
+        graph = cls()
+        graph.add_nodes(nodes)
+        graph.add_weights(nodes, matrix)
+        return graph
+
+    def _index_node(self, node: Node) -> None:
+        """keeps the lookup indexes in sync with the adjacency list"""
+
+        self.name_index.setdefault(node.name, node)
+        self.address_index.setdefault(node.address, node)
+        self.normalized_index.setdefault(normalize_address(node.address), node)
 
     def add_edge(self, node: Node, edge: Edge) -> None:
         """Adds an edge to the graph"""
@@ -48,6 +141,12 @@ class Graph:
         self.add_node(edge.node)
 
         if node is not None and edge.node is not None:
+            previous = self.adjacenty_list[node].get(edge.node)
+            if previous is None or weight_value(previous) != weight_value(
+                edge.weight
+            ):
+                self._distance_matrix = None
+
             self.adjacenty_list[node][edge.node] = edge.weight
             self.adjacenty_list[edge.node][node] = edge.weight
 
@@ -70,22 +169,152 @@ class Graph:
         """
         Returns Node object
 
-        # Overall complexity: O(V)
+        # Overall complexity: O(1) - dict indexes
         """
-        search_params: List[str] = []
+        candidates: List[Node] = []
 
-        if name is not None:
-            search_params.append(name)
-        if address is not None:
-            search_params.append(address)
+        # a search term may match either a node name or address
+        for term in (name, address):
+            if term is None:
+                continue
+            for index in (self.name_index, self.address_index):
+                node = index.get(term)
+                if node is not None:
+                    candidates.append(node)
 
-        nodes = self.nodes()
+        if not candidates and address is not None:
+            node = self.normalized_index.get(normalize_address(address))
+            if node is not None:
+                candidates.append(node)
 
-        # O(V) - linear search
-        for node in nodes:
-            if node.name in search_params or node.address in search_params:
-                return node
-        return None
+        if not candidates:
+            return None
+
+        # the earliest added node wins, matching insertion order
+        return min(candidates, key=self.node_ids.__getitem__)
+
+    def distance_matrix(self) -> DistanceMatrix:
+        """
+        Returns the all-pairs shortest path matrix, building it if the graph
+        changed since the last call.
+
+        Overall complexity: O(V^3) on first call, O(1) afterwards
+        """
+
+        if self._distance_matrix is None:
+            with phase("graph.distance_matrix"):
+                self._distance_matrix = DistanceMatrix.from_adjacency(
+                    self.adjacenty_list, self.node_ids
+                )
+        return self._distance_matrix
+
+    def attach_distance_matrix(self, matrix: np.ndarray) -> None:
+        """
+        Installs a precomputed all-pairs matrix, ordered by node id, in
+        place of building one
+        """
+
+        size = len(self.node_ids)
+        if matrix.shape != (size, size):
+            raise ValueError(
+                f"expected a {size}x{size} matrix, got {matrix.shape}"
+            )
+        self._distance_matrix = DistanceMatrix(
+            node_ids=dict(self.node_ids), matrix=matrix
+        )
+
+    def update_edge_weight(
+        self, node_one: Node, node_two: Node, weight: "Weight | float"
+    ) -> np.ndarray:
+        """
+        Sets the weight of the edge between two nodes, adding it if it is
+        missing, and repairs the cached distance matrix in place instead of
+        dropping it. A shorter edge is relaxed into every pair, a longer one
+        only recomputes the pairs whose shortest path ran over it.
+
+        Returns the ids of the nodes whose distances changed, empty when no
+        matrix was cached yet.
+
+        Overall complexity: O(V^2) for a shorter edge, O(a^3 + a^2 * V)
+        for a longer one, a being the nodes whose paths used it
+        """
+
+        self.add_node(node_one)
+        self.add_node(node_two)
+        previous = self.get_weight(node_one, node_two)
+        old = weight_value(previous) if previous is not None else np.inf
+        new = weight_value(weight)
+
+        self.adjacenty_list[node_one][node_two] = weight
+        self.adjacenty_list[node_two][node_one] = weight
+
+        matrix = self._distance_matrix
+        if matrix is None or new == old:
+            return np.zeros(0, dtype=np.int64)
+
+        one, two = self.node_ids[node_one], self.node_ids[node_two]
+        with phase("graph.update_edge_weight"):
+            if new < old:
+                return matrix.decrease_edge(one, two, new)
+
+            rows = matrix.affected_by(one, two, old)
+            if 2 * len(rows) > len(self.node_ids):
+                # most paths ran over the edge, a full pass is cheaper
+                self._distance_matrix = DistanceMatrix.from_adjacency(
+                    self.adjacenty_list, self.node_ids
+                )
+            else:
+                matrix.repair_rows(rows, self._direct_rows(rows))
+            return rows
+
+    def _direct_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Edge weights from each node id in rows to every node, inf where
+        there is no edge
+
+        Overall complexity: O(sum of the rows' degrees)
+        """
+
+        nodes = self.distance_matrix().nodes()
+        direct = np.full((len(rows), len(self.node_ids)), np.inf)
+        for position, row in enumerate(rows.tolist()):
+            for adjacent_node, weight in self.adjacenty_list[
+                nodes[row]
+            ].items():
+                column = self.node_ids[adjacent_node]
+                direct[position, column] = min(
+                    direct[position, column], weight_value(weight)
+                )
+        return direct
+
+    def copy(self) -> "Graph":
+        """
+        A graph that can be changed without touching this one, sharing
+        the immutable nodes
+
+        Overall complexity: O(V^2) with a cached matrix, O(V + E) without
+        """
+
+        graph = Graph(
+            adjacenty_list={
+                node: dict(edges)
+                for node, edges in self.adjacenty_list.items()
+            },
+            node_ids=dict(self.node_ids),
+            name_index=dict(self.name_index),
+            address_index=dict(self.address_index),
+            normalized_index=dict(self.normalized_index),
+        )
+        if self._distance_matrix is not None:
+            graph._distance_matrix = DistanceMatrix(
+                node_ids=dict(self._distance_matrix.node_ids),
+                matrix=self._distance_matrix.matrix.copy(),
+            )
+        return graph
+
+    def distance(self, node_one: Node, node_two: Node) -> float:
+        """Shortest distance between two nodes, O(1) once cached"""
+        return self.distance_matrix().distance(node_one, node_two)
 
     def get_adjacency_list(self) -> Dict[Node, Dict[Node, Weight]]:
         """Get pre-computed adjacency list"""
@@ -1,76 +1,165 @@
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
 
 
-def make_10_lists() -> list[list]:
-    return [[] for _ in range(10)]
+# marks a slot whose entry was removed, probing must continue past it
+_DELETED = object()
 
 
 @dataclass
 class Hashtable:
-    """Class to manage a variation of a hash table"""
+    """
+    Class to manage a variation of a hash table
 
-    capacity: int = 10
+    Uses open addressing with linear probing over parallel key and value
+    arrays, and grows once the load factor is exceeded.
+    """
+
+    capacity: int = 16
     size: int = 0
-    buckets: list[list[Optional[tuple]]] = field(default_factory=make_10_lists)
+    load_factor: float = 0.75
+    keys: list = field(default_factory=list, repr=False)
+    slots: list = field(default_factory=list, repr=False)
+    _used: int = field(default=0, repr=False)
+
+    def __post_init__(self) -> None:
+        # a full table leaves probing nowhere to stop
+        if not 0 < self.load_factor < 1:
+            raise ValueError(
+                f"load_factor must be between 0 and 1, got {self.load_factor}"
+            )
+        if not self.keys:
+            self.capacity = max(self.capacity, 1)
+            self.keys = [None] * self.capacity
+            self.slots = [None] * self.capacity
+
+    def __len__(self) -> int:
+        return self.size
 
     def _hash_function(self, key: int) -> int:
         """Computes a hash for a key-value pair"""
-        return key % self.capacity
+        return hash(key) % self.capacity
+
+    def _find_slot(self, key: int) -> int:
+        """
+        Returns the slot holding key, or the slot key should be inserted
+        into when it is missing.
+
+        Overall complexity: O(1) expected, bounded by the load factor
+        """
+
+        idx = self._hash_function(key)
+        first_deleted = -1
+
+        while True:
+            k = self.keys[idx]
+            if k is None:
+                return first_deleted if first_deleted >= 0 else idx
+            if k is _DELETED:
+                if first_deleted < 0:
+                    first_deleted = idx
+            elif k == key:
+                return idx
+            idx = (idx + 1) % self.capacity
+
+    def _resize(self, capacity: int) -> None:
+        """
+        Rehashes every live entry into a table of the given capacity
+
+        Overall complexity: O(n)
+        """
+
+        old_keys, old_slots = self.keys, self.slots
+        self.capacity = capacity
+        self.keys = [None] * capacity
+        self.slots = [None] * capacity
+        self._used = self.size
+
+        for k, v in zip(old_keys, old_slots):
+            if k is not None and k is not _DELETED:
+                idx = self._find_slot(k)
+                self.keys[idx] = k
+                self.slots[idx] = v
+
+    def reserve(self, count: int) -> None:
+        """Grows the table so count entries fit under the load factor"""
+
+        needed = int(count / self.load_factor) + 1
+        if needed > self.capacity:
+            capacity = self.capacity
+            while capacity < needed:
+                capacity *= 2
+            self._resize(capacity)
 
     def insert(self, value: Any, key: Optional[int] = None) -> bool:
         """
         Inserts a value into the hash table
 
-        Overall complexity: O(n) - due to collision handling
+        Overall complexity: O(1) amortized
         """
 
         if key is None:
             key = value.id
 
-        bucket = self.buckets[self._hash_function(key)]
+        # deleted slots count against the load factor until the next resize
+        if self._used + 1 > self.capacity * self.load_factor:
+            self._resize(self.capacity * 2)
 
-        # O(n)
-        for idx, (k, _) in enumerate(bucket):
-            if k == key:
-                bucket[idx] = (key, value)
-                return True
+        idx = self._find_slot(key)
+        existing = self.keys[idx]
 
-        bucket.append((key, value))
-        self.size += 1
+        if existing is None or existing is _DELETED:
+            if existing is None:
+                self._used += 1
+            self.keys[idx] = key
+            self.size += 1
+
+        self.slots[idx] = value
         return True
 
+    def bulk_insert(self, values: Iterable[Any]) -> None:
+        """
+        Inserts many values keyed on their id, sizing the table once up
+        front instead of resizing along the way.
+
+        Overall complexity: O(n)
+        """
+
+        values = list(values)
+        self.reserve(self.size + len(values))
+        for value in values:
+            self.insert(value)
+
     def remove(self, key: int) -> bool:
         """
         Removes a value from the hash table.
 
-        Overall complexity: O(n) - due to collision handling
+        Overall complexity: O(1) expected
         """
 
-        idx = self._hash_function(key)
-        bucket = self.buckets[idx]
+        idx = self._find_slot(key)
+        if self.keys[idx] is None or self.keys[idx] is _DELETED:
+            return False
 
-        # O(n)
-        for idx, (k, v) in enumerate(bucket):
-            if k == key:
-                bucket.pop(idx)
-                self.size -= 1
-                return True
-        return False
+        self.keys[idx] = _DELETED
+        self.slots[idx] = None
+        self.size -= 1
+        return True
 
     def get(self, key: int) -> Any or None:
         """
         Obtains a value from the hash table
 
-        Overall complexity O(n), but n is expected to be small due to the hash
-        function
+        Overall complexity O(1) expected
         """
-        for _, (k, v) in enumerate(self.buckets[self._hash_function(key)]):
-            if k == key:
-                return v
 
-        return None
+        idx = self._find_slot(key)
+        if self.keys[idx] is None or self.keys[idx] is _DELETED:
+            return None
+        return self.slots[idx]
 
-    def values(self):
-        """Returns an immutable collection of all values in the hashtable."""
-        return list(value for bucket in self.buckets for _, value in bucket)
+    def values(self) -> Iterator[Any]:
+        """Lazily yields every value in the hashtable."""
+        for k, v in zip(self.keys, self.slots):
+            if k is not None and k is not _DELETED:
+                yield v
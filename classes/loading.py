@@ -0,0 +1,532 @@
+from .clock import available_times
+from .package import Package, PackageStatus
+from .package_store import PackageStore
+from .profiler import profiled
+
+from bisect import bisect_right, insort
+from collections import deque
+from dataclasses import dataclass, field
+from math import inf
+from typing import (
+    TYPE_CHECKING,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+import heapq
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .truck import Truck
+
+
+@dataclass
+class LoadingQueue:
+    """
+    Packages waiting at the hub, indexed by the constraints that decide
+    when and onto which truck they can be loaded. Compiled once, then
+    every load only pays for the packages it actually moves.
+    """
+
+    # available, unrestricted packages by deadline
+    ready: List[Tuple] = field(default_factory=list)
+    # delayed packages by the time they reach the hub
+    delayed: List[Tuple] = field(default_factory=list)
+    # truck number -> packages only that truck may carry, by deadline
+    restricted: Dict[int, List[Tuple]] = field(default_factory=dict)
+    # packages that must all ride on the same truck
+    grouped: List[Package] = field(default_factory=list)
+    # package id -> the only truck number allowed to carry it
+    truck_of: Dict[int, int] = field(default_factory=dict, repr=False)
+    # package id -> its current heap entry, withdrawn entries go stale
+    live: Dict[int, Tuple] = field(default_factory=dict, repr=False)
+    remaining: int = 0
+    # with a store, heap entries hold its rows instead of packages
+    store: Optional[PackageStore] = field(default=None, repr=False)
+    # (weight, package id, ready heap entry) sorted, built the first time a
+    # truck is topped up, entries that left the ready heap go stale
+    by_weight: Optional[List[Tuple]] = field(default=None, repr=False)
+
+    @classmethod
+    def compile(
+        cls,
+        packages: Union[Iterable[Package], PackageStore],
+        special_cases: Dict,
+        truck_count: Optional[int] = None,
+    ) -> "LoadingQueue":
+        """
+        Builds the queue from the packages still at the hub. Truck
+        restrictions naming a truck beyond truck_count are ignored.
+
+        Overall complexity: O(n log n)
+        """
+
+        available = available_times(special_cases)
+
+        queue = cls()
+        queue.truck_of = {
+            package_id: truck_number
+            for truck_number, package_ids in special_cases[
+                "specific_truck"
+            ].items()
+            if truck_count is None or truck_number <= truck_count
+            for package_id in package_ids
+        }
+        grouped_ids = set(special_cases["must_be_grouped"])
+
+        if isinstance(packages, PackageStore):
+            queue._compile_store(packages, available, grouped_ids)
+            return queue
+
+        # O(n) - sort each package into its bucket
+        for package in packages:
+            if package.delivery_status not in (
+                PackageStatus.AT_HUB,
+                PackageStatus.DELAYED,
+            ):
+                continue
+
+            queue.remaining += 1
+            if package.id in grouped_ids:
+                queue.grouped.append(package)
+            elif package.id in available:
+                entry = (available[package.id], package.id, package)
+                queue.live[package.id] = entry
+                queue.delayed.append(entry)
+            else:
+                queue._push(package)
+
+        # O(n) each
+        heapq.heapify(queue.ready)
+        heapq.heapify(queue.delayed)
+        for heap in queue.restricted.values():
+            heapq.heapify(heap)
+
+        for _, _, package in queue.delayed:
+            package.delivery_status = PackageStatus.DELAYED
+
+        return queue
+
+    def _compile_store(
+        self,
+        store: PackageStore,
+        available: Dict[int, int],
+        grouped_ids: set,
+    ) -> None:
+        """
+        Sorts a store into the buckets from its columns. Only grouped
+        packages become objects, every heap entry holds a row.
+
+        Overall complexity: O(n log n), vectorized
+        """
+
+        self.store = store
+        rows = store.rows_with(PackageStatus.AT_HUB, PackageStatus.DELAYED)
+        ids = store.ids[rows]
+        self.remaining = len(rows)
+
+        grouped = np.isin(ids, list(grouped_ids))
+        delayed = ~grouped & np.isin(ids, list(available))
+        restricted_ids = np.fromiter(self.truck_of, dtype=np.int64)
+        restricted = ~grouped & ~delayed & np.isin(ids, restricted_ids)
+        ready = ~(grouped | delayed | restricted)
+
+        self.grouped = [store.package(row) for row in rows[grouped].tolist()]
+
+        # sorted by (deadline, id), which already is a valid heap
+        ready_rows = rows[ready]
+        order = np.lexsort((ids[ready], store.deadlines[ready_rows]))
+        self.ready = list(
+            zip(
+                store.deadlines[ready_rows][order].tolist(),
+                ids[ready][order].tolist(),
+                ready_rows[order].tolist(),
+            )
+        )
+
+        self.delayed = [
+            (available[package_id], package_id, row)
+            for package_id, row in zip(
+                ids[delayed].tolist(), rows[delayed].tolist()
+            )
+        ]
+        heapq.heapify(self.delayed)
+        store.set_status(rows[delayed], PackageStatus.DELAYED)
+
+        for package_id, row in zip(
+            ids[restricted].tolist(), rows[restricted].tolist()
+        ):
+            heapq.heappush(
+                self.restricted.setdefault(self.truck_of[package_id], []),
+                (int(store.deadlines[row]), package_id, row),
+            )
+
+        for heap in (self.ready, self.delayed, *self.restricted.values()):
+            for entry in heap:
+                self.live[entry[1]] = entry
+
+    def _item(self, package: Package):
+        """what a heap entry holds for a package, a row with a store"""
+
+        if self.store is None:
+            return package
+        row = self.store.row(package.id)
+        if row is None:
+            self.store.insert(package)
+            row = self.store.row(package.id)
+        return row
+
+    def _package(self, item) -> Package:
+        return item if self.store is None else self.store.package(item)
+
+    def _weight(self, item) -> int:
+        """a heap item's weight, read from its row with a store"""
+
+        if self.store is None:
+            return item.weight
+        return int(self.store.weights[item])
+
+    def _push(self, package: Package) -> None:
+        """
+        adds an available package to its truck's heap or the ready heap,
+        O(log n), plus an O(n) list insert once the weight index exists
+        """
+
+        entry = (package.deadline, package.id, self._item(package))
+        self.live[package.id] = entry
+        truck_number = self.truck_of.get(package.id)
+        if truck_number is None:
+            heapq.heappush(self.ready, entry)
+            if self.by_weight is not None:
+                insort(self.by_weight, (package.weight, package.id, entry))
+        else:
+            heapq.heappush(
+                self.restricted.setdefault(truck_number, []), entry
+            )
+
+    def _is_live(self, entry: Tuple) -> bool:
+        return self.live.get(entry[1]) is entry
+
+    def _pop(self, heap: List[Tuple]) -> Optional[Package]:
+        """
+        Pops the first live entry, dropping withdrawn ones on the way
+
+        Overall complexity: O(log n) amortized
+        """
+
+        while heap:
+            entry = heapq.heappop(heap)
+            if self._is_live(entry):
+                del self.live[entry[1]]
+                return self._package(entry[2])
+        return None
+
+    def _peek(self, heap: List[Tuple]) -> Optional[Package]:
+        """The first live package of a heap without taking it, O(log n)"""
+
+        while heap:
+            if self._is_live(heap[0]):
+                return self._package(heap[0][2])
+            heapq.heappop(heap)
+        return None
+
+    def add(self, package: Package, available: Optional[int] = None) -> None:
+        """
+        Queues a package that was not part of the compiled set, held back
+        until available when given. O(log n)
+        """
+
+        self.remaining += 1
+        if available is None:
+            package.delivery_status = PackageStatus.AT_HUB
+            self._push(package)
+        else:
+            package.delivery_status = PackageStatus.DELAYED
+            entry = (available, package.id, self._item(package))
+            self.live[package.id] = entry
+            heapq.heappush(self.delayed, entry)
+
+    def withdraw(self, package: Package) -> bool:
+        """
+        Takes a package back out of the queue, its heap entry is skipped
+        lazily. Returns False if the package was not queued.
+
+        Overall complexity: O(1), O(g) for a grouped package
+        """
+
+        if self.live.pop(package.id, None) is None:
+            if package not in self.grouped:
+                return False
+            self.grouped = [x for x in self.grouped if x is not package]
+
+        self.remaining -= 1
+        return True
+
+    def release(self, now: int) -> None:
+        """
+        Moves delayed packages that have reached the hub into the ready
+        heaps, O(k log n) for k released packages.
+        """
+
+        while self.delayed and self.delayed[0][0] <= now:
+            entry = heapq.heappop(self.delayed)
+            if not self._is_live(entry):
+                continue
+            package = self._package(entry[2])
+            package.delivery_status = PackageStatus.AT_HUB
+            self._push(package)
+
+    @profiled("loading.load")
+    def load(self, trucks: List["Truck"], current_time: int) -> None:
+        """
+        Greedily loads each truck: its restricted packages first, then the
+        group if it fits, then by earliest deadline. A truck that runs out
+        of weight or volume before it runs out of slots stops at the first
+        package that does not fit and is topped up best fit instead, see
+        _top_up, so every hub departure leaves as full as it can.
+
+        Overall complexity: O(k log n) for k loaded packages, plus
+        O(n log n) to index the ready packages the first time a truck is
+        topped up and O(s) for the entries a top-up steps over, see
+        _top_up
+        """
+
+        self.release(current_time)
+
+        for truck in trucks:
+            self._fill(truck, self.restricted.get(truck.id + 1, []))
+
+            if self.grouped and truck.fits_all(self.grouped):
+                for package in self.grouped:
+                    self._load(truck, package)
+                self.grouped = []
+
+            self._fill(truck, self.ready)
+            if truck.capacity > 0 and self.ready:
+                self._top_up(truck)
+
+    def _fill(self, truck: "Truck", heap: List[Tuple]) -> None:
+        """
+        Loads a heap in deadline order until the truck is full or the
+        next package does not fit
+
+        Overall complexity: O(k log n) for k loaded packages
+        """
+
+        while truck.capacity > 0:
+            package = self._peek(heap)
+            if package is None or not truck.fits(package):
+                return
+            self._pop(heap)
+            self._load(truck, package)
+
+    def _weight_index(self) -> List[Tuple]:
+        """
+        The ready packages sorted by weight, kept up to date by _push
+        once built
+
+        Overall complexity: O(n log n) the first time, O(1) after
+        """
+
+        if self.by_weight is None:
+            self.by_weight = sorted(
+                (self._weight(entry[2]), entry[1], entry)
+                for entry in self.ready
+                if self._is_live(entry)
+            )
+        return self.by_weight
+
+    def _top_up(self, truck: "Truck") -> None:
+        """
+        Best fit decreasing over the ready packages: loads the heaviest one
+        that still fits the truck's remaining weight, found by bisecting
+        the weight index, until no ready package fits. The remaining weight
+        only shrinks, so one cursor walks the index downwards and every
+        entry is looked at once per pass. Packages too bulky for the
+        remaining volume are stepped over, and entries that left the ready
+        heap are skipped like stale heap entries. Once most of the index
+        has gone stale it is compacted in place of sorting it again.
+
+        Overall complexity: O(k log n + s) for k loaded packages and s
+        entries stepped over, s <= n
+        """
+
+        index = self._weight_index()
+        cursor = len(index)
+        stale = 0
+        while truck.capacity > 0:
+            cursor = min(
+                cursor,
+                bisect_right(
+                    index, (truck.weight_limit - truck.load_weight, inf)
+                ),
+            )
+            while cursor > 0:
+                cursor -= 1
+                entry = index[cursor][2]
+                if not self._is_live(entry):
+                    stale += 1
+                    continue
+                package = self._package(entry[2])
+                if truck.fits(package):
+                    del self.live[entry[1]]
+                    self._load(truck, package)
+                    stale += 1
+                    break
+            else:
+                break
+
+        if 2 * stale > len(index):
+            # O(n) - filtering keeps the order, no need to sort again
+            self.by_weight = [x for x in index if self._is_live(x[2])]
+
+    def _load(self, truck: "Truck", package: Package) -> None:
+        # raises rather than losing a package that does not fit
+        truck.load_package(package)
+        self.remaining -= 1
+
+    def has_trips(self, truck_id: int) -> bool:
+        """True when work at the hub is set aside for this truck alone"""
+        return False
+
+    def leftovers(self) -> List[Package]:
+        """
+        Every package still at the hub, ordered by id
+
+        Overall complexity: O(n log n)
+        """
+
+        packages = [self._package(entry[2]) for entry in self.live.values()]
+        packages.extend(self.grouped)
+        return sorted(packages, key=lambda package: package.id)
+
+
+@dataclass
+class TripQueue(LoadingQueue):
+    """
+    A LoadingQueue that follows a precomputed plan: every truck takes its
+    planned trips in order, each loaded in planned visit order once all of
+    its packages have reached the hub. Packages outside the plan, such as
+    ones added later, fall back to the deadline heaps.
+    """
+
+    # truck id -> planned trips, each a list of queue entries
+    trips: Dict[int, Deque[List[Tuple]]] = field(default_factory=dict)
+    # planned packages still on their way to the hub, by arrival
+    pending: List[Tuple] = field(default_factory=list)
+    # packages that have to ride together, kept together when requeued
+    grouped_ids: frozenset = field(default_factory=frozenset)
+
+    @classmethod
+    def from_plan(
+        cls,
+        trips: List[Tuple[int, List[Package]]],
+        packages: List[Package],
+        special_cases: Dict,
+        truck_count: Optional[int] = None,
+    ) -> "TripQueue":
+        """
+        Builds the queue from (truck id, packages) trips, anything at the
+        hub that is not in a trip goes to the regular heaps.
+
+        Overall complexity: O(n log n)
+        """
+
+        planned = {package.id for _, trip in trips for package in trip}
+        queue = cls.compile(
+            [package for package in packages if package.id not in planned],
+            special_cases,
+            truck_count,
+        )
+
+        queue.grouped_ids = frozenset(special_cases["must_be_grouped"])
+        available = available_times(special_cases)
+
+        # O(n)
+        for truck_id, trip in trips:
+            entries = []
+            for package in trip:
+                arrival = available.get(package.id, 0)
+                entry = (arrival, package.id, package)
+                if package.id in available:
+                    package.delivery_status = PackageStatus.DELAYED
+                    queue.pending.append(entry)
+                queue.live[package.id] = entry
+                entries.append(entry)
+            queue.trips.setdefault(truck_id, deque()).append(entries)
+            queue.remaining += len(entries)
+        heapq.heapify(queue.pending)
+
+        return queue
+
+    def has_trips(self, truck_id: int) -> bool:
+        """True while the truck has planned trips left, O(1)"""
+        return bool(self.trips.get(truck_id))
+
+    def release(self, now: int) -> None:
+        """Marks planned packages that reached the hub, then the heaps"""
+
+        while self.pending and self.pending[0][0] <= now:
+            entry = heapq.heappop(self.pending)
+            if self._is_live(entry):
+                entry[2].delivery_status = PackageStatus.AT_HUB
+        super().release(now)
+
+    def _requeue(self, trip: List[Package]) -> None:
+        """
+        Hands a planned trip to the heaps, its grouped packages to the
+        group so they still leave together, O(k log n) for k packages
+        """
+
+        for package in trip:
+            if package.id in self.grouped_ids:
+                self.grouped.append(package)
+            else:
+                self._push(package)
+
+    @profiled("loading.load_trip")
+    def load(self, trucks: List["Truck"], current_time: int) -> None:
+        """
+        Loads each truck's next trip if all of it is at the hub, a truck
+        with no trips left loads from the heaps instead. A trip over the
+        truck's weight or volume limits is requeued whole, see _requeue,
+        and the truck loads from the heaps for that departure.
+
+        Overall complexity: O(k log n) for k loaded packages
+        """
+
+        now = current_time
+        self.release(now)
+
+        for truck in trucks:
+            planned = self.trips.get(truck.id)
+            while planned:
+                # withdrawn packages drop out of their trip
+                entries = [x for x in planned[0] if self._is_live(x)]
+                if not entries:
+                    planned.popleft()
+                    continue
+                if any(entry[0] > now for entry in entries):
+                    # wait for the rest of the trip to reach the hub
+                    break
+
+                planned.popleft()
+                for entry in entries:
+                    del self.live[entry[1]]
+                trip = [entry[2] for entry in entries]
+                if truck.fits_all(trip):
+                    for package in trip:
+                        self._load(truck, package)
+                else:
+                    # over the truck's limits, the whole trip goes back
+                    # and this departure loads from the heaps instead
+                    self._requeue(trip)
+                    super().load([truck], current_time)
+                break
+            else:
+                super().load([truck], current_time)
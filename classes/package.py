@@ -1,9 +1,39 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import time
+from enum import IntEnum
 from typing import Optional
 
 
-@dataclass
+class PackageStatus(IntEnum):
+    """Where a package stands, one byte per package in columnar storage"""
+
+    AT_HUB = 0
+    DELAYED = 1
+    EN_ROUTE = 2
+    DELIVERED = 3
+    CANCELLED = 4
+
+    @property
+    def label(self) -> str:
+        return self.name.lower().replace("_", " ")
+
+    def __str__(self) -> str:
+        return self.label
+
+    def __format__(self, spec: str) -> str:
+        return format(self.label, spec)
+
+    def __repr__(self) -> str:
+        # the package repr ends up in the event log, keep it readable
+        return repr(self.label)
+
+
+def minutes_of(value) -> int:
+    """whole minutes since midnight for a datetime or time"""
+    return value.hour * 60 + value.minute
+
+
+@dataclass(slots=True)
 class Package:
     id: int
     address: str
@@ -11,8 +41,16 @@ class Package:
     state: str
     zip: str
     weight: int
-    delivery_deadline: datetime
-    delivery_status: str = 'at the hub'
+    # minutes since midnight
+    deadline: int
+    delivery_status: PackageStatus = PackageStatus.AT_HUB
     special_notes: Optional[str] = None
-    delivery_time: Optional[datetime] = None
-    loading_time: Optional[datetime] = None
+    # simulation seconds since midnight
+    delivery_time: Optional[int] = None
+    loading_time: Optional[int] = None
+    # litres, 0 when the package file has no volumes
+    volume: int = 0
+
+    @property
+    def delivery_deadline(self) -> time:
+        return time(*divmod(self.deadline, 60))
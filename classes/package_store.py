@@ -0,0 +1,283 @@
+from .hashtable import Hashtable
+from .package import Package, PackageStatus
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# column dtypes, 23 bytes per package
+_COLUMNS = {
+    "ids": np.int64,
+    "locations": np.int32,
+    "deadlines": np.int16,
+    "weights": np.int32,
+    "volumes": np.int32,
+    "statuses": np.int8,
+}
+
+
+@dataclass
+class PackageStore:
+    """
+    Packages kept as parallel arrays instead of one object each, with a
+    Hashtable from package id to row. A Package object is only built the
+    first time a row is handed out and is cached from then on, so it is
+    the one every caller shares and mutates. Packages that never leave
+    the hub never cost more than their row.
+
+    Reads like a Hashtable (get, insert, bulk_insert, values, size), so
+    the simulation can use either, and LoadingQueue.compile sorts a store
+    into its heaps straight from the columns.
+    """
+
+    ids: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int64))
+    # index into the location table
+    locations: np.ndarray = field(
+        default_factory=lambda: np.zeros(0, np.int32)
+    )
+    # minutes since midnight
+    deadlines: np.ndarray = field(
+        default_factory=lambda: np.zeros(0, np.int16)
+    )
+    weights: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))
+    volumes: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))
+    statuses: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int8))
+    count: int = 0
+    # interned (address, city, state, zip), shared by every package there
+    location_table: List[Tuple] = field(default_factory=list)
+    # row -> special notes, only for rows that have any
+    notes: Dict[int, str] = field(default_factory=dict)
+    # package id -> row
+    index: Hashtable = field(default_factory=Hashtable, repr=False)
+    _location_ids: Dict[Tuple, int] = field(default_factory=dict, repr=False)
+    # row -> the package object handed out for it
+    _objects: Dict[int, Package] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Package]:
+        return self.values()
+
+    @property
+    def size(self) -> int:
+        return self.count
+
+    @classmethod
+    def from_packages(cls, packages: Iterable[Package]) -> "PackageStore":
+        store = cls()
+        store.bulk_insert(packages)
+        return store
+
+    @classmethod
+    def from_table(cls, table: np.ndarray) -> "PackageStore":
+        """
+        Builds a store from the structured package table of the compiled
+        cache, without creating a Package per row.
+
+        Overall complexity: O(n log n), interning the locations
+        """
+
+        store = cls()
+        store.reserve(len(table))
+        count = len(table)
+
+        keys = ["address", "city", "state", "zip"]
+        places, inverse = np.unique(table[keys], return_inverse=True)
+        for place in places.tolist():
+            store._intern(place)
+
+        store.ids[:count] = table["id"]
+        store.locations[:count] = inverse.reshape(-1)
+        store.deadlines[:count] = table["deadline"]
+        store.weights[:count] = table["weight"]
+        store.volumes[:count] = table["volume"]
+        store.statuses[:count] = PackageStatus.AT_HUB
+        store.count = count
+
+        for row in np.flatnonzero(table["notes"] != "").tolist():
+            store.notes[row] = str(table["notes"][row])
+
+        store.index.reserve(count)
+        for row, package_id in enumerate(store.ids[:count].tolist()):
+            store.index.insert(row, key=package_id)
+        return store
+
+    def reserve(self, count: int) -> None:
+        """Grows every column to hold count rows, doubling as it goes"""
+
+        capacity = len(self.ids)
+        if count <= capacity:
+            return
+        capacity = max(count, capacity * 2, 16)
+        for name, dtype in _COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            column[: self.count] = getattr(self, name)[: self.count]
+            setattr(self, name, column)
+
+    def _intern(self, place: Tuple) -> int:
+        location = self._location_ids.get(place)
+        if location is None:
+            location = len(self.location_table)
+            self._location_ids[place] = location
+            self.location_table.append(place)
+        return location
+
+    def _write(self, row: int, package: Package) -> None:
+        """copies a package's fields into its row, O(1)"""
+
+        self.ids[row] = package.id
+        self.locations[row] = self._intern(
+            (package.address, package.city, package.state, package.zip)
+        )
+        self.deadlines[row] = package.deadline
+        self.weights[row] = package.weight
+        self.volumes[row] = package.volume
+        self.statuses[row] = package.delivery_status
+        if package.special_notes:
+            self.notes[row] = package.special_notes
+        else:
+            self.notes.pop(row, None)
+
+    def _row_for(self, package_id: int) -> int:
+        """the row holding package_id, appending one if it is new"""
+
+        row = self.index.get(package_id)
+        if row is None:
+            row = self.count
+            self.reserve(row + 1)
+            self.count += 1
+            self.index.insert(row, key=package_id)
+        return row
+
+    def insert(self, package: Package) -> bool:
+        """
+        Adds a package, or replaces the row with the same id. The package
+        becomes the object handed out for its row.
+
+        Overall complexity: O(1) amortized
+        """
+
+        row = self._row_for(package.id)
+        self._write(row, package)
+        self._objects[row] = package
+        return True
+
+    def bulk_insert(self, packages: Iterable[Package]) -> None:
+        """
+        Adds packages one row at a time without keeping them, the objects
+        can be dropped as soon as they are copied
+
+        Overall complexity: O(n)
+        """
+
+        for package in packages:
+            row = self._row_for(package.id)
+            self._write(row, package)
+            self._objects.pop(row, None)
+
+    def row(self, package_id: int) -> Optional[int]:
+        return self.index.get(package_id)
+
+    def package(self, row: int) -> Package:
+        """
+        The package object for a row, built from the columns the first
+        time. O(1)
+        """
+
+        package = self._objects.get(row)
+        if package is None:
+            address, city, state, zip_code = self.location_table[
+                self.locations[row]
+            ]
+            package = Package(
+                id=int(self.ids[row]),
+                address=address,
+                city=city,
+                state=state,
+                zip=zip_code,
+                weight=int(self.weights[row]),
+                deadline=int(self.deadlines[row]),
+                delivery_status=PackageStatus(int(self.statuses[row])),
+                special_notes=self.notes.get(row),
+                volume=int(self.volumes[row]),
+            )
+            self._objects[row] = package
+        return package
+
+    def get(self, package_id: int) -> Optional[Package]:
+        """The package with this id or None, O(1) expected"""
+
+        row = self.index.get(package_id)
+        return None if row is None else self.package(row)
+
+    def values(self) -> Iterator[Package]:
+        """Yields every package in row order, building objects as needed"""
+        for row in range(self.count):
+            yield self.package(row)
+
+    def materialized(self) -> Iterator[Package]:
+        """Yields only the packages already handed out, in row order"""
+        for row in sorted(self._objects):
+            yield self._objects[row]
+
+    def sync(self) -> None:
+        """
+        Copies every handed out package back into its row, so the columns
+        catch up with changes made through the objects
+
+        Overall complexity: O(k) for k handed out packages
+        """
+
+        for row, package in self._objects.items():
+            self._write(row, package)
+
+    def rows_with(self, *statuses: PackageStatus) -> np.ndarray:
+        """Rows in one of the statuses, O(n) vectorized"""
+
+        self.sync()
+        return np.flatnonzero(
+            np.isin(self.statuses[: self.count], [int(x) for x in statuses])
+        )
+
+    def set_status(self, rows: np.ndarray, status: PackageStatus) -> None:
+        """Sets the status of many rows and of their handed out packages"""
+
+        self.statuses[rows] = status
+        for row in np.asarray(rows).tolist():
+            package = self._objects.get(row)
+            if package is not None:
+                package.delivery_status = status
+
+    def status_counts(self) -> Dict[PackageStatus, int]:
+        """Packages per status, O(n) vectorized"""
+
+        self.sync()
+        counts = np.bincount(
+            self.statuses[: self.count], minlength=len(PackageStatus)
+        )
+        return {status: int(counts[status]) for status in PackageStatus}
+
+    def special_notes(self) -> Iterator[Tuple[int, str]]:
+        """(package id, notes) for every package with notes, by id"""
+
+        pairs = [(int(self.ids[row]), x) for row, x in self.notes.items()]
+        return iter(sorted(pairs))
+
+    def states(self) -> Iterator[Tuple[int, PackageStatus, str]]:
+        """(package id, status, address) per row, without building objects"""
+
+        self.sync()
+        for package_id, status, location in zip(
+            self.ids[: self.count].tolist(),
+            self.statuses[: self.count].tolist(),
+            self.locations[: self.count].tolist(),
+        ):
+            yield package_id, PackageStatus(status), self.location_table[
+                location
+            ][0]
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns"""
+        return sum(getattr(self, name).nbytes for name in _COLUMNS)
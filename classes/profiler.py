@@ -0,0 +1,180 @@
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterator, List, Tuple
+import json
+import time as clock
+import tracemalloc
+
+# returned by phase() while profiling is off, entering it does nothing
+_DISABLED = nullcontext()
+
+
+@dataclass
+class PhaseStats:
+    """Call count, latency and net allocations of one named phase"""
+
+    calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    allocated_bytes: int = 0
+    max_allocated_bytes: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "total_seconds": round(self.total_seconds, 6),
+            "mean_seconds": round(self.total_seconds / self.calls, 6)
+            if self.calls
+            else 0.0,
+            "max_seconds": round(self.max_seconds, 6),
+            "allocated_bytes": self.allocated_bytes,
+            "max_allocated_bytes": self.max_allocated_bytes,
+        }
+
+
+@dataclass
+class Profiler:
+    """
+    Collects per-phase timings and a collapsed call stack of the phases.
+    While disabled every hook is a single attribute check, so the hooks
+    can stay in place in production code.
+    """
+
+    enabled: bool = False
+    trace_memory: bool = False
+    stats: Dict[str, PhaseStats] = field(default_factory=dict)
+    # phase stack -> exclusive seconds, the flame graph input
+    stacks: Dict[Tuple[str, ...], float] = field(default_factory=dict)
+    # open phases as [name, started, seconds spent in child phases]
+    _open: List[List] = field(default_factory=list, repr=False)
+    _started_tracing: bool = field(default=False, repr=False)
+
+    def enable(self, trace_memory: bool = False) -> None:
+        """Starts collecting, tracemalloc only runs if asked for"""
+
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self) -> None:
+        self.stats.clear()
+        self.stacks.clear()
+        self._open.clear()
+
+    def phase(self, name: str) -> ContextManager:
+        """Context manager timing the block as phase name"""
+
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str) -> Iterator[None]:
+        memory = self.trace_memory and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if memory else 0
+        frame = [name, clock.perf_counter(), 0.0]
+        self._open.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = clock.perf_counter() - frame[1]
+            self._open.pop()
+            if self._open:
+                self._open[-1][2] += elapsed
+
+            stats = self.stats.setdefault(name, PhaseStats())
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            if memory:
+                allocated = tracemalloc.get_traced_memory()[0] - before
+                stats.allocated_bytes += allocated
+                stats.max_allocated_bytes = max(
+                    stats.max_allocated_bytes, allocated
+                )
+
+            stack = tuple(open_frame[0] for open_frame in self._open) + (
+                name,
+            )
+            self.stacks[stack] = (
+                self.stacks.get(stack, 0.0) + elapsed - frame[2]
+            )
+
+    def profiled(self, name: str) -> Callable:
+        """Decorator timing every call of a function as phase name"""
+
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self._measure(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self) -> Dict[str, Dict]:
+        """Stats per phase, slowest total first"""
+
+        return {
+            name: stats.to_dict()
+            for name, stats in sorted(
+                self.stats.items(),
+                key=lambda item: item[1].total_seconds,
+                reverse=True,
+            )
+        }
+
+    def collapsed(self) -> List[str]:
+        """
+        Lines of "outer;inner microseconds", the collapsed stack format
+        flamegraph.pl and speedscope read
+        """
+
+        return [
+            f"{';'.join(stack)} {round(seconds * 1e6)}"
+            for stack, seconds in sorted(self.stacks.items())
+        ]
+
+    def dump(
+        self, directory: Path, name: str = "profile"
+    ) -> Tuple[Path, Path]:
+        """Writes name.json and name.folded into directory"""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        summary_path = directory / f"{name}.json"
+        stacks_path = directory / f"{name}.folded"
+
+        with open(summary_path, "w", encoding="utf-8") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+        with open(stacks_path, "w", encoding="utf-8") as stacks_file:
+            stacks_file.writelines(line + "\n" for line in self.collapsed())
+
+        return summary_path, stacks_path
+
+
+# shared by every hook in the code base
+PROFILER = Profiler()
+
+
+def phase(name: str) -> ContextManager:
+    """Times a block on the shared profiler"""
+    return PROFILER.phase(name)
+
+
+def profiled(name: str) -> Callable:
+    """Times every call of a function on the shared profiler"""
+    return PROFILER.profiled(name)
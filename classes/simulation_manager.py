@@ -1,17 +1,42 @@
+from .clock import SimClock, travel_seconds
+from .event_log import EventLog, LogLevel
+
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import List
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, List, Optional, Union
+import heapq
+
+
+@dataclass(order=True)
+class Event:
+    """A timestamped simulation event, ordered by time then schedule order"""
+
+    # seconds since midnight of the simulated day
+    time: int
+    sequence: int
+    kind: str = field(compare=False)
+    truck_id: Optional[int] = field(default=None, compare=False)
+    payload: Any = field(default=None, compare=False)
 
 
 @dataclass
 class SimulationManager:
-    current_time: datetime
-    simulation_end: datetime
-    events: List = field(default_factory=list)
+    """
+    The global clock, event queue and run totals. Times are whole seconds
+    since midnight of the simulated day, see SimClock.
+    """
+
+    current_time: int
+    simulation_end: int
+    clock: SimClock = field(default_factory=lambda: SimClock(date.today()))
+    event_log: EventLog = field(default_factory=EventLog)
     packages_delivered: int = 0
     total_milage: float = 0.0
+    package_count: int = 40
+    event_queue: List[Event] = field(default_factory=list, repr=False)
+    _sequence: int = field(default=0, repr=False)
 
-    def advance_time(self, travel_time: timedelta) -> None:
+    def advance_time(self, travel_time: int) -> None:
         """Advances global time"""
 
         if travel_time + self.current_time > self.simulation_end:
@@ -19,26 +44,98 @@ class SimulationManager:
         else:
             self.current_time += travel_time
 
-    def log_event(self, description: str) -> None:
-        """keeps track of simulation events"""
+    def schedule_event(
+        self,
+        time: int,
+        kind: str,
+        truck_id: Optional[int] = None,
+        payload: Any = None,
+    ) -> Event:
+        """
+        Adds an event to the queue, events at the same time run in the
+        order they were scheduled.
 
-        self.events.append(f"{self.current_time}: {description}")
+        Overall complexity: O(log E)
+        """
 
-    def get_current_time(self) -> datetime:
+        event = Event(time, self._sequence, kind, truck_id, payload)
+        self._sequence += 1
+        heapq.heappush(self.event_queue, event)
+        return event
+
+    def next_event(self, until: Optional[int] = None) -> Optional[Event]:
+        """
+        Pops the earliest event and moves the global clock to it. Returns
+        None once the queue is empty or the next event is past the end of
+        the simulation, or past until when given.
+
+        Overall complexity: O(log E)
+        """
+
+        if not self.event_queue:
+            return None
+
+        if self.event_queue[0].time > self.simulation_end:
+            self.current_time = self.simulation_end
+            return None
+
+        if until is not None and self.event_queue[0].time > until:
+            self.current_time = max(self.current_time, until)
+            return None
+
+        event = heapq.heappop(self.event_queue)
+        if event.time > self.current_time:
+            self.current_time = event.time
+        return event
+
+    def log_event(
+        self,
+        description: Union[str, Callable[[], str]],
+        kind: str = "info",
+        level: int = LogLevel.INFO,
+        truck_id: Optional[int] = None,
+        package_ids: Iterable[int] = (),
+    ) -> None:
+        """
+        keeps track of simulation events, pass a callable to defer
+        building the description until a sink needs it
+        """
+
+        self.event_log.record(
+            self.clock.to_datetime(self.current_time),
+            kind,
+            description,
+            level,
+            truck_id,
+            package_ids,
+        )
+
+    @property
+    def events(self) -> List[str]:
+        """Formatted events retained in memory"""
+
+        return [record.format() for record in self.event_log.records()]
+
+    def get_current_time(self) -> int:
         """Get the current time of the simulation"""
 
         return self.current_time
 
+    def current_datetime(self) -> datetime:
+        """The current time as a datetime, for reports"""
+
+        return self.clock.to_datetime(self.current_time)
+
     def is_simulation_over(self) -> bool:
         """return true if simulation has ended"""
 
         time_limit_reached = self.current_time >= self.simulation_end
-        all_packages_delivered = self.packages_delivered >= 40
+        all_packages_delivered = self.packages_delivered >= self.package_count
 
         return time_limit_reached or all_packages_delivered
 
     @staticmethod
-    def calculate_travel_time(distance: float, speed: int) -> timedelta:
-        """Calculates travel time"""
+    def calculate_travel_time(distance: float, speed: int) -> int:
+        """Calculates travel time in seconds"""
 
-        return timedelta(minutes=(60 * (distance / speed)))
+        return travel_seconds(distance, speed)
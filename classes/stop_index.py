@@ -0,0 +1,87 @@
+from .package import Package
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .graph import Graph
+
+
+@dataclass
+class StopIndex:
+    """
+    A truck's outstanding stops as parallel arrays, so the next stop can be
+    picked with one masked argmin over a distance matrix row.
+    """
+
+    packages: List[Package] = field(default_factory=list)
+    nodes: np.ndarray = field(
+        default_factory=lambda: np.zeros(0, dtype=np.int64)
+    )
+    deadlines: np.ndarray = field(
+        default_factory=lambda: np.zeros(0, dtype=np.float64)
+    )
+    open: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    positions: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, packages: List[Package], graph: "Graph") -> "StopIndex":
+        """
+        Indexes packages by destination node id and deadline in minutes
+
+        Overall complexity: O(p)
+        """
+
+        node_ids = graph.distance_matrix().node_ids
+        return cls(
+            packages=list(packages),
+            nodes=np.fromiter(
+                (
+                    node_ids[graph.get_node(address=package.address)]
+                    for package in packages
+                ),
+                dtype=np.int64,
+                count=len(packages),
+            ),
+            deadlines=np.fromiter(
+                (package.deadline for package in packages),
+                dtype=np.float64,
+                count=len(packages),
+            ),
+            open=np.ones(len(packages), dtype=bool),
+            positions={
+                id(package): idx for idx, package in enumerate(packages)
+            },
+        )
+
+    def nearest(
+        self, row: np.ndarray, now: float, speed: float
+    ) -> Optional[int]:
+        """
+        Position of the closest open stop that can still be reached before
+        its deadline, or of the closest open stop if none can.
+
+        Overall complexity: O(p), vectorized
+        """
+
+        if not self.open.any():
+            return None
+
+        distances = row[self.nodes]
+        feasible = self.open & (now + distances * 60 / speed <= self.deadlines)
+        mask = feasible if feasible.any() else self.open
+
+        candidates = np.where(mask, distances, np.inf)
+        position = int(np.argmin(candidates))
+        if not np.isfinite(candidates[position]):
+            return None
+        return position
+
+    def close(self, package: Package) -> None:
+        """Marks a package's stop as visited, O(1)"""
+
+        position = self.positions.get(id(package))
+        if position is not None:
+            self.open[position] = False
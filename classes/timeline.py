@@ -0,0 +1,179 @@
+from .clock import SimClock
+from .package import Package, PackageStatus
+from .package_store import PackageStore
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+
+@dataclass
+class PackageState:
+    """Where a package stood at a point in time"""
+
+    package_id: int
+    status: PackageStatus
+    address: str
+    since: datetime
+
+
+@dataclass
+class PackageTimeline:
+    """
+    Append-only record of package state transitions at simulation seconds.
+    Records are kept in plain lists while the simulation runs and compiled
+    into arrays sorted by (package, time) on the first query, so each
+    lookup is a binary search instead of a replay. Queries take and
+    return datetimes through the clock.
+    """
+
+    clock: SimClock
+    # parallel columns, one entry per transition in the order recorded
+    package_ids: List[int] = field(default_factory=list)
+    seconds: List[int] = field(default_factory=list)
+    statuses: List[int] = field(default_factory=list)
+    addresses: List[int] = field(default_factory=list)
+    # interned address strings, addresses holds indexes into it
+    address_table: List[str] = field(default_factory=list)
+    _address_ids: Dict[str, int] = field(default_factory=dict, repr=False)
+    _compiled: Optional[Dict] = field(default=None, repr=False)
+
+    def record(
+        self,
+        package_id: int,
+        time: int,
+        status: PackageStatus,
+        address: str,
+    ) -> None:
+        """Appends a transition, O(1) amortized"""
+
+        address_id = self._address_ids.get(address)
+        if address_id is None:
+            address_id = len(self.address_table)
+            self._address_ids[address] = address_id
+            self.address_table.append(address)
+
+        self.package_ids.append(package_id)
+        self.seconds.append(time)
+        self.statuses.append(int(status))
+        self.addresses.append(address_id)
+        self._compiled = None
+
+    def record_package(self, package: Package, time: int) -> None:
+        """Appends a package's current status and address, O(1)"""
+        self.record(package.id, time, package.delivery_status, package.address)
+
+    def record_packages(
+        self, packages: Union[Iterable[Package], PackageStore], time: int
+    ) -> None:
+        """
+        Appends every package's current state, read from the columns for
+        a PackageStore, O(n)
+        """
+
+        if isinstance(packages, PackageStore):
+            for package_id, status, address in packages.states():
+                self.record(package_id, time, status, address)
+        else:
+            for package in packages:
+                self.record_package(package, time)
+
+    def _compile(self) -> Dict:
+        """
+        Sorts the columns by package then time, later records winning ties,
+        and builds one composite search key per record.
+
+        Overall complexity: O(m log m) for m records, once per change
+        """
+
+        if self._compiled is not None:
+            return self._compiled
+
+        package_ids = np.asarray(self.package_ids, dtype=np.int64)
+        seconds = np.asarray(self.seconds, dtype=np.int64)
+        order = np.lexsort((seconds, package_ids))
+
+        unique_ids, ranks = np.unique(package_ids[order], return_inverse=True)
+        starts = np.searchsorted(ranks, np.arange(len(unique_ids)))
+        offset = int(seconds.min()) if len(seconds) else 0
+        span = (int(seconds.max()) - offset + 2) if len(seconds) else 1
+
+        self._compiled = {
+            "ids": unique_ids,
+            "rank_of": {int(x): rank for rank, x in enumerate(unique_ids)},
+            "starts": starts,
+            "offset": offset,
+            "span": span,
+            # rank * span + time orders records by package, then time
+            "keys": ranks * span + (seconds[order] - offset),
+            "seconds": seconds[order],
+            "statuses": np.asarray(self.statuses, dtype=np.int8)[order],
+            "addresses": np.asarray(self.addresses, dtype=np.int64)[order],
+        }
+        return self._compiled
+
+    def _query_key(self, compiled: Dict, time: datetime) -> int:
+        """time as a key offset, clamped into the timeline's span"""
+
+        seconds = self.clock.seconds(time) - compiled["offset"]
+        return min(max(seconds, -1), compiled["span"] - 1)
+
+    def _state(
+        self, compiled: Dict, package_id: int, position: int
+    ) -> PackageState:
+        return PackageState(
+            package_id,
+            PackageStatus(compiled["statuses"][position]),
+            self.address_table[compiled["addresses"][position]],
+            self.clock.to_datetime(int(compiled["seconds"][position])),
+        )
+
+    def status_at(
+        self, package_id: int, time: datetime
+    ) -> Optional[PackageState]:
+        """
+        The package's state at time, None before its first record
+
+        Overall complexity: O(log m)
+        """
+
+        if not self.package_ids:
+            return None
+
+        compiled = self._compile()
+        rank = compiled["rank_of"].get(package_id)
+        if rank is None:
+            return None
+
+        key = rank * compiled["span"] + self._query_key(compiled, time)
+        position = int(np.searchsorted(compiled["keys"], key, "right")) - 1
+        if position < compiled["starts"][rank]:
+            return None
+        return self._state(compiled, package_id, position)
+
+    def snapshot_at(self, time: datetime) -> Dict[int, PackageState]:
+        """
+        Every recorded package's state at time, keyed by package id
+
+        Overall complexity: O(p log m) for p packages, one vectorized search
+        """
+
+        if not self.package_ids:
+            return {}
+
+        compiled = self._compile()
+        ranks = np.arange(len(compiled["ids"]), dtype=np.int64)
+        keys = ranks * compiled["span"] + self._query_key(compiled, time)
+        positions = np.searchsorted(compiled["keys"], keys, "right") - 1
+
+        return {
+            int(package_id): self._state(
+                compiled, int(package_id), int(position)
+            )
+            for package_id, position, start in zip(
+                compiled["ids"], positions, compiled["starts"]
+            )
+            if position >= start
+        }
@@ -1,33 +1,96 @@
-from .package import Package
+from .package import Package, PackageStatus
 from .graph import Node
 from .simulation_manager import SimulationManager
+from .loading import LoadingQueue
+from .profiler import profiled
 
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import List, Dict
+from math import inf
+from typing import List, Dict, Optional, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class Truck:
     id: int
     current_location: Node
     speed: int = 18
     capacity: int = 16
     contents: List = field(default_factory=list)
-    truck_time: datetime = datetime(2025, 8, 24, 8)
+    # seconds since midnight, 08:00 by default
+    truck_time: int = 8 * 3600
+    # kilos and litres the truck can carry, unlimited unless given
+    weight_limit: float = inf
+    volume_limit: float = inf
+    # kilos and litres on board
+    load_weight: int = 0
+    load_volume: int = 0
+
+    def fits(self, package: Package) -> bool:
+        """True when the package fits by count, weight and volume, O(1)"""
+
+        return (
+            self.capacity > 0
+            and self.load_weight + package.weight <= self.weight_limit
+            and self.load_volume + package.volume <= self.volume_limit
+        )
 
-    def load_package(self, package: Package) -> None:
-        """Load packages into the truck"""
+    def fits_all(self, packages: List[Package]) -> bool:
+        """True when all of the packages fit at once, O(k)"""
+
+        return (
+            self.capacity >= len(packages)
+            and self.load_weight + sum(x.weight for x in packages)
+            <= self.weight_limit
+            and self.load_volume + sum(x.volume for x in packages)
+            <= self.volume_limit
+        )
+
+    def room(self) -> Tuple[int, float, float]:
+        """packages, kilos and litres that still fit"""
 
-        if self.capacity > 0:
-            package.delivry_status = "en route"
-            package.loading_time = self.truck_time
-            self.contents.append(package)
-            self.capacity -= 1
+        return (
+            self.capacity,
+            self.weight_limit - self.load_weight,
+            self.volume_limit - self.load_volume,
+        )
 
-    def deliver_package(self, node: Node, distance: float) -> timedelta:
+    def load_package(self, package: Package) -> None:
+        """Load a package into the truck, ValueError if it does not fit"""
+
+        if not self.fits(package):
+            raise ValueError(
+                f"Package {package.id} does not fit truck {self.id + 1}: "
+                + f"{self.capacity} packages, "
+                + f"{self.weight_limit - self.load_weight} kg and "
+                + f"{self.volume_limit - self.load_volume} l left"
+            )
+        package.delivery_status = PackageStatus.EN_ROUTE
+        package.loading_time = self.truck_time
+        self.contents.append(package)
+        self.capacity -= 1
+        self.load_weight += package.weight
+        self.load_volume += package.volume
+
+    def unload_package(self, package: Package) -> None:
+        """Takes a package off the truck without delivering it, O(p)"""
+
+        self.contents.remove(package)
+        self._free(package)
+
+    def _free(self, package: Package) -> None:
+        self.capacity += 1
+        self.load_weight -= package.weight
+        self.load_volume -= package.volume
+
+    def deliver_package(
+        self,
+        node: Node,
+        distance: float,
+        package: Optional[Package] = None,
+    ) -> int:
         """
-        removes a package and reports travel time to a node
+        removes a package and reports travel time to a node in seconds,
+        the given package if there is one, else the first bound for node
 
         Overall complexity: O(p)
         """
@@ -38,16 +101,18 @@ class Truck:
 
         # O(p), where p is the number of packages in the truck
         for idx, pkg in enumerate(self.contents):
+            if package is not None and pkg is not package:
+                continue
             if pkg.address == node.address:
                 self.truck_time += travel_time
                 package = self.contents.pop(idx)
-                package.delivery_status = "delivered"
+                package.delivery_status = PackageStatus.DELIVERED
                 package.delivery_time = self.truck_time
-                self.capacity += 1
+                self._free(package)
                 return travel_time
 
-    def travel_to_node(self, node: Node, distance: float) -> timedelta:
-        """Calculates travel time to a node"""
+    def travel_to_node(self, node: Node, distance: float) -> int:
+        """Calculates travel time to a node in seconds"""
 
         travel_time = SimulationManager.calculate_travel_time(
             distance, self.speed
@@ -55,102 +120,30 @@ class Truck:
         return travel_time
 
     def load_multipe_packages(self, packages: List[Package]) -> None:
-        """Load multiple packages into the truck"""
+        """Load multiple packages, skipping the ones that do not fit"""
         for package in packages:
-            if self.capacity > 0:
+            if self.fits(package):
                 self.load_package(package)
-                package.delivery_status = "en route"
 
     @staticmethod
+    @profiled("truck.load_trucks")
     def load_trucks(
         trucks: List["Truck"],
         packages: List[Package],
         special_cases: Dict,
-        current_time: datetime,
+        current_time: int,
+        truck_count: Optional[int] = None,
     ) -> List:
         """
-        method to handle truck loading logic
+        method to handle truck loading logic, returns the packages left at
+        the hub. Trucks with weight or volume limits are packed by
+        deadline first and then topped up best fit, see LoadingQueue.load.
+        Callers that load repeatedly should keep a LoadingQueue
+        instead of recompiling it every time.
 
-        Overall complexity: O(n log n), Δ(n).
+        Overall complexity: O(n log n)
         """
 
-        eligible_packages = []
-
-        # destruct packages that need grouped, O(1).
-        grouped_packages: List = [
-            package
-            for package in packages
-            if package.id in special_cases["must_be_grouped"]
-            and package.delivery_status != "delivered"
-            and package.delivery_status != "en route"
-        ]
-
-        # destruct delayed packages, O(d)
-        delayed_ids = []
-        for time_str, package_ids in special_cases["delayed"].items():
-            if (
-                datetime.strptime(time_str, "%H:%M").time()
-                > current_time.time()
-            ):
-                delayed_ids = package_ids
-
-        # mark delayed packages, O(d)
-        for package in packages:
-            if package.id in delayed_ids:
-                package.delivery_status = "delayed"
-
-        # filter out delayed packages
-        # O(n log n) if we have delayed packages, O(1) otherwise.
-        if len(delayed_ids) > 0:
-            eligible_packages.extend(
-                sorted(
-                    [
-                        package
-                        for package in packages
-                        if package.id not in delayed_ids
-                        and package not in grouped_packages
-                    ],
-                    key=lambda package: package.delivery_deadline,
-                )
-            )
-        else:
-            eligible_packages.extend(packages)
-
-        # greedily load each truck.
-        # prioritizing loading by special cases first, then by deadlines.
-        # O(t + g + n) -> O(n)
-        for truck in trucks:
-            to_remove = []
-            if truck.id + 1 in special_cases["specific_truck"].keys():
-                needed_in_current_truck: List = special_cases[
-                    "specific_truck"
-                ][truck.id + 1]
-                for package in eligible_packages:
-                    if (
-                        truck.capacity > 0
-                        and package.id in needed_in_current_truck
-                    ):
-                        package.delivery_status = "en route"
-                        truck.load_package(package)
-                        to_remove.append(package)
-
-                for package in to_remove:
-                    eligible_packages.remove(package)
-
-            if len(grouped_packages) > 0 and truck.capacity >= len(
-                grouped_packages
-            ):
-                truck.load_multipe_packages(grouped_packages)
-                grouped_packages = []
-
-            while truck.capacity > 0 and len(eligible_packages) > 0:
-                package = eligible_packages.pop(0)
-                package.delivery_status = "en route"
-                truck.load_package(package)
-
-        # combine leftover packages into single list, O(n)
-        return [
-            p
-            for p in packages
-            if p.delivery_status == "at hub" or p.delivery_status == "delayed"
-        ]
+        queue = LoadingQueue.compile(packages, special_cases, truck_count)
+        queue.load(trucks, current_time)
+        return queue.leftovers()
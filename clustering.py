@@ -0,0 +1,420 @@
+__doc__ = """
+Cluster-first, route-second trip planning.
+
+Partitions the packages at the hub into one geographic cluster per truck
+with capacity-constrained k-medoids over the shortest path distances,
+then splits every cluster into trips and routes each trip with the local
+search optimizer. Clusters share nothing, so they are routed in parallel
+worker processes when asked to, each with only its own slice of the
+distance matrix.
+
+Clusters pay off on large days with many trucks, where the greedy
+loader sends every truck across the whole map. On a small day with a
+few trucks the areas are too coarse and greedy loading drives less.
+"""
+
+from classes import Graph, Node, Package
+from classes.clock import available_times, to_minutes
+from insertion_solver import Plan, Trip
+from route_optimizer import optimize_route
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from math import ceil
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Unit:
+    """Packages that have to stay together, one stop or a group"""
+
+    packages: List[Package] = field(default_factory=list)
+    # distance matrix indexes of the unit's stops
+    nodes: List[int] = field(default_factory=list)
+    # the truck id the unit is restricted to, -1 for any
+    truck: int = -1
+    # minutes since midnight
+    available: float = 0.0
+    deadline: float = 0.0
+
+
+def _units(
+    packages: List[Package],
+    graph: Graph,
+    special_cases: Dict,
+    truck_count: int,
+    start: float,
+) -> List[_Unit]:
+    """
+    One unit per group that must ride together, per truck restricted stop
+    and per other stop, packages keep their input order within a unit
+
+    Overall complexity: O(n)
+    """
+
+    node_ids = graph.distance_matrix().node_ids
+    available: Dict[int, float] = {
+        package_id: max(start, to_minutes(arrival))
+        for package_id, arrival in available_times(special_cases).items()
+    }
+
+    truck_of: Dict[int, int] = {
+        package_id: truck_number - 1
+        for truck_number, package_ids in special_cases[
+            "specific_truck"
+        ].items()
+        if truck_number <= truck_count
+        for package_id in package_ids
+    }
+    grouped_ids = set(special_cases["must_be_grouped"])
+
+    group = _Unit()
+    units: Dict[Tuple[int, int], _Unit] = {}
+    for package in packages:
+        if package.id in grouped_ids:
+            unit = group
+        else:
+            node = node_ids[graph.get_node(address=package.address)]
+            unit = units.setdefault(
+                (node, truck_of.get(package.id, -1)), _Unit()
+            )
+        unit.packages.append(package)
+
+    result = ([group] if group.packages else []) + list(units.values())
+    for unit in result:
+        unit.nodes = sorted(
+            {
+                node_ids[graph.get_node(address=package.address)]
+                for package in unit.packages
+            }
+        )
+        restricted = {
+            truck_of[package.id]
+            for package in unit.packages
+            if package.id in truck_of
+        }
+        unit.truck = min(restricted) if restricted else -1
+        unit.available = max(
+            available.get(package.id, start) for package in unit.packages
+        )
+        unit.deadline = min(package.deadline for package in unit.packages)
+    return result
+
+
+def partition(
+    packages: List[Package],
+    graph: Graph,
+    hub: Node,
+    special_cases: Dict,
+    truck_count: int,
+    start: float = 0.0,
+    max_iterations: int = 20,
+) -> List[List[Package]]:
+    """
+    Splits packages into one cluster per truck with k-medoids over the
+    delivery nodes. Every cluster holds about an equal share of packages,
+    units are assigned in order of regret (how much worse their second
+    choice is) to the nearest medoid that still has room, then every
+    medoid moves to the member node closest to the rest of its cluster.
+
+    Truck restrictions pin a unit to that truck's cluster, a group that
+    must ride together is assigned as one unit.
+
+    Overall complexity: O(i * u * (k + c)) for i iterations over u units,
+    k trucks and c candidate nodes
+    """
+
+    clusters: List[List[Package]] = [[] for _ in range(truck_count)]
+    units = _units(packages, graph, special_cases, truck_count, start)
+    if not units or not truck_count:
+        return clusters
+
+    matrix = graph.distance_matrix().matrix
+    candidates = np.array(
+        sorted({node for unit in units for node in unit.nodes}),
+        dtype=np.int64,
+    )
+    column_of = {int(node): col for col, node in enumerate(candidates)}
+
+    # O(u * c) - mean distance from each unit's stops to every candidate
+    distance = np.array(
+        [matrix[unit.nodes][:, candidates].mean(axis=0) for unit in units]
+    )
+    weights = np.array([len(unit.packages) for unit in units])
+    pinned = np.array([unit.truck for unit in units])
+    share = ceil(weights.sum() / truck_count)
+
+    # maximin start: the candidate farthest from the hub, then each next
+    # one as far as possible from those already chosen
+    hub_index = graph.distance_matrix().node_ids[hub]
+    gap = matrix[hub_index, candidates].copy()
+    medoids: List[int] = []
+    for _ in range(min(truck_count, len(candidates))):
+        medoids.append(int(np.argmax(gap)))
+        gap = np.minimum(gap, matrix[candidates[medoids[-1]], candidates])
+        gap[medoids] = -1
+    while len(medoids) < truck_count:
+        medoids.append(medoids[-1])
+
+    assignment = np.full(len(units), -1)
+    for _ in range(max_iterations):
+        # O(u * k) - pinned units first, then by regret
+        load = np.zeros(truck_count)
+        assignment[:] = -1
+        for idx in np.flatnonzero(pinned >= 0):
+            assignment[idx] = pinned[idx]
+            load[pinned[idx]] += weights[idx]
+
+        free = np.flatnonzero(pinned < 0)
+        costs = distance[np.ix_(free, medoids)]
+        ranked = np.sort(costs, axis=1)
+        regret = (
+            ranked[:, 1] - ranked[:, 0]
+            if truck_count > 1
+            else np.zeros(len(free))
+        )
+        for row in np.argsort(-regret, kind="stable"):
+            idx = free[row]
+            for cluster in np.argsort(costs[row], kind="stable"):
+                if load[cluster] + weights[idx] <= share:
+                    break
+            else:
+                # nothing has room left, the emptiest cluster takes it
+                cluster = int(np.argmin(load))
+            assignment[idx] = cluster
+            load[cluster] += weights[idx]
+
+        # O(u * c) - each medoid moves to its best member node
+        moved = list(medoids)
+        for cluster in range(truck_count):
+            members = np.flatnonzero(assignment == cluster)
+            if not len(members):
+                continue
+            own = [
+                column_of[node] for idx in members for node in units[idx].nodes
+            ]
+            totals = weights[members] @ distance[np.ix_(members, own)]
+            moved[cluster] = own[int(np.argmin(totals))]
+        if moved == medoids:
+            break
+        medoids = moved
+
+    for idx, cluster in enumerate(assignment):
+        clusters[cluster].extend(units[idx].packages)
+    return clusters
+
+
+def _trips(
+    units: List[_Unit], capacity: int
+) -> List[Tuple[float, List[Package]]]:
+    """
+    Fills trips of up to capacity packages in order of availability then
+    deadline, starting a new trip whenever the next unit arrives later. A
+    unit only spills over into the next trip when it is larger than a
+    whole truck. Returns (available, packages) per trip.
+
+    Overall complexity: O(u log u)
+    """
+
+    trips: List[Tuple[float, List[Package]]] = []
+    load: List[Package] = []
+    ready = 0.0
+    for unit in sorted(units, key=lambda x: (x.available, x.deadline)):
+        # a trip never waits at the hub for packages that are not there yet
+        if load and (
+            len(load) + len(unit.packages) > capacity
+            or unit.available > ready
+        ):
+            trips.append((ready, load))
+            load = []
+        for package in unit.packages:
+            if len(load) == capacity:
+                trips.append((ready, load))
+                load = []
+            load.append(package)
+            ready = unit.available
+    if load:
+        trips.append((ready, load))
+    return trips
+
+
+def _route_cluster(
+    graph: Graph,
+    hub: Node,
+    truck_id: int,
+    trips: List[Tuple[float, List[Package]]],
+    start: float,
+    speed: float,
+    time_budget: float,
+) -> List[Trip]:
+    """
+    Routes a truck's trips one after the other, each leaving the hub once
+    the truck is back and its packages have arrived
+
+    Overall complexity: O(t * k * s^2), see route_optimizer.optimize_route
+    """
+
+    distance_matrix = graph.distance_matrix()
+    node_ids = distance_matrix.node_ids
+    matrix = distance_matrix.matrix
+    per_mile = 60 / speed
+    hub_index = node_ids[hub]
+
+    routed: List[Trip] = []
+    returns = start
+    for ready, packages in trips:
+        depart = max(returns, ready)
+        order = optimize_route(
+            hub,
+            packages,
+            graph,
+            speed,
+            round(depart * 60),
+            time_budget=time_budget,
+        ).packages
+
+        trip = Trip(truck_id=truck_id, depart=depart)
+        previous = hub_index
+        clock = depart
+        for package in order:
+            node = node_ids[graph.get_node(address=package.address)]
+            if trip.stops and node == previous:
+                trip.stops[-1].append(package)
+            else:
+                trip.distance += matrix[previous, node]
+                clock += matrix[previous, node] * per_mile
+                trip.stops.append([package])
+                trip.arrivals.append(clock)
+                previous = node
+            trip.late += clock > package.deadline
+        trip.distance = float(trip.distance + matrix[previous, hub_index])
+        trip.returns = depart + trip.distance * per_mile
+        returns = trip.returns
+        routed.append(trip)
+    return routed
+
+
+def _subgraph(graph: Graph, hub: Node, packages: List[Package]) -> Graph:
+    """
+    The hub and a cluster's stops with their slice of the distance
+    matrix, all a worker needs to route the cluster
+
+    Overall complexity: O(c^2) for c stops
+    """
+
+    nodes = [hub]
+    for package in packages:
+        node = graph.get_node(address=package.address)
+        if node not in nodes:
+            nodes.append(node)
+
+    indexes = [graph.node_ids[node] for node in nodes]
+    subgraph = Graph()
+    subgraph.add_nodes(nodes)
+    subgraph.attach_distance_matrix(
+        graph.distance_matrix().matrix[np.ix_(indexes, indexes)]
+    )
+    return subgraph
+
+
+def _route_remote(
+    subgraph: Graph,
+    truck_id: int,
+    trips: List[Tuple[float, List[Package]]],
+    start: float,
+    speed: float,
+    time_budget: float,
+) -> List[Trip]:
+    """Worker entry point, the hub is always the subgraph's first node"""
+
+    hub = min(subgraph.node_ids, key=subgraph.node_ids.get)
+    return _route_cluster(
+        subgraph, hub, truck_id, trips, start, speed, time_budget
+    )
+
+
+def plan_clusters(
+    packages: List[Package],
+    graph: Graph,
+    hub: Node,
+    special_cases: Dict,
+    truck_count: int,
+    start_time: int,
+    speed: float = 18,
+    capacity: int = 16,
+    workers: int = 1,
+    max_iterations: int = 20,
+    time_budget: float = 0.5,
+) -> Plan:
+    """
+    Plans the day cluster first, route second: partition gives every
+    truck its own area, each area is cut into trips of at most capacity
+    packages and every trip is routed on its own with optimize_route.
+
+    With workers > 1 the clusters are routed in a process pool, each
+    worker gets a subgraph holding only its cluster's stops. The trips
+    that come back are mapped onto the caller's packages by id.
+
+    Overall complexity: O(partition + t * k * s^2 / w) for t trips of
+    s stops, k improving passes and w workers
+    """
+
+    start = to_minutes(start_time)
+    clusters = partition(
+        packages,
+        graph,
+        hub,
+        special_cases,
+        truck_count,
+        start,
+        max_iterations,
+    )
+    jobs = [
+        (
+            truck_id,
+            _trips(
+                _units(cluster, graph, special_cases, truck_count, start),
+                capacity,
+            ),
+        )
+        for truck_id, cluster in enumerate(clusters)
+        if cluster
+    ]
+
+    plan = Plan()
+    if workers > 1 and len(jobs) > 1:
+        by_id = {package.id: package for package in packages}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _route_remote,
+                    _subgraph(
+                        graph,
+                        hub,
+                        [x for _, trip in trips for x in trip],
+                    ),
+                    truck_id,
+                    trips,
+                    start,
+                    speed,
+                    time_budget,
+                )
+                for truck_id, trips in jobs
+            ]
+            for future in futures:
+                for trip in future.result():
+                    trip.stops = [
+                        [by_id[package.id] for package in stop]
+                        for stop in trip.stops
+                    ]
+                    plan.trips.append(trip)
+    else:
+        for truck_id, trips in jobs:
+            plan.trips.extend(
+                _route_cluster(
+                    graph, hub, truck_id, trips, start, speed, time_budget
+                )
+            )
+    return plan
@@ -1,3 +1,3 @@
-from .data import load_data
+from .data import load_data, parse_special_cases
 
-__all__ = ["load_data"]
+__all__ = ["load_data", "parse_special_cases"]
@@ -0,0 +1,266 @@
+from classes import Hashtable, Package, PackageStatus, PackageStore
+from classes.graph import Graph, Node
+from .data import parse_package_data, parse_distance_data
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".cache"
+
+
+def _file_hash(path: Path) -> str:
+    """sha256 of a file's contents"""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stamp(path: Path, with_hash: bool = True) -> Dict:
+    """mtime, size and optionally content hash of a source file"""
+
+    stat = os.stat(path)
+    stamp = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if with_hash:
+        stamp["sha256"] = _file_hash(path)
+    return stamp
+
+
+def _cache_key(package_path: Path, distance_path: Path) -> str:
+    """cache directory name for a pair of source files"""
+
+    sources = "|".join(
+        str(Path(path).resolve()) for path in (package_path, distance_path)
+    )
+    return hashlib.sha256(sources.encode("utf-8")).hexdigest()[:16]
+
+
+def _is_fresh(entry: Path, sources: Dict[str, Path]) -> bool:
+    """
+    Checks a cache entry against its sources. Matching mtime and size is
+    trusted as is, otherwise the content hash decides.
+    """
+
+    try:
+        with open(entry / "manifest.json", encoding="utf-8") as manifest:
+            manifest = json.load(manifest)
+    except (OSError, ValueError):
+        return False
+
+    if manifest.get("version") != CACHE_VERSION:
+        return False
+
+    for name, path in sources.items():
+        recorded = manifest["sources"].get(name, {})
+        stamp = _source_stamp(path, with_hash=False)
+        if (
+            recorded.get("mtime_ns") == stamp["mtime_ns"]
+            and recorded.get("size") == stamp["size"]
+        ):
+            continue
+        if recorded.get("sha256") != _file_hash(path):
+            return False
+
+    return True
+
+
+def _write_entry(
+    entry: Path,
+    sources: Dict[str, Path],
+    packages: Hashtable,
+    graph: Graph,
+) -> None:
+    """
+    Writes the compiled tables into a fresh directory and moves it into
+    place, so concurrent workers never see a partial entry.
+    """
+
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".staging-"))
+
+    try:
+        nodes = graph.distance_matrix().nodes()
+        size = len(nodes)
+
+        # raw edge weights, nan where the table had no entry
+        weights = np.full((size, size), np.nan, dtype=np.float64)
+        for node, edges in graph.get_adjacency_list().items():
+            row = graph.node_ids[node]
+            for adjacent_node, weight in edges.items():
+                weights[row, graph.node_ids[adjacent_node]] = float(
+                    getattr(weight, "value", weight)
+                )
+
+        np.save(staging / "weights.npy", weights)
+        np.save(staging / "shortest.npy", graph.distance_matrix().matrix)
+
+        package_list = sorted(packages.values(), key=lambda p: p.id)
+
+        def width(attribute: str) -> int:
+            return max(
+                [len(str(getattr(p, attribute) or "")) for p in package_list]
+                + [1]
+            )
+
+        package_table = np.array(
+            [
+                (
+                    package.id,
+                    package.address,
+                    package.city,
+                    package.state,
+                    int(package.zip),
+                    package.weight,
+                    package.deadline,
+                    package.special_notes or "",
+                    package.volume,
+                )
+                for package in package_list
+            ],
+            dtype=[
+                ("id", "i8"),
+                ("address", f"U{width('address')}"),
+                ("city", f"U{width('city')}"),
+                ("state", f"U{width('state')}"),
+                ("zip", "i8"),
+                ("weight", "i8"),
+                ("deadline", "i4"),
+                ("notes", f"U{width('special_notes')}"),
+                ("volume", "i4"),
+            ],
+        )
+        np.save(staging / "packages.npy", package_table)
+
+        with open(staging / "nodes.json", "w", encoding="utf-8") as table:
+            json.dump([[node.name, node.address] for node in nodes], table)
+
+        with open(
+            staging / "manifest.json", "w", encoding="utf-8"
+        ) as manifest_file:
+            json.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "sources": {
+                        name: _source_stamp(path)
+                        for name, path in sources.items()
+                    },
+                },
+                manifest_file,
+            )
+
+        if entry.exists():
+            shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+    except OSError:
+        # another worker won the race, its entry is just as good
+        if not entry.exists():
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _read_entry(
+    entry: Path, columnar: bool = False
+) -> Tuple[Union[Hashtable, PackageStore], Graph]:
+    """
+    Rebuilds the hashtable and graph from a cache entry. The matrices are
+    memory mapped copy-on-write, so processes share the pages until one
+    of them changes a value. columnar reads the package table straight
+    into a PackageStore.
+    """
+
+    with open(entry / "nodes.json", encoding="utf-8") as node_file:
+        nodes = [Node(*node) for node in json.load(node_file)]
+
+    weights = np.load(entry / "weights.npy", mmap_mode="c")
+    shortest = np.load(entry / "shortest.npy", mmap_mode="c")
+
+    graph = Graph()
+    graph.add_nodes(nodes)
+    rows, columns = np.nonzero(~np.isnan(weights))
+    adjacency_list = graph.get_adjacency_list()
+    for row, column, weight in zip(
+        rows.tolist(), columns.tolist(), weights[rows, columns].tolist()
+    ):
+        adjacency_list[nodes[row]][nodes[column]] = weight
+    graph.attach_distance_matrix(shortest)
+
+    package_table = np.load(entry / "packages.npy", mmap_mode="r")
+    if columnar:
+        return (PackageStore.from_table(package_table), graph)
+
+    packages = Hashtable()
+    packages.bulk_insert(
+        Package(
+            id=package_id,
+            address=address,
+            city=city,
+            state=state,
+            zip=zip_code,
+            weight=weight,
+            deadline=deadline,
+            delivery_status=PackageStatus.AT_HUB,
+            special_notes=notes,
+            volume=volume,
+        )
+        for (
+            package_id,
+            address,
+            city,
+            state,
+            zip_code,
+            weight,
+            deadline,
+            notes,
+            volume,
+        ) in package_table.tolist()
+    )
+
+    return (packages, graph)
+
+
+def load_cached_data(
+    package_path: Path,
+    distance_path: Path,
+    cache_dir: Optional[Path] = None,
+    columnar: bool = False,
+) -> Tuple[Union[Hashtable, PackageStore], Graph]:
+    """
+    Loads package and distance data through the compiled cache, parsing
+    the CSVs and writing a new entry only when they changed. columnar
+    returns a PackageStore, a cold load still parses into a Hashtable
+    first to write the entry.
+
+    Overall complexity: O(n + V^2) warm, O(n + V^3) cold
+    """
+
+    sources = {
+        "packages": Path(package_path),
+        "distances": Path(distance_path),
+    }
+    entry = Path(cache_dir or DEFAULT_CACHE_DIR) / _cache_key(
+        package_path, distance_path
+    )
+
+    if _is_fresh(entry, sources):
+        return _read_entry(entry, columnar)
+
+    packages: Hashtable = Hashtable()
+    parse_package_data(packages, package_path)
+    graph: Graph = Graph()
+    parse_distance_data(graph, distance_path)
+
+    _write_entry(entry, sources, packages, graph)
+    if columnar:
+        return (PackageStore.from_packages(packages.values()), graph)
+    return (packages, graph)
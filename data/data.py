@@ -1,12 +1,21 @@
-from classes import Hashtable, Package
+from classes import Hashtable, Package, PackageStatus, PackageStore
+from classes.package import minutes_of
+from classes.profiler import profiled
 
 import re
-from classes.graph import Graph, Node, Edge, Weight
+from classes.graph import Graph, Node
 
 import csv
 from pathlib import Path
 from datetime import datetime, time
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+TRUCK_NOTE = re.compile(r"only be on truck (\d+)", flags=re.IGNORECASE)
+DELAYED_NOTE = re.compile(
+    r"delayed.*until (\d{1,2}:\d{2} ?[ap]m)", flags=re.IGNORECASE
+)
+GROUPED_NOTE = re.compile(r"must be delivered with ([\d, ]+)", re.IGNORECASE)
+WRONG_ADDRESS_NOTE = re.compile(r"wrong address", flags=re.IGNORECASE)
 
 
 def address_normalizer(address: str) -> str:
@@ -40,11 +49,11 @@ def load_distance_data(
         return list(csv.reader(distance_data))
 
 
-def parse_package_data(hashtable: Hashtable) -> None:
-    """parses raw csv data and inserts it into a hash table."""
+def _read_packages(path: Path) -> Iterator[Package]:
+    """Yields a Package per CSV row"""
 
     # O(n) for each row in the CSV
-    for row in load_package_data():
+    for row in load_package_data(path):
         normalized_address = address_normalizer(row.get("Address"))
 
         deadline = row.get("Delivery Deadline")
@@ -53,65 +62,154 @@ def parse_package_data(hashtable: Hashtable) -> None:
         elif deadline[-2:].upper() == "AM" or "PM":
             deadline = datetime.strptime(deadline, "%I:%M %p").time()
 
-        hashtable.insert(
-            Package(
-                id=int(row.get("Package ID")),
-                address=normalized_address,
-                city=row.get("City"),
-                state=row.get("State"),
-                zip=int(row.get("Zip")),
-                weight=int(row.get("Weight KILO")),
-                delivery_deadline=deadline,
-                delivery_status='at hub',
-                special_notes=row.get("Special Notes"),
-            )
+        yield Package(
+            id=int(row.get("Package ID")),
+            address=normalized_address,
+            city=row.get("City"),
+            state=row.get("State"),
+            zip=int(row.get("Zip")),
+            weight=int(row.get("Weight KILO")),
+            deadline=minutes_of(deadline),
+            delivery_status=PackageStatus.AT_HUB,
+            special_notes=row.get("Special Notes"),
+            volume=int(row.get("Volume LITRE") or 0),
         )
 
 
-def parse_distance_data(graph: Graph) -> None:
+def parse_package_data(
+    hashtable: Union[Hashtable, PackageStore],
+    path=Path(__file__).parent / "WGUPS_Package_File.csv",
+) -> None:
+    """
+    parses raw csv data and inserts it into a hash table. A PackageStore
+    copies each row as it is read, so the objects never pile up.
+    """
+
+    # O(n) - a hashtable is sized once for the whole file
+    hashtable.bulk_insert(_read_packages(path))
+
+
+def parse_distance_data(
+    graph: Graph,
+    path=Path(__file__).parent / "WGUPS_Distance_Table.csv",
+) -> None:
     """
     Parses raw csv data and adds to a undirected graph
 
-    Overall complexity: O(n^2), due to nested loops
+    Overall complexity: O(n^2), linear in the number of table cells
     """
 
-    distance_matrix: List[List] = load_distance_data()
-    headers: List = distance_matrix[0]
+    distance_matrix: List[List] = load_distance_data(path)
 
     # O(n) create all nodes first
-    node_map = {}
-    for row in distance_matrix[1:]:
-        name: str = row[0]
-        address: str = address_normalizer(row[1])
-        node = Node(name.strip(), address.strip())
-        graph.add_node(node)
-        node_map[name.strip()] = node
-
-    # O(n^2) add edges
-    for row in distance_matrix[1:]:
-        from_node = node_map[row[0].strip()]
-        for i, distance in enumerate(row[2:], start=2):
-            if distance.strip():
-                to_node_name = headers[i].strip()
-                to_node = node_map[to_node_name]
-                weight = float(distance)
-                edge = Edge(to_node, weight)
-                graph.add_edge(from_node, edge)
-
-
-def load_data() -> Tuple[Hashtable, Graph]:
+    nodes: List[Node] = [
+        Node(row[0].strip(), address_normalizer(row[1]).strip())
+        for row in distance_matrix[1:]
+    ]
+    graph.add_nodes(nodes)
+
+    # O(n^2) add edges, columns follow the same order as the rows
+    graph.add_weights(nodes, [row[2:] for row in distance_matrix[1:]])
+
+
+def parse_special_cases(hashtable: Union[Hashtable, PackageStore]) -> Dict:
+    """
+    Builds the special case lookup from package special notes.
+
+    Overall complexity: O(n)
     """
-    Loads and parses package and delivery data
+
+    special_cases: Dict = {
+        "delayed": {},
+        "specific_truck": {},
+        "must_be_grouped": [],
+        "wrong_address": [],
+    }
+    grouped = set()
+
+    if isinstance(hashtable, PackageStore):
+        # only the rows with notes, without building their packages
+        package_notes = hashtable.special_notes()
+    else:
+        package_notes = (
+            (package.id, package.special_notes)
+            for package in sorted(hashtable.values(), key=lambda p: p.id)
+        )
+
+    # O(n) for each package
+    for package_id, notes in package_notes:
+        notes = notes or ""
+
+        truck_match = TRUCK_NOTE.search(notes)
+        if truck_match:
+            special_cases["specific_truck"].setdefault(
+                int(truck_match.group(1)), []
+            ).append(package_id)
+
+        delayed_match = DELAYED_NOTE.search(notes)
+        if delayed_match:
+            available = datetime.strptime(
+                delayed_match.group(1).replace(" ", "").upper(), "%I:%M%p"
+            ).strftime("%H:%M")
+            special_cases["delayed"].setdefault(available, []).append(
+                package_id
+            )
+
+        grouped_match = GROUPED_NOTE.search(notes)
+        if grouped_match:
+            grouped.add(package_id)
+            grouped.update(
+                int(grouped_id)
+                for grouped_id in grouped_match.group(1).split(",")
+                if grouped_id.strip()
+            )
+
+        if WRONG_ADDRESS_NOTE.search(notes):
+            special_cases["wrong_address"].append(package_id)
+
+    special_cases["must_be_grouped"] = sorted(grouped)
+    return special_cases
+
+
+@profiled("load_data")
+def load_data(
+    package_path: Optional[Path] = None,
+    distance_path: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    columnar: bool = False,
+) -> Tuple[Union[Hashtable, PackageStore], Graph]:
+    """
+    Loads and parses package and delivery data, defaulting to the bundled
+    WGUPS files. With a cache_dir the parsed data is read from (and
+    written to) the compiled cache instead. columnar returns the packages
+    as a PackageStore instead of a Hashtable.
 
     Overall complexity: O(n^2)
     """
 
-    packages: Hashtable = Hashtable()
+    if cache_dir is not None:
+        from .cache import load_cached_data
+
+        return load_cached_data(
+            package_path or Path(__file__).parent / "WGUPS_Package_File.csv",
+            distance_path
+            or Path(__file__).parent / "WGUPS_Distance_Table.csv",
+            cache_dir,
+            columnar,
+        )
+
+    packages = PackageStore() if columnar else Hashtable()
     # O(n)
-    parse_package_data(packages)
+    if package_path is None:
+        parse_package_data(packages)
+    else:
+        parse_package_data(packages, package_path)
 
     distances: Graph = Graph()
     # O(n^2)
-    parse_distance_data(distances)
+    if distance_path is None:
+        parse_distance_data(distances)
+    else:
+        parse_distance_data(distances, distance_path)
 
     return (packages, distances)
@@ -0,0 +1,202 @@
+__doc__ = """
+Seeded generator for synthetic WGUPS data sets.
+
+Writes a distance table and a package file in the same CSV layout as
+WGUPS_Distance_Table.csv and WGUPS_Package_File.csv.
+
+usage: python -m data.generator LOCATIONS PACKAGES OUT_DIR [--seed N]
+"""
+
+import argparse
+import csv
+import math
+import random
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+STREETS = [
+    "Main St",
+    "State St",
+    "Oakland Ave",
+    "Canyon Rd",
+    "Dalton Ave",
+    "Lester St",
+    "Taylorsville Blvd",
+    "Price Ave",
+    "Valley Central Station",
+    "Heritage Dr",
+]
+
+# (cumulative probability, deadline) pairs, the rest are EOD
+DEADLINES = [(0.05, "9:00 AM"), (0.30, "10:30 AM")]
+
+DELAYED_NOTE = "Delayed on flight---will not arrive to depot until 9:05 am"
+TRUCK_NOTE = "Can only be on truck 2"
+WRONG_ADDRESS_NOTE = "Wrong address listed"
+
+
+def generate_locations(
+    count: int, rng: random.Random
+) -> List[Tuple[str, str, float, float]]:
+    """
+    Places the hub at the origin and scatters the other locations around
+    it, returning (name, address, x, y) in miles.
+    """
+
+    locations = [("Western Governors University", "HUB", 0.0, 0.0)]
+    for idx in range(1, count):
+        street = STREETS[idx % len(STREETS)]
+        locations.append(
+            (
+                f"Delivery Location {idx}",
+                f"{100 + idx * 10} {street}",
+                rng.uniform(-8.0, 8.0),
+                rng.uniform(-8.0, 8.0),
+            )
+        )
+    return locations
+
+
+def write_distance_table(
+    path: Path, locations: List[Tuple[str, str, float, float]], seed: int
+) -> None:
+    """
+    Writes a lower triangular distance table, road distance is the
+    straight line distance with a random detour factor.
+
+    Overall complexity: O(n^2)
+    """
+
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as distance_file:
+        writer = csv.writer(distance_file)
+        writer.writerow(
+            ["DISTANCE BETWEEN HUBS IN MILES", "Hub Address"]
+            + [name for name, _, _, _ in locations]
+        )
+        for row_idx, (name, address, x, y) in enumerate(locations):
+            row = [name, f" {address}"]
+            for other_x, other_y in (
+                (other[2], other[3]) for other in locations[:row_idx]
+            ):
+                straight = math.hypot(x - other_x, y - other_y)
+                row.append(f"{straight * rng.uniform(1.1, 1.4) + 0.1:.1f}")
+            row.append("0")
+            row.extend([""] * (len(locations) - row_idx - 1))
+            writer.writerow(row)
+
+
+def write_package_file(
+    path: Path,
+    packages: int,
+    locations: List[Tuple[str, str, float, float]],
+    rng: random.Random,
+) -> None:
+    """
+    Writes packages with deadlines and the special note types found in the
+    WGUPS package file: truck restriction, delayed, wrong address and must
+    be delivered with.
+
+    Overall complexity: O(m)
+    """
+
+    # one group of up to 6 packages that must ride together
+    group = set(rng.sample(range(1, packages + 1), min(6, packages)))
+    group_ids = sorted(group)
+    wrong_address = rng.randint(1, packages)
+
+    with open(path, "w", newline="", encoding="utf-8") as package_file:
+        writer = csv.writer(package_file)
+        writer.writerow(
+            [
+                "Package ID",
+                "Address",
+                "City",
+                "State",
+                "Zip",
+                "Delivery Deadline",
+                "Weight KILO",
+                "Special Notes",
+            ]
+        )
+        for package_id in range(1, packages + 1):
+            _, address, _, _ = rng.choice(locations[1:])
+
+            roll = rng.random()
+            deadline = "EOD"
+            for probability, value in DEADLINES:
+                if roll < probability:
+                    deadline = value
+                    break
+
+            notes = ""
+            if package_id in group:
+                others = [
+                    str(other) for other in group_ids if other != package_id
+                ]
+                notes = f"Must be delivered with {', '.join(others[:2])}"
+            elif package_id == wrong_address:
+                notes = WRONG_ADDRESS_NOTE
+            else:
+                roll = rng.random()
+                if roll < 0.10:
+                    notes = DELAYED_NOTE
+                elif roll < 0.125:
+                    notes = TRUCK_NOTE
+
+            writer.writerow(
+                [
+                    package_id,
+                    address,
+                    "Salt Lake City",
+                    "UT",
+                    84100 + rng.randint(0, 99),
+                    deadline,
+                    rng.randint(1, 88),
+                    notes,
+                ]
+            )
+
+
+def generate(
+    locations: int,
+    packages: int,
+    out_dir: Path,
+    seed: int = 0,
+) -> Tuple[Path, Path]:
+    """
+    Writes a synthetic distance table and package file to out_dir and
+    returns their paths. The same seed always produces the same files.
+    """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+
+    location_list = generate_locations(max(locations, 2), rng)
+
+    distance_path = out_dir / f"distances_{locations}.csv"
+    package_path = out_dir / f"packages_{packages}.csv"
+    write_distance_table(distance_path, location_list, seed)
+    write_package_file(package_path, packages, location_list, rng)
+
+    return (package_path, distance_path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the generator"""
+
+    parser = argparse.ArgumentParser(description="Generate WGUPS data.")
+    parser.add_argument("locations", type=int, help="number of locations")
+    parser.add_argument("packages", type=int, help="number of packages")
+    parser.add_argument("out_dir", type=Path, help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = generate(args.locations, args.packages, args.out_dir, args.seed)
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
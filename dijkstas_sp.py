@@ -1,44 +1,479 @@
-from classes import Node, Graph
-from typing import Dict
+__doc__ = """
+Single-source shortest paths over the road network.
+
+The Graph keys its adjacency by Node objects, which is convenient but
+slow to search and too large for road networks with 100k+ intersections,
+where the all-pairs DistanceMatrix does not fit either. RoadNetwork packs
+the graph into flat lists indexed by integer node id, and the searches
+here work on those ids with (distance, node) tuples on the heap:
+
+    dijkstra                exact distances from one node, optionally
+                            stopping once a set of targets is settled
+                            and optionally guided by an A* heuristic
+    Landmarks               lower bounds from a few precomputed landmark
+                            searches, the A* heuristic for graphs without
+                            coordinates
+    ContractionHierarchy    preprocessing for many repeated queries
+"""
+
+from classes import Graph, Node
+from classes.distance_matrix import weight_value
+from classes.profiler import profiled
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import heapq
 
+INFINITY = float("inf")
 
-def shortest_path(starting_vertex: Node, graph: Graph) -> Dict:
+
+@dataclass
+class RoadNetwork:
+    """
+    An undirected graph in compressed sparse row form: the edges of node
+    i are targets[offsets[i]:offsets[i + 1]] with the matching weights.
+    Node ids follow Graph.node_ids.
     """
-    Implementation of Dijkstra's algorithm to find the shortest path
-    from a starting vertex to all other vertices in the graph.
 
-    Overall complexity: O((V + E) log V)
+    nodes: List[Node] = field(default_factory=list)
+    node_ids: Dict[Node, int] = field(default_factory=dict)
+    offsets: List[int] = field(default_factory=lambda: [0])
+    targets: List[int] = field(default_factory=list)
+    weights: List[float] = field(default_factory=list)
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "RoadNetwork":
+        """
+        Packs a graph, reading every Weight as a float and keeping the
+        shortest of parallel edges
+
+        Overall complexity: O(V + E)
+        """
+
+        node_ids = dict(graph.node_ids)
+        nodes = sorted(node_ids, key=node_ids.get)
+        adjacency = graph.get_adjacency_list()
+
+        network = cls(nodes=nodes, node_ids=node_ids)
+        for node in nodes:
+            edges: Dict[int, float] = {}
+            for adjacent_node, weight in adjacency.get(node, {}).items():
+                target = node_ids[adjacent_node]
+                value = weight_value(weight)
+                if value < edges.get(target, INFINITY):
+                    edges[target] = value
+            network.targets.extend(edges.keys())
+            network.weights.extend(edges.values())
+            network.offsets.append(len(network.targets))
+        return network
+
+    @classmethod
+    def from_edges(
+        cls, nodes: List[Node], edges: Iterable[Tuple[int, int, float]]
+    ) -> "RoadNetwork":
+        """
+        Builds a network straight from (node id, node id, weight) edges,
+        without a Graph in between
+
+        Overall complexity: O(V + E)
+        """
+
+        adjacency: List[Dict[int, float]] = [{} for _ in nodes]
+        for one, two, weight in edges:
+            if weight < adjacency[one].get(two, INFINITY):
+                adjacency[one][two] = weight
+                adjacency[two][one] = weight
+
+        network = cls(
+            nodes=list(nodes),
+            node_ids={node: idx for idx, node in enumerate(nodes)},
+        )
+        for edges_of in adjacency:
+            network.targets.extend(edges_of.keys())
+            network.weights.extend(edges_of.values())
+            network.offsets.append(len(network.targets))
+        return network
+
+    @property
+    def size(self) -> int:
+        return len(self.nodes)
+
+    def edges(self, node: int) -> Iterable[Tuple[int, float]]:
+        """(neighbor, weight) pairs of a node, O(degree)"""
+
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+
+def dijkstra(
+    network: RoadNetwork,
+    source: int,
+    targets: Optional[Iterable[int]] = None,
+    heuristic: Optional[Callable[[int], float]] = None,
+) -> Dict[int, float]:
     """
+    Distances from source to the nodes the search settled, by node id.
+    Nodes missing from the result are unreachable or were never needed.
 
-    # O(1) - Retrieving the pre-computed adjacency list
-    adjacency_list: Dict[Node, Dict[Node, float]] = graph.get_adjacency_list()
+    Given targets, such as a truck's remaining stops and the hub, the
+    search stops as soon as every reachable target is settled instead of
+    expanding the whole network.
 
-    shortest = {}
+    Given a heuristic, the search is A*: the heap is ordered by distance
+    plus the heuristic's lower bound on the distance left to the targets.
+    The heuristic has to be consistent, as Landmarks bounds are, for the
+    settled distances to stay exact.
 
-    min_heap = [[0, starting_vertex]]
-    while min_heap:
+    Overall complexity: O((V + E) log V), in practice proportional to the
+    part of the network closer than the farthest target
+    """
+
+    offsets = network.offsets
+    neighbors = network.targets
+    weights = network.weights
+
+    remaining: Optional[Set[int]] = None
+    if targets is not None:
+        remaining = set(targets)
+        if not remaining:
+            return {}
 
-        # O(log V) - heap operations
-        weight, node = heapq.heappop(min_heap)
+    settled: Dict[int, float] = {}
+    best: Dict[int, float] = {source: 0.0}
+    bound = heuristic(source) if heuristic else 0.0
+    heap: List[Tuple[float, int]] = [(bound, source)]
 
-        if node in shortest:
+    while heap:
+        # O(log V)
+        _, node = heapq.heappop(heap)
+        if node in settled:
             continue
 
-        shortest[node] = weight
-        if node in adjacency_list:
-            # O(E)
-            for adjacent_node, adjacent_weight in adjacency_list[node].items():
-                if adjacent_node not in shortest:
-                    # O(log v)
+        distance = best[node]
+        settled[node] = distance
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        # O(degree)
+        for idx in range(offsets[node], offsets[node + 1]):
+            adjacent = neighbors[idx]
+            candidate = distance + weights[idx]
+            if adjacent not in settled and candidate < best.get(
+                adjacent, INFINITY
+            ):
+                best[adjacent] = candidate
+                if heuristic:
                     heapq.heappush(
-                        min_heap,
-                        [weight + adjacent_weight, adjacent_node],
+                        heap, (candidate + heuristic(adjacent), adjacent)
                     )
+                else:
+                    heapq.heappush(heap, (candidate, adjacent))
+
+    return settled
+
+
+def distances_to(
+    network: RoadNetwork, source: int, targets: Iterable[int]
+) -> Dict[int, float]:
+    """
+    Distances from source to every target, inf for unreachable ones
+
+    Overall complexity: see dijkstra
+    """
+
+    targets = list(targets)
+    settled = dijkstra(network, source, targets)
+    return {target: settled.get(target, INFINITY) for target in targets}
+
+
+@profiled("shortest_path")
+def shortest_path(starting_vertex: Node, graph: Graph) -> Dict:
+    """
+    Implementation of Dijkstra's algorithm to find the shortest path
+    from a starting vertex to all other vertices in the graph, -1 for
+    the ones that cannot be reached.
+
+    Overall complexity: O((V + E) log V)
+    """
+
+    # O(V + E) - integer ids and float weights for the search
+    network = RoadNetwork.from_graph(graph)
+    settled = dijkstra(network, network.node_ids[starting_vertex])
+
+    return {
+        node: settled.get(idx, -1) for idx, node in enumerate(network.nodes)
+    }
 
-    # O(V)
-    for node in adjacency_list.keys():
-        if node not in shortest:
-            shortest[node] = -1
 
-    return shortest
+@dataclass
+class Landmarks:
+    """
+    Exact distances from a few landmark nodes. By the triangle inequality
+    |d(l, t) - d(l, v)| <= d(v, t) for every landmark l, which gives A* a
+    consistent lower bound on graphs without coordinates (ALT).
+    """
+
+    # one list of distances per landmark, indexed by node id
+    distances: List[List[float]] = field(default_factory=list)
+    landmarks: List[int] = field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls, network: RoadNetwork, count: int = 4, start: int = 0
+    ) -> "Landmarks":
+        """
+        Picks landmarks far apart, each the node farthest from the ones
+        already chosen, starting from the node farthest from start
+
+        Overall complexity: O(count * (V + E) log V)
+        """
+
+        table = cls()
+        nearest = [INFINITY] * network.size
+        reached = dijkstra(network, start)
+        candidate = max(reached, key=reached.get)
+
+        for _ in range(min(count, network.size)):
+            settled = dijkstra(network, candidate)
+            row = [settled.get(node, INFINITY) for node in range(network.size)]
+            table.landmarks.append(candidate)
+            table.distances.append(row)
+
+            # O(V) - the next landmark is the reachable node farthest from
+            # every landmark so far
+            nearest = [min(x, y) for x, y in zip(nearest, row)]
+            candidate = max(
+                (node for node in settled if node not in table.landmarks),
+                key=nearest.__getitem__,
+                default=None,
+            )
+            if candidate is None:
+                break
+        return table
+
+    def heuristic(self, targets: Iterable[int]) -> Callable[[int], float]:
+        """
+        A lower bound on the distance from a node to the nearest target.
+        The minimum of consistent bounds is consistent, so it is safe for
+        multi-target searches. O(t * l) per call for t targets and l
+        landmarks
+        """
+
+        # per target, its distance from each landmark
+        anchors = [
+            [row[target] for row in self.distances] for target in targets
+        ]
+        distances = self.distances
+
+        def bound(node: int) -> float:
+            here = [row[node] for row in distances]
+            best = INFINITY
+            for anchor in anchors:
+                gap = 0.0
+                for one, two in zip(here, anchor):
+                    # a landmark that cannot reach both gives no bound
+                    if one != INFINITY and two != INFINITY:
+                        gap = max(gap, abs(one - two))
+                best = min(best, gap)
+            return best if best != INFINITY else 0.0
+
+        return bound
+
+
+@dataclass
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over a RoadNetwork for many repeated queries.
+
+    Preprocessing removes nodes one at a time, least important first, and
+    adds a shortcut between two of a removed node's neighbors whenever
+    the path through it may be their only shortest path. A query then
+    searches upward, toward more important nodes only, from both ends and
+    meets in the middle, settling a few hundred nodes where Dijkstra
+    would settle most of the network.
+    """
+
+    # node id -> its contraction order
+    rank: List[int] = field(default_factory=list)
+    # node id -> (neighbor, weight) for neighbors of higher rank,
+    # shortcuts included
+    upward: List[List[Tuple[int, float]]] = field(default_factory=list)
+    shortcuts: int = 0
+
+    @classmethod
+    @profiled("shortest_path.contract")
+    def build(
+        cls, network: RoadNetwork, witness_limit: int = 64
+    ) -> "ContractionHierarchy":
+        """
+        Contracts nodes in order of edge difference (shortcuts added minus
+        edges removed) plus neighbors already contracted, with priorities
+        refreshed lazily when a node comes up. Witness searches stop after
+        witness_limit settled nodes, which may add a shortcut that is not
+        needed but never drops one that is.
+
+        Overall complexity: O(V * d^2 * w log w) for degree d, in practice
+        close to linear on road networks
+        """
+
+        size = network.size
+        # the remaining graph, contracted nodes are removed as they go
+        adjacency: List[Dict[int, float]] = [
+            dict(network.edges(node)) for node in range(size)
+        ]
+        deleted_neighbors = [0] * size
+
+        def shortcuts_for(node: int) -> List[Tuple[int, int, float]]:
+            """shortcuts contracting node would add, O(d^2 * w log w)"""
+
+            edges = list(adjacency[node].items())
+            added = []
+            for idx, (first, to_first) in enumerate(edges[:-1]):
+                rest = edges[idx + 1:]
+                reached = _witness_search(
+                    adjacency,
+                    first,
+                    node,
+                    {second for second, _ in rest},
+                    to_first + max(weight for _, weight in rest),
+                    witness_limit,
+                )
+                for second, to_second in rest:
+                    via = to_first + to_second
+                    if reached.get(second, INFINITY) > via:
+                        added.append((first, second, via))
+            return added
+
+        def priority(node: int, added: List) -> int:
+            return (
+                len(added) - len(adjacency[node]) + deleted_neighbors[node]
+            )
+
+        # O(V) initial priorities
+        heap = [
+            (priority(node, shortcuts_for(node)), node)
+            for node in range(size)
+        ]
+        heapq.heapify(heap)
+
+        hierarchy = cls(rank=[0] * size, upward=[[] for _ in range(size)])
+        contracted = [False] * size
+        order = 0
+        while heap:
+            _, node = heapq.heappop(heap)
+            if contracted[node]:
+                continue
+            # lazy update: contract only if still the least important
+            added = shortcuts_for(node)
+            current = priority(node, added)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, node))
+                continue
+
+            for first, second, via in added:
+                if via < adjacency[first].get(second, INFINITY):
+                    adjacency[first][second] = via
+                    adjacency[second][first] = via
+                    hierarchy.shortcuts += 1
+
+            # every neighbor left is contracted later, so ranks higher
+            contracted[node] = True
+            hierarchy.rank[node] = order
+            hierarchy.upward[node] = list(adjacency[node].items())
+            order += 1
+            for adjacent in adjacency[node]:
+                del adjacency[adjacent][node]
+                deleted_neighbors[adjacent] += 1
+            adjacency[node] = {}
+
+        return hierarchy
+
+    def _search(self, source: int) -> Dict[int, float]:
+        """
+        Distances within the upward search space of source
+
+        Overall complexity: O(u log u) for u nodes in the space
+        """
+
+        upward = self.upward
+        settled: Dict[int, float] = {}
+        heap: List[Tuple[float, int]] = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = distance
+            for adjacent, weight in upward[node]:
+                if adjacent not in settled:
+                    heapq.heappush(heap, (distance + weight, adjacent))
+        return settled
+
+    def query(self, source: int, target: int) -> float:
+        """Shortest distance between two nodes, inf if unreachable"""
+        return self.distances(source, [target])[target]
+
+    def distances(
+        self, source: int, targets: Iterable[int]
+    ) -> Dict[int, float]:
+        """
+        Distances from source to every target, inf for unreachable ones.
+        The upward space of source is searched once and met with the
+        upward space of each target.
+
+        Overall complexity: O((t + 1) * u log u) for t targets
+        """
+
+        forward = self._search(source)
+        result: Dict[int, float] = {}
+        for target in targets:
+            backward = self._search(target)
+            if len(backward) > len(forward):
+                smaller, larger = forward, backward
+            else:
+                smaller, larger = backward, forward
+            result[target] = min(
+                (
+                    distance + larger[node]
+                    for node, distance in smaller.items()
+                    if node in larger
+                ),
+                default=INFINITY,
+            )
+        return result
+
+
+def _witness_search(
+    adjacency: List[Dict[int, float]],
+    source: int,
+    skip: int,
+    targets: Set[int],
+    limit: float,
+    max_settled: int,
+) -> Dict[int, float]:
+    """
+    Distances from source avoiding skip, until every target is settled,
+    the distance passes limit or max_settled nodes are settled
+
+    Overall complexity: O(w log w) for w = max_settled
+    """
+
+    settled: Dict[int, float] = {}
+    left = len(targets)
+    heap: List[Tuple[float, int]] = [(0.0, source)]
+    while heap and len(settled) < max_settled:
+        distance, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        if distance > limit:
+            break
+        settled[node] = distance
+        if node in targets:
+            left -= 1
+            if not left:
+                break
+        for adjacent, weight in adjacency[node].items():
+            if adjacent != skip and adjacent not in settled:
+                heapq.heappush(heap, (distance + weight, adjacent))
+    return settled
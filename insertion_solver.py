@@ -0,0 +1,343 @@
+from classes import Graph, Node, Package
+from classes.clock import available_times, to_minutes
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import heapq
+
+import numpy as np
+
+
+@dataclass
+class Trip:
+    """One truck run from the hub and back, stops in visit order"""
+
+    truck_id: int
+    depart: float
+    # packages grouped per stop, in visit order
+    stops: List[List[Package]] = field(default_factory=list)
+    arrivals: List[float] = field(default_factory=list)
+    returns: float = 0.0
+    distance: float = 0.0
+    late: int = 0
+
+    @property
+    def packages(self) -> List[Package]:
+        return [package for stop in self.stops for package in stop]
+
+
+@dataclass
+class Plan:
+    """Trips for every truck plus the packages no truck could take"""
+
+    trips: List[Trip] = field(default_factory=list)
+    unassigned: List[Package] = field(default_factory=list)
+
+    def distance(self) -> float:
+        return sum(trip.distance for trip in self.trips)
+
+    def late(self) -> int:
+        return sum(trip.late for trip in self.trips)
+
+    def trips_for(self, truck_id: int) -> List[Trip]:
+        return [trip for trip in self.trips if trip.truck_id == truck_id]
+
+
+@dataclass
+class _Route:
+    """
+    A trip under construction with cached arrival times and forward slack,
+    so each insertion is checked in O(1) per position.
+    """
+
+    hub: int
+    depart: float
+    per_mile: float
+    matrix: np.ndarray
+    nodes: List[int] = field(default_factory=list)
+    deadlines: List[float] = field(default_factory=list)
+    stops: List[List[int]] = field(default_factory=list)
+    arrivals: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    # least slack of any on-time stop from position i onward, inf past end
+    slack: np.ndarray = field(default_factory=lambda: np.full(1, np.inf))
+    size: int = 0
+
+    def _refresh(self) -> None:
+        """recomputes arrivals and forward slack, O(s)"""
+
+        nodes = np.asarray(self.nodes, dtype=np.int64)
+        previous = np.concatenate(([self.hub], nodes[:-1]))
+        legs = self.matrix[previous, nodes]
+        self.arrivals = self.depart + np.cumsum(legs) * self.per_mile
+
+        deadlines = np.asarray(self.deadlines)
+        # stops already late cannot get any later in count, so only
+        # on-time stops constrain the slack
+        slack = np.where(
+            self.arrivals <= deadlines, deadlines - self.arrivals, np.inf
+        )
+        self.slack = np.append(
+            np.minimum.accumulate(slack[::-1])[::-1], np.inf
+        )
+
+    def insertion_costs(
+        self, nodes: np.ndarray, deadlines: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Added distance and arrival time for every candidate node at every
+        position, shape (s + 1, u). Infeasible positions cost inf.
+
+        Overall complexity: O(s * u), vectorized
+        """
+
+        route = np.asarray(self.nodes, dtype=np.int64)
+        previous = np.concatenate(([self.hub], route))
+        following = np.append(route, self.hub)
+
+        to_node = self.matrix[np.ix_(previous, nodes)]
+        from_node = self.matrix[np.ix_(nodes, following)].T
+        added = to_node + from_node - self.matrix[previous, following][:, None]
+
+        start_times = np.concatenate(([self.depart], self.arrivals))
+        arrival = start_times[:, None] + to_node * self.per_mile
+        feasible = (arrival <= deadlines[None, :]) & (
+            added * self.per_mile <= self.slack[:, None]
+        )
+        return np.where(feasible, added, np.inf), arrival
+
+    def insert(
+        self, position: int, node: int, packages: List[int], deadline: float
+    ) -> None:
+        """Adds a stop for packages at position, O(s)"""
+
+        self.nodes.insert(position, node)
+        self.deadlines.insert(position, deadline)
+        self.stops.insert(position, packages)
+        self.size += len(packages)
+        self._refresh()
+
+    def cheapest(self, node: int, deadline: float) -> int:
+        """best feasible position for a node, or the cheapest at all"""
+
+        costs, _ = self.insertion_costs(
+            np.array([node]), np.array([deadline])
+        )
+        if np.isfinite(costs).any():
+            return int(np.argmin(costs[:, 0]))
+
+        route = np.asarray(self.nodes, dtype=np.int64)
+        previous = np.concatenate(([self.hub], route))
+        following = np.append(route, self.hub)
+        added = (
+            self.matrix[previous, node]
+            + self.matrix[node, following]
+            - self.matrix[previous, following]
+        )
+        return int(np.argmin(added))
+
+
+def solve(
+    packages: List[Package],
+    graph: Graph,
+    hub: Node,
+    special_cases: Dict,
+    truck_count: int,
+    start_time: int,
+    speed: float = 18,
+    capacity: int = 16,
+    rng: Optional[np.random.Generator] = None,
+    noise: float = 0.0,
+) -> Plan:
+    """
+    Builds trips for a fleet with a deadline-aware cheapest insertion
+    heuristic in the style of Solomon's I1.
+
+    The truck that is back at the hub first opens the next trip. It is
+    seeded with the group that must ride together when that group is
+    available, otherwise with the most urgent package it may carry. Stops
+    are then added at their cheapest position that keeps every on-time
+    stop on time until the truck is full or nothing else fits. Truck
+    restrictions and the times delayed packages reach the hub are hard
+    constraints, deadlines hold for everything but a seed.
+
+    Given an rng and noise > 0 the construction is perturbed for
+    multi-start search: trucks tied at the hub go in random order, and
+    seed urgency and insertion costs are scaled by up to 1 + noise. The
+    constraints stay hard, only the choices among feasible moves change.
+
+    packages are Package objects, a columnar PackageStore has to be
+    materialized first and gives up its memory saving.
+
+    Overall complexity: O(t * s * u) for t trips of s stops with u
+    candidate locations, each check O(1) through the cached forward slack
+    """
+
+    distance_matrix = graph.distance_matrix()
+    node_ids = distance_matrix.node_ids
+    matrix = distance_matrix.matrix
+    per_mile = 60 / speed
+    start = to_minutes(start_time)
+    hub_index = node_ids[hub]
+
+    count = len(packages)
+    nodes = np.fromiter(
+        (node_ids[graph.get_node(address=x.address)] for x in packages),
+        dtype=np.int64,
+        count=count,
+    )
+    deadlines = np.fromiter(
+        (x.deadline for x in packages),
+        dtype=np.float64,
+        count=count,
+    )
+
+    # O(n) - hard constraints from the notes
+    position = {package.id: idx for idx, package in enumerate(packages)}
+    available = np.full(count, start)
+    for package_id, arrival in available_times(special_cases).items():
+        if package_id in position:
+            available[position[package_id]] = max(start, to_minutes(arrival))
+
+    required = np.full(count, -1, dtype=np.int64)
+    for truck_number, package_ids in special_cases["specific_truck"].items():
+        if truck_number > truck_count:
+            continue
+        for package_id in package_ids:
+            if package_id in position:
+                required[position[package_id]] = truck_number - 1
+
+    group = [
+        position[package_id]
+        for package_id in special_cases["must_be_grouped"]
+        if package_id in position
+    ]
+    # a group that fits on one truck is routed as a unit, kept out of the
+    # per-package candidates until then
+    group_pending = bool(group) and len(group) <= capacity
+    assigned = np.zeros(count, dtype=bool)
+    if group_pending:
+        assigned[group] = True
+    group_trucks = {int(x) for x in required[group] if x >= 0}
+
+    perturb = rng is not None and noise > 0
+    # trucks tied at the hub leave in rank order
+    ranks = (
+        rng.permutation(truck_count) if perturb else np.arange(truck_count)
+    )
+
+    plan = Plan()
+    ready = [
+        (start, int(ranks[truck_id]), truck_id)
+        for truck_id in range(truck_count)
+    ]
+    heapq.heapify(ready)
+
+    while ready and (group_pending or not assigned.all()):
+        depart, rank, truck_id = heapq.heappop(ready)
+        allowed = ~assigned & ((required == -1) | (required == truck_id))
+        takes_group = group_pending and group_trucks <= {truck_id}
+
+        if not allowed.any() and not takes_group:
+            # nothing left that this truck may carry
+            continue
+
+        group_ready = takes_group and available[group].max() <= depart
+        if not group_ready and not (allowed & (available <= depart)).any():
+            # wait at the hub for the next package this truck can take
+            waits = list(available[allowed])
+            if takes_group:
+                waits.append(available[group].max())
+            heapq.heappush(ready, (min(waits), rank, truck_id))
+            continue
+
+        route = _Route(hub_index, depart, per_mile, matrix)
+        if group_ready:
+            for idx in group:
+                route.insert(
+                    route.cheapest(nodes[idx], deadlines[idx]),
+                    int(nodes[idx]),
+                    [idx],
+                    deadlines[idx],
+                )
+            group_pending = False
+        else:
+            seeds = np.flatnonzero(allowed & (available <= depart))
+            urgency = deadlines[seeds]
+            if perturb:
+                urgency = urgency * (1 + noise * rng.random(len(seeds)))
+            seed = seeds[np.argmin(urgency)]
+            route.insert(0, int(nodes[seed]), [seed], deadlines[seed])
+            assigned[seed] = True
+
+        # O(s * u) per added stop
+        while route.size < capacity:
+            candidates = np.flatnonzero(
+                ~assigned
+                & ((required == -1) | (required == truck_id))
+                & (available <= depart)
+            )
+            if not len(candidates):
+                break
+
+            # one candidate per location, feasible if any package fits
+            locations, inverse = np.unique(
+                nodes[candidates], return_inverse=True
+            )
+            latest = np.full(len(locations), -np.inf)
+            np.maximum.at(latest, inverse, deadlines[candidates])
+
+            costs, arrivals = route.insertion_costs(locations, latest)
+            if perturb:
+                costs = costs * (1 + noise * rng.random(costs.shape))
+            best = int(np.argmin(costs))
+            stop_position, location = np.unravel_index(best, costs.shape)
+            if not np.isfinite(costs[stop_position, location]):
+                break
+
+            # every package for this location that still makes it, most
+            # urgent first, as long as there is room
+            arrival = arrivals[stop_position, location]
+            here = candidates[
+                (inverse == location) & (deadlines[candidates] >= arrival)
+            ]
+            here = here[np.argsort(deadlines[here], kind="stable")]
+            here = here[: capacity - route.size]
+            route.insert(
+                int(stop_position),
+                int(locations[location]),
+                list(here),
+                float(deadlines[here].min()),
+            )
+            assigned[here] = True
+
+        plan.trips.append(_finish(route, truck_id, packages))
+        heapq.heappush(ready, (plan.trips[-1].returns, rank, truck_id))
+
+    if group_pending:
+        assigned[group] = False
+    plan.unassigned = [packages[idx] for idx in np.flatnonzero(~assigned)]
+    return plan
+
+
+def _finish(route: _Route, truck_id: int, packages: List[Package]) -> Trip:
+    """Turns a finished route into a Trip, O(s)"""
+
+    last = route.nodes[-1] if route.nodes else route.hub
+    travel = float(route.arrivals[-1] - route.depart) if route.nodes else 0
+    back = float(route.matrix[last, route.hub])
+    arrivals = [float(x) for x in route.arrivals]
+
+    return Trip(
+        truck_id=truck_id,
+        depart=route.depart,
+        stops=[[packages[idx] for idx in stop] for stop in route.stops],
+        arrivals=arrivals,
+        returns=route.depart + travel + back * route.per_mile,
+        distance=travel / route.per_mile + back,
+        late=sum(
+            1
+            for stop, arrival in zip(route.stops, arrivals)
+            for idx in stop
+            if arrival > packages[idx].deadline
+        ),
+    )
@@ -39,7 +39,7 @@ def main(prompt_user: bool) -> None:
     """Main entry point for the program"""
 
     while prompt_user:
-        simulation: WGUUPS = WGUUPS
+        simulation: WGUUPS = WGUUPS()
 
         print("Welcome to the supervisor dashboard!.\n")
 
@@ -66,12 +66,11 @@ def main(prompt_user: bool) -> None:
 
         # begin simulation
         simulation.initialize(
-            simulation,
             simulation_start=start_datetime,
             simulation_end=end_datetime,
         )
 
-        simulation.run_simulation(simulation)
+        simulation.run_simulation()
 
         should_continue = (
             input("Run another simulation? (y/N): ").strip().lower()
@@ -0,0 +1,207 @@
+__doc__ = """
+Multi-start trip planning.
+
+Runs many perturbed insertion_solver attempts across worker processes
+and keeps the plan with the fewest late packages, then the fewest miles.
+Workers read the parent's distance matrix from one shared memory block
+instead of loading and solving the distance data again.
+"""
+
+from classes import Graph, Node, Package
+from insertion_solver import Plan, solve
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import parent_process, shared_memory
+from typing import Dict, List, Optional, Tuple
+import os
+import time as clock
+
+import numpy as np
+
+# scale of the random perturbation applied to perturbed attempts
+DEFAULT_NOISE = 0.3
+
+# per worker process, set up once by _attach
+_worker: Dict = {}
+
+
+@dataclass
+class MultiStartResult:
+    """The best plan found and how the search went"""
+
+    plan: Plan = field(default_factory=Plan)
+    attempt: int = 0
+    attempts: int = 0
+    late: int = 0
+    distance: float = 0.0
+    wall_time: float = 0.0
+
+
+def _score(late: int, distance: float, attempt: int) -> Tuple:
+    """fewest late packages, then fewest miles, then earliest attempt"""
+    return (late, round(distance, 6), attempt)
+
+
+def _attach(
+    name: str,
+    shape: Tuple[int, int],
+    dtype: str,
+    nodes: List[Node],
+    problem: Dict,
+) -> None:
+    """
+    Worker initializer: maps the shared matrix and rebuilds a graph index
+    around it, once per process
+    """
+
+    # workers share the parent's resource tracker, which unlinks the
+    # block once, when the parent does
+    memory = shared_memory.SharedMemory(name=name)
+
+    graph = Graph()
+    graph.add_nodes(nodes)
+    graph.attach_distance_matrix(
+        np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    )
+
+    _worker.update(problem, memory=memory, graph=graph)
+    _worker["hub"] = graph.get_node(address="HUB")
+
+
+def _run(
+    problem: Dict, graph: Graph, hub: Node, seed: int, attempt: int
+) -> Plan:
+    """
+    One construction, attempt 0 unperturbed, the rest perturbed by their
+    own seeded generator so any attempt can be replayed exactly
+    """
+
+    return solve(
+        problem["packages"],
+        graph,
+        hub,
+        problem["special_cases"],
+        problem["truck_count"],
+        problem["start_time"],
+        speed=problem["speed"],
+        capacity=problem["capacity"],
+        rng=np.random.default_rng([seed, attempt]),
+        noise=0.0 if attempt == 0 else problem["noise"],
+    )
+
+
+def _attempt(seed: int, attempt: int) -> Tuple[int, int, float]:
+    """Scores one attempt in a worker, only the score travels back"""
+
+    plan = _run(_worker, _worker["graph"], _worker["hub"], seed, attempt)
+    return attempt, plan.late(), plan.distance()
+
+
+def solve_multistart(
+    packages: List[Package],
+    graph: Graph,
+    hub: Node,
+    special_cases: Dict,
+    truck_count: int,
+    start_time: int,
+    speed: float = 18,
+    capacity: int = 16,
+    seed: int = 0,
+    time_budget: Optional[float] = None,
+    max_attempts: int = 256,
+    workers: Optional[int] = None,
+    noise: float = DEFAULT_NOISE,
+) -> MultiStartResult:
+    """
+    Runs max_attempts attempts in rounds of one per worker. Attempt i is
+    seeded with (seed, i) and the winner is picked by score with the
+    attempt number breaking ties, so a seed and max_attempts give the
+    same plan on any machine and with any number of workers. The winner
+    is replayed here so the plan holds the caller's packages.
+
+    A time_budget in seconds stops the search after the round in which
+    it runs out. How many attempts fit depends on the machine, its load
+    and the worker count, so a budget trades that determinism for a
+    bounded wall time.
+
+    workers defaults to the core count, or to 1 when this already runs
+    in a worker process so a pool of pools does not oversubscribe.
+
+    Like insertion_solver.solve it needs Package objects, every worker
+    gets its own copy of them, so a columnar store saves no memory here.
+
+    Overall complexity: O(a * solve / w) for a attempts on w workers
+    """
+
+    started = clock.perf_counter()
+    if workers is None:
+        # inside a worker, e.g. one of batch.py's, the cores are taken
+        workers = 1 if parent_process() is not None else os.cpu_count()
+    workers = workers or 1
+    matrix = graph.distance_matrix().matrix
+    nodes = sorted(graph.node_ids, key=graph.node_ids.get)
+
+    problem = {
+        "packages": packages,
+        "special_cases": special_cases,
+        "truck_count": truck_count,
+        "start_time": start_time,
+        "speed": speed,
+        "capacity": capacity,
+        "noise": noise,
+    }
+
+    # O(V^2) - one copy of the matrix for every worker to read
+    memory = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+    try:
+        shared = np.ndarray(
+            matrix.shape, dtype=matrix.dtype, buffer=memory.buf
+        )
+        shared[:] = matrix
+        del shared
+
+        best: Optional[Tuple] = None
+        attempts = 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(
+                memory.name,
+                matrix.shape,
+                matrix.dtype.str,
+                nodes,
+                problem,
+            ),
+        ) as executor:
+            while attempts < max_attempts:
+                batch = range(
+                    attempts, min(attempts + workers, max_attempts)
+                )
+                for attempt, late, distance in executor.map(
+                    _attempt, [seed] * len(batch), batch
+                ):
+                    score = _score(late, distance, attempt)
+                    if best is None or score < best:
+                        best = score
+                attempts += len(batch)
+
+                if (
+                    time_budget is not None
+                    and clock.perf_counter() - started > time_budget
+                ):
+                    break
+    finally:
+        memory.close()
+        memory.unlink()
+
+    late, _, attempt = best
+    plan = _run(problem, graph, hub, seed, attempt)
+    return MultiStartResult(
+        plan=plan,
+        attempt=attempt,
+        attempts=attempts,
+        late=late,
+        distance=plan.distance(),
+        wall_time=clock.perf_counter() - started,
+    )
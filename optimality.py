@@ -0,0 +1,262 @@
+__doc__ = """
+How far driven routes are from optimal.
+
+Every trip is a closed tour from its start, usually the hub, through a
+set of stops. Up to exact_limit stops the optimal tour is solved with
+Held-Karp dynamic programming over subsets; larger ones are measured
+against the Held-Karp 1-tree lower bound, which is never above the
+optimum, so the gap reported for them can only overstate the real one.
+Distances come from the all-pairs matrix, which obeys the triangle
+inequality, so revisiting a stop never helps and the bounds hold for
+any order the truck drove in. Deadlines are left out, so part of a gap
+can be the price of delivering on time.
+"""
+
+from classes import Graph
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Held-Karp keeps 2^s * s costs, 168 MB at 20 stops
+HELD_KARP_LIMIT = 20
+
+
+@dataclass
+class RouteGap:
+    """One driven trip against the best possible tour of its stops"""
+
+    truck_id: int
+    stops: int
+    driven: float
+    # the optimal tour when exact, otherwise a lower bound on it
+    bound: float
+    exact: bool
+    method: str
+
+    @property
+    def gap(self) -> float:
+        """driven miles over the bound, as a fraction of the bound"""
+        if self.bound <= 0:
+            return 0.0
+        return (self.driven - self.bound) / self.bound
+
+
+def held_karp(dist: np.ndarray) -> Tuple[float, List[int]]:
+    """
+    The shortest closed tour from node 0 through every other node of a
+    distance matrix, and its visiting order without node 0. Costs for
+    all subsets of one size are computed together, one NumPy pass per
+    subset size and last stop.
+
+    Overall complexity: O(2^s * s^2) time, O(2^s * s) memory for s stops
+    """
+
+    stops = len(dist) - 1
+    if stops > HELD_KARP_LIMIT:
+        raise ValueError(
+            f"Held-Karp is limited to {HELD_KARP_LIMIT} stops, got {stops}"
+        )
+    if stops <= 0:
+        return 0.0, []
+
+    between = dist[1:, 1:]
+    size = 1 << stops
+    # cost[mask, j]: from node 0 through the stops in mask, ending at j
+    cost = np.full((size, stops), np.inf)
+    parent = np.full((size, stops), -1, dtype=np.int8)
+    singles = 1 << np.arange(stops)
+    cost[singles, np.arange(stops)] = dist[0, 1:]
+
+    # O(2^s) - subsets grouped by how many stops they hold
+    counts = np.zeros(size, dtype=np.int64)
+    for stop in range(stops):
+        counts += (np.arange(size) >> stop) & 1
+    layers = [np.flatnonzero(counts == count) for count in range(stops + 1)]
+
+    for count in range(2, stops + 1):
+        masks = layers[count]
+        for last in range(stops):
+            # O(C(s, count) * s) - subsets ending at last
+            ending = masks[(masks >> last) & 1 == 1]
+            before = cost[ending ^ (1 << last)] + between[:, last]
+            parent[ending, last] = np.argmin(before, axis=1)
+            cost[ending, last] = before[
+                np.arange(len(ending)), parent[ending, last]
+            ]
+
+    full = size - 1
+    closing = cost[full] + dist[1:, 0]
+    last = int(np.argmin(closing))
+    length = float(closing[last])
+
+    # O(s) - walk the parents back from the last stop
+    order: List[int] = []
+    mask = full
+    while last >= 0:
+        order.append(last + 1)
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous if mask else -1
+    return length, order[::-1]
+
+
+def _prim(weights: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Minimum spanning tree weight and node degrees, O(n^2) vectorized
+    """
+
+    count = len(weights)
+    degrees = np.zeros(count, dtype=np.int64)
+    if count < 2:
+        return 0.0, degrees
+
+    in_tree = np.zeros(count, dtype=bool)
+    in_tree[0] = True
+    best = weights[0].copy()
+    parent = np.zeros(count, dtype=np.int64)
+    total = 0.0
+    for _ in range(count - 1):
+        node = int(np.argmin(np.where(in_tree, np.inf, best)))
+        total += best[node]
+        degrees[node] += 1
+        degrees[parent[node]] += 1
+        in_tree[node] = True
+        closer = weights[node] < best
+        best = np.where(closer, weights[node], best)
+        parent = np.where(closer, node, parent)
+    return float(total), degrees
+
+
+def mst_bound(dist: np.ndarray) -> float:
+    """
+    Weight of a minimum spanning tree, a lower bound on any closed tour
+    since dropping one edge of a tour leaves a spanning tree
+
+    Overall complexity: O(n^2)
+    """
+
+    return _prim(dist)[0]
+
+
+def _one_tree(weights: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    A spanning tree of nodes 1..n-1 plus the two cheapest edges of node
+    0, and its node degrees. O(n^2)
+    """
+
+    total, inner = _prim(weights[1:, 1:])
+    degrees = np.concatenate(([2], inner))
+    nearest = np.argsort(weights[0, 1:], kind="stable")[:2] + 1
+    degrees[nearest] += 1
+    return total + float(weights[0, nearest].sum()), degrees
+
+
+def one_tree_bound(
+    dist: np.ndarray,
+    upper: Optional[float] = None,
+    iterations: int = 100,
+) -> float:
+    """
+    The Held-Karp lower bound: the best 1-tree weight over node penalties
+    found by subgradient ascent. A 1-tree where every node has degree two
+    is a tour, so the ascent pushes penalties onto nodes with too many
+    tree edges. Steps are sized from upper, a known tour length such as
+    the driven one, and halve whenever the bound stops improving.
+
+    Overall complexity: O(k * n^2) for k iterations
+    """
+
+    count = len(dist)
+    if count <= 1:
+        return 0.0
+    if count == 2:
+        return float(dist[0, 1] + dist[1, 0])
+
+    upper = upper if upper is not None else 2 * mst_bound(dist)
+    penalties = np.zeros(count)
+    best = -np.inf
+    scale = 2.0
+    stalled = 0
+    for _ in range(iterations):
+        weights = dist + penalties[:, None] + penalties[None, :]
+        tree, degrees = _one_tree(weights)
+        bound = tree - 2 * penalties.sum()
+        if bound > best + 1e-9:
+            best, stalled = bound, 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                scale, stalled = scale / 2, 0
+
+        slope = degrees - 2
+        norm = float(slope @ slope)
+        if norm == 0 or upper - bound <= 1e-9 or scale < 1e-4:
+            # the 1-tree is a tour, or the bound reached the upper one
+            break
+        penalties += scale * (upper - bound) / norm * slope
+    return float(max(best, 0.0))
+
+
+def evaluate_route(
+    truck_id: int,
+    nodes: List[int],
+    matrix: np.ndarray,
+    exact_limit: int = 12,
+) -> RouteGap:
+    """
+    Prices a trip that started at nodes[0] and visited the rest in
+    order, as a closed tour back to its start, against the best tour of
+    the same stops
+
+    Overall complexity: O(2^s * s^2) up to exact_limit stops, O(k * s^2)
+    above it
+    """
+
+    start = nodes[0]
+    stops = list(dict.fromkeys(x for x in nodes[1:] if x != start))
+    path = np.asarray(nodes + [start], dtype=np.int64)
+    driven = float(matrix[path[:-1], path[1:]].sum())
+
+    tour = [start] + stops
+    dist = matrix[np.ix_(tour, tour)]
+    if len(stops) <= min(exact_limit, HELD_KARP_LIMIT):
+        bound, _ = held_karp(dist)
+        return RouteGap(truck_id, len(stops), driven, bound, True, "held-karp")
+    bound = one_tree_bound(dist, upper=driven)
+    return RouteGap(truck_id, len(stops), driven, bound, False, "1-tree")
+
+
+def gap_report(
+    routes: Iterable[Tuple[int, List[int]]],
+    graph: Graph,
+    exact_limit: int = 12,
+) -> List[RouteGap]:
+    """
+    Evaluates every (truck id, node ids) trip of a run
+
+    Overall complexity: O(r) route evaluations, see evaluate_route
+    """
+
+    matrix = graph.distance_matrix().matrix
+    return [
+        evaluate_route(truck_id, nodes, matrix, exact_limit)
+        for truck_id, nodes in routes
+        if len(nodes) > 1
+    ]
+
+
+def summarize(gaps: List[RouteGap]) -> Dict:
+    """Totals over a gap report, the gap weighted by miles"""
+
+    driven = sum(x.driven for x in gaps)
+    bound = sum(x.bound for x in gaps)
+    return {
+        "routes": len(gaps),
+        "exact": sum(1 for x in gaps if x.exact),
+        "driven": round(driven, 1),
+        "bound": round(bound, 1),
+        "gap": round((driven - bound) / bound, 4) if bound > 0 else 0.0,
+        "worst_gap": round(max((x.gap for x in gaps), default=0.0), 4),
+    }
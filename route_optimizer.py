@@ -0,0 +1,322 @@
+from classes import Graph, Node, Package
+from classes.clock import to_minutes
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import time as clock
+
+import numpy as np
+
+
+@dataclass
+class RouteResult:
+    """Outcome of a route optimization pass"""
+
+    packages: List[Package] = field(default_factory=list)
+    distance_before: float = 0.0
+    distance_after: float = 0.0
+    late_before: int = 0
+    late_after: int = 0
+    iterations: int = 0
+
+
+def _path_distance(order: List[int], dist: List[List[float]]) -> float:
+    """length of the open path 0 -> order[0] -> ... -> order[-1]"""
+
+    total = 0.0
+    previous = 0
+    for stop in order:
+        total += dist[previous][stop]
+        previous = stop
+    return total
+
+
+def _nearest_neighbor(count: int, dist: List[List[float]]) -> List[int]:
+    """
+    Greedy tour from the start, the same policy the simulation uses
+
+    Overall complexity: O(s^2)
+    """
+
+    remaining = set(range(1, count))
+    order: List[int] = []
+    previous = 0
+    while remaining:
+        # ties go to the lowest index, i.e. the earliest loaded stop
+        stop = min(remaining, key=lambda s: (dist[previous][s], s))
+        remaining.remove(stop)
+        order.append(stop)
+        previous = stop
+    return order
+
+
+def _late_stops(
+    order: List[int],
+    dist: List[List[float]],
+    deadlines: List[float],
+    start: float,
+    speed: float,
+) -> int:
+    """
+    Count the stops reached after their deadline
+
+    Overall complexity: O(n)
+    """
+
+    late = 0
+    elapsed = start
+    previous = 0
+    for stop in order:
+        elapsed += dist[previous][stop] * 60 / speed
+        if elapsed > deadlines[stop]:
+            late += 1
+        previous = stop
+    return late
+
+
+def optimize_route(
+    start: Node,
+    packages: List[Package],
+    graph: Graph,
+    speed: float,
+    start_time: int,
+    max_iterations: int = 1000,
+    time_budget: float = 0.5,
+) -> RouteResult:
+    """
+    Builds a nearest-neighbor tour of a truck's packages, then improves it
+    with 2-opt and Or-opt moves over an open path starting at the truck's
+    location. Packages sharing an address are visited as one stop. A move
+    is only kept when it shortens the route without making more stops late.
+
+    Overall complexity: O(k * s^2) for k improving passes over s stops
+    """
+
+    # group packages by destination, keeping the current visit order, O(p)
+    stops: Dict[Node, List[Package]] = {}
+    for package in packages:
+        node = graph.get_node(address=package.address)
+        stops.setdefault(node, []).append(package)
+
+    nodes: List[Optional[Node]] = [start] + list(stops.keys())
+    node_ids = graph.distance_matrix().node_ids
+    indexes = [node_ids[node] for node in nodes]
+
+    # O(s^2) - local copy so the inner loops index plain lists
+    dist: List[List[float]] = (
+        graph.distance_matrix().matrix[np.ix_(indexes, indexes)].tolist()
+    )
+    deadlines: List[float] = [float("inf")] + [
+        min(package.deadline for package in group)
+        for group in stops.values()
+    ]
+    start_minutes = to_minutes(start_time)
+
+    order = _nearest_neighbor(len(nodes), dist)
+    length = _path_distance(order, dist)
+    late = _late_stops(order, dist, deadlines, start_minutes, speed)
+    result = RouteResult(distance_before=length, late_before=late)
+
+    deadline = clock.perf_counter() + time_budget
+    iterations = 0
+    improved = True
+
+    while improved and iterations < max_iterations:
+        improved = False
+        count = len(order)
+
+        # 2-opt: reverse order[i..j], O(s^2)
+        for i in range(count - 1):
+            a = order[i - 1] if i > 0 else 0
+            b = order[i]
+            for j in range(i + 1, count):
+                c = order[j]
+                d = order[j + 1] if j + 1 < count else None
+                delta = dist[a][c] - dist[a][b]
+                if d is not None:
+                    delta += dist[b][d] - dist[c][d]
+                if delta < -1e-9:
+                    candidate = (
+                        order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                    )
+                    candidate_late = _late_stops(
+                        candidate, dist, deadlines, start_minutes, speed
+                    )
+                    if candidate_late <= late:
+                        order, length, late = (
+                            candidate,
+                            length + delta,
+                            candidate_late,
+                        )
+                        improved = True
+                        break
+            if improved or clock.perf_counter() > deadline:
+                break
+
+        # Or-opt: move a segment of 1 to 3 stops elsewhere, O(s^2)
+        if not improved:
+            for size in (1, 2, 3):
+                for i in range(count - size + 1):
+                    prev_stop = order[i - 1] if i > 0 else 0
+                    first, last = order[i], order[i + size - 1]
+                    next_stop = order[i + size] if i + size < count else None
+
+                    removed = dist[prev_stop][first]
+                    if next_stop is not None:
+                        removed += (
+                            dist[last][next_stop] - dist[prev_stop][next_stop]
+                        )
+
+                    rest = order[:i] + order[i + size:]
+                    segment = order[i:i + size]
+                    for k in range(len(rest) + 1):
+                        if k == i:
+                            continue
+                        left = rest[k - 1] if k > 0 else 0
+                        right = rest[k] if k < len(rest) else None
+                        added = dist[left][first]
+                        if right is not None:
+                            added += dist[last][right] - dist[left][right]
+                        delta = added - removed
+                        if delta < -1e-9:
+                            candidate = rest[:k] + segment + rest[k:]
+                            candidate_late = _late_stops(
+                                candidate,
+                                dist,
+                                deadlines,
+                                start_minutes,
+                                speed,
+                            )
+                            if candidate_late <= late:
+                                order, length, late = (
+                                    candidate,
+                                    length + delta,
+                                    candidate_late,
+                                )
+                                improved = True
+                                break
+                    if improved:
+                        break
+                if improved or clock.perf_counter() > deadline:
+                    break
+
+        iterations += 1
+        if clock.perf_counter() > deadline:
+            break
+
+    groups = list(stops.values())
+    result.packages = [
+        package for stop in order for package in groups[stop - 1]
+    ]
+    result.distance_after = _path_distance(order, dist)
+    result.late_after = late
+    result.iterations = iterations
+    return result
+
+
+def _route_legs(
+    start_index: int,
+    indexes: np.ndarray,
+    matrix: np.ndarray,
+) -> np.ndarray:
+    """distance of each leg of start -> indexes[0] -> ... -> indexes[-1]"""
+
+    previous = np.concatenate(([start_index], indexes[:-1]))
+    return matrix[previous, indexes]
+
+
+def _late_packages(arrivals: np.ndarray, deadlines: np.ndarray) -> int:
+    """count of packages reached after their deadline, O(s)"""
+    return int(np.count_nonzero(arrivals > deadlines))
+
+
+def repair_route(
+    start: Node,
+    packages: List[Package],
+    graph: Graph,
+    speed: float,
+    start_time: int,
+    remove: Iterable[Package] = (),
+    insert: Iterable[Package] = (),
+) -> RouteResult:
+    """
+    Patches a planned route instead of replanning it: removed packages are
+    dropped, then each inserted package goes to its cheapest position that
+    does not make an on-time stop late, or its cheapest position outright
+    if there is none. Consecutive packages for one address cost nothing
+    extra, so an insertion next to a stop it shares is free.
+
+    Overall complexity: O(s) per removed or inserted package, vectorized
+    """
+
+    distance_matrix = graph.distance_matrix()
+    node_ids = distance_matrix.node_ids
+    matrix = distance_matrix.matrix
+    start_index = node_ids[start]
+    start_minutes = to_minutes(start_time)
+    per_minute = 60 / speed
+
+    def columns(route: List[Package]):
+        indexes = np.fromiter(
+            (
+                node_ids[graph.get_node(address=package.address)]
+                for package in route
+            ),
+            dtype=np.int64,
+            count=len(route),
+        )
+        deadlines = np.fromiter(
+            (package.deadline for package in route),
+            dtype=np.float64,
+            count=len(route),
+        )
+        legs = _route_legs(start_index, indexes, matrix)
+        arrivals = start_minutes + np.cumsum(legs) * per_minute
+        return indexes, deadlines, legs, arrivals
+
+    insert = list(insert)
+    _, deadlines, legs, arrivals = columns(packages)
+    result = RouteResult(
+        distance_before=float(legs.sum()),
+        late_before=_late_packages(arrivals, deadlines),
+    )
+
+    # O(s) - removing a stop only ever shortens the remaining route
+    removed = {id(package) for package in remove}
+    route = [package for package in packages if id(package) not in removed]
+
+    for package in insert:
+        indexes, deadlines, legs, arrivals = columns(route)
+        node = node_ids[graph.get_node(address=package.address)]
+
+        # inserting at position i replaces the leg into stop i
+        previous = np.concatenate(([start_index], indexes))
+        to_stop = matrix[previous, node]
+        from_stop = np.append(matrix[node, indexes], 0.0)
+        added = to_stop + from_stop - np.append(legs, 0.0)
+
+        # the least slack of any on-time stop from position i onward
+        slack = np.where(
+            arrivals <= deadlines, deadlines - arrivals, np.inf
+        )
+        suffix_slack = np.append(
+            np.minimum.accumulate(slack[::-1])[::-1], np.inf
+        )
+        arrival = (
+            np.concatenate(([start_minutes], arrivals)) + to_stop * per_minute
+        )
+        feasible = (arrival <= package.deadline) & (
+            added * per_minute <= suffix_slack
+        )
+
+        candidates = np.where(feasible, added, np.inf)
+        if not feasible.any():
+            candidates = added
+        route.insert(int(np.argmin(candidates)), package)
+
+    _, deadlines, legs, arrivals = columns(route)
+    result.packages = route
+    result.distance_after = float(legs.sum())
+    result.late_after = _late_packages(arrivals, deadlines)
+    result.iterations = len(removed) + len(insert)
+    return result
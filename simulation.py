@@ -1,271 +1,1445 @@
-from data import load_data
-from classes import Hashtable, Graph, Node, Truck, Package, SimulationManager
-from dijkstas_sp import shortest_path
+from data import load_data, parse_special_cases
+from classes.clock import parse_clock
+from route_optimizer import optimize_route, repair_route
+from insertion_solver import solve as solve_insertion
+from multistart import solve_multistart
+from clustering import plan_clusters
+from optimality import gap_report
+from classes import (
+    Hashtable,
+    Graph,
+    Node,
+    Truck,
+    Package,
+    PackageStatus,
+    PackageStore,
+    SimulationManager,
+    Event,
+    StopIndex,
+    Fleet,
+    HubDispatcher,
+    LoadingQueue,
+    TripQueue,
+    EventLog,
+    LogLevel,
+    PackageTimeline,
+    PackageState,
+    PackageChange,
+    RoadChange,
+    ReplanReport,
+    SimClock,
+    Checkpoint,
+    PROFILER,
+    phase,
+    profiled,
+)
 
-from datetime import datetime, time
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from datetime import datetime
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import time as clock
+
+# "greedy" loads by deadline, "insertion" follows one planned schedule,
+# "multistart" the best of many perturbed ones and "cluster" gives every
+# truck its own area and routes each area on its own
+PLANNERS = ("greedy", "insertion", "multistart", "cluster")
+
+# the hub opens at 08:00, in simulation seconds
+HUB_OPENS = 8 * 3600
+
+# corrected addresses for packages noted as "Wrong address listed", applied
+# at the time they become known
+ADDRESS_CORRECTIONS: Dict[str, Dict[int, Dict[str, str]]] = {
+    "10:30": {
+        9: {
+            "address": "410 South State St",
+            "city": "Salt Lake City",
+            "zip": "84111",
+        },
+    },
+}
+
+
+def _package_table(header: str, row_format: str, rows: List) -> str:
+    """joins a header and one formatted line per row, O(rows)"""
+    return header + "".join(row_format.format(*row) for row in rows)
 
 
 @dataclass
 class Simulation:
-    packages: Hashtable
-    trucks: List[Truck]
-    distances: Graph
-    simulation_manager: SimulationManager
-    hub: Node
-    special_cases: Dict
-    leftover_packages: List = field(default_factory=list)
+    packages: Optional[Union[Hashtable, PackageStore]] = None
+    trucks: List[Truck] = field(default_factory=list)
+    distances: Optional[Graph] = None
+    simulation_manager: Optional[SimulationManager] = None
+    hub: Optional[Node] = None
+    special_cases: Dict = field(default_factory=dict)
+    loading_queue: LoadingQueue = field(default_factory=LoadingQueue)
+    fleet: Optional[Fleet] = None
+    stop_indexes: Dict[int, StopIndex] = field(default_factory=dict)
+    optimize_routes: bool = True
+    planner: str = "greedy"
+    # keyword arguments for solve_multistart: seed, time_budget, workers...
+    planner_options: Dict = field(default_factory=dict)
+    # where run_simulation writes the profile, None leaves profiling off
+    profile_dir: Optional[Path] = None
+    profile_name: str = "profile"
+    timeline: Optional[PackageTimeline] = None
+    # package id -> truck it was loaded on
+    carriers: Dict[int, int] = field(default_factory=dict)
+    # truck id -> (stop, arrival) of the delivery it is driving to
+    in_flight: Dict[int, Tuple[Node, int]] = field(default_factory=dict)
+    replans: List[ReplanReport] = field(default_factory=list)
+    # how far the run got, so a restored checkpoint picks up from there
+    day_started: bool = False
+    departed: bool = False
+    # a checkpoint refers to the graph, road changes go to a copy of it
+    graph_shared: bool = False
+    # finished trips as (truck id, node ids from the start of the trip
+    # through every stop in the order driven)
+    routes: List[Tuple[int, List[int]]] = field(default_factory=list)
+    # truck id -> node ids of the trip it is on
+    open_routes: Dict[int, List[int]] = field(default_factory=dict)
+
+    def __getstate__(self) -> Dict:
+        # stop indexes are keyed on object ids and rebuilt on demand
+        state = dict(self.__dict__)
+        state["stop_indexes"] = {}
+        return state
 
     def initialize(
         self,
         simulation_start: datetime = datetime(2025, 8, 24, 8),
         simulation_end: datetime = datetime(2025, 8, 25, 0),
+        optimize_routes: bool = True,
+        truck_count: int = 2,
+        truck_speed: int = 18,
+        truck_weight_limit: Optional[float] = None,
+        truck_volume_limit: Optional[float] = None,
+        driver_count: Optional[int] = None,
+        dispatcher: Optional[HubDispatcher] = None,
+        package_path: Optional[Path] = None,
+        distance_path: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        log_level: int = LogLevel.DETAIL,
+        log_sinks: Optional[List] = None,
+        planner: str = "greedy",
+        planner_options: Optional[Dict] = None,
+        profile_dir: Optional[Path] = None,
+        profile_name: str = "profile",
+        profile_memory: bool = False,
+        columnar: bool = False,
     ) -> SimulationManager:
-        """initialize the Simulation"""
+        """
+        initialize the Simulation, log_sinks replaces the default bounded
+        in-memory event log and log_level drops records below it. With a
+        profile_dir every phase is timed, and allocations are traced too
+        with profile_memory, until run_simulation writes the profile.
+        columnar keeps the packages in a PackageStore, only the ones that
+        get loaded become objects; the insertion, multistart and cluster
+        planners still build every package at the hub. Trucks carry any
+        weight and volume unless truck_weight_limit (kilos) or
+        truck_volume_limit (litres) is given.
+        """
 
-        self.packages, self.distances = load_data()
+        self.profile_dir = profile_dir
+        self.profile_name = profile_name
+        if profile_dir is not None:
+            PROFILER.reset()
+            PROFILER.enable(trace_memory=profile_memory)
+
+        self.packages, self.distances = load_data(
+            package_path, distance_path, cache_dir, columnar
+        )
 
+        # simulation time is whole seconds since midnight of the start day
+        sim_clock = SimClock.starting(simulation_start)
         self.simulation_manager = SimulationManager(
-            current_time=simulation_start,
-            simulation_end=simulation_end,
-        )
-
-        self.special_cases = {
-            "delayed": {
-                "09:05": [6, 25, 28, 32],
-            },
-            "specific_truck": {
-                2: [3, 18, 36, 38],
-            },
-            "must_be_grouped": [13, 14, 15, 16, 19, 20],
-            "address_change": [9],
+            current_time=sim_clock.seconds(simulation_start),
+            simulation_end=sim_clock.seconds(simulation_end),
+            clock=sim_clock,
+        )
+        if log_sinks is not None:
+            self.simulation_manager.event_log = EventLog(log_sinks, log_level)
+        else:
+            self.simulation_manager.event_log.level = log_level
+
+        # O(n) - delays, truck restrictions and groups come from the notes
+        self.special_cases = parse_special_cases(self.packages)
+        self.special_cases["address_change"] = {
+            time_str: {
+                package_id: change
+                for package_id, change in changes.items()
+                if package_id in self.special_cases["wrong_address"]
+                and self.distances.get_node(address=change["address"])
+            }
+            for time_str, changes in ADDRESS_CORRECTIONS.items()
         }
+        self.hold_for_corrections()
+        self.simulation_manager.package_count = self.packages.size
+        self.optimize_routes = optimize_routes
+        if planner not in PLANNERS:
+            raise ValueError(f"Unknown planner: {planner}")
+        self.planner = planner
+        self.planner_options = dict(planner_options or {})
+        self.stop_indexes = {}
+        self.timeline = PackageTimeline(sim_clock)
+        self.carriers = {}
+        self.in_flight = {}
+        self.replans = []
+        self.day_started = False
+        self.departed = False
+        self.graph_shared = False
+        self.routes = []
+        self.open_routes = {}
 
         self.hub = self.distances.get_node(address="HUB")
-        self.trucks = [
-            Truck(
-                id=x,
-                current_location=self.hub,
-                truck_time=self.simulation_manager.get_current_time(),
-            )
-            for x in range(0, 2)
+
+        # O(V^3) once per load, every distance lookup afterwards is O(1)
+        self.distances.distance_matrix()
+
+        # every truck has a driver unless fewer drivers are given
+        self.fleet = Fleet.create(
+            truck_count,
+            truck_count if driver_count is None else driver_count,
+            self.hub,
+            self.simulation_manager.get_current_time(),
+            speed=truck_speed,
+            dispatcher=dispatcher,
+            weight_limit=truck_weight_limit,
+            volume_limit=truck_volume_limit,
+        )
+        self.trucks = self.fleet.trucks
+        if truck_weight_limit is not None or truck_volume_limit is not None:
+            self.check_truck_limits()
+
+    def check_truck_limits(self) -> None:
+        """
+        Rejects truck limits that a single package, or the group that has
+        to ride together, exceeds on an empty truck, it would wait at the
+        hub forever
+
+        Overall complexity: O(n)
+        """
+
+        if isinstance(self.packages, PackageStore):
+            count = self.packages.count
+            heaviest = int(self.packages.weights[:count].max(initial=0))
+            bulkiest = int(self.packages.volumes[:count].max(initial=0))
+        else:
+            packages = list(self.packages.values())
+            heaviest = max((x.weight for x in packages), default=0)
+            bulkiest = max((x.volume for x in packages), default=0)
+
+        group = [
+            self.packages.get(package_id)
+            for package_id in self.special_cases["must_be_grouped"]
         ]
+        group = [package for package in group if package is not None]
+        heaviest = max(heaviest, sum(x.weight for x in group))
+        bulkiest = max(bulkiest, sum(x.volume for x in group))
+
+        truck = self.trucks[0] if self.trucks else None
+        if truck is not None and (
+            heaviest > truck.weight_limit or bulkiest > truck.volume_limit
+        ):
+            raise ValueError(
+                f"Truck limits of {truck.weight_limit} kg and "
+                f"{truck.volume_limit} l do not fit a load of "
+                f"{heaviest} kg or {bulkiest} l that cannot be split"
+            )
 
-    def start_delivery(self) -> None:
+    def hold_for_corrections(self) -> None:
         """
-        runs delivery algorithm for the simulation
+        Holds packages with a wrong address at the hub until their
+        correction is known, the same way delayed packages wait to reach
+        the hub, so no planner or loader sends them out early. A package
+        that is also delayed waits for whichever comes later.
 
-        Overall Complexity: O(t * p) -> O(n^2)
+        Overall complexity: O(d + c)
         """
 
-        # O(t)
-        for truck in self.trucks:
-            while (
-                len(truck.contents) > 0
-                and self.simulation_manager.is_simulation_over() is False
-            ):
-                shortest_paths = shortest_path(
-                    truck.current_location, self.distances
+        delayed: Dict[str, List[int]] = self.special_cases["delayed"]
+        # times are zero padded "HH:MM", so they compare as strings
+        held_until = {
+            package_id: time_str
+            for time_str, package_ids in delayed.items()
+            for package_id in package_ids
+        }
+        for time_str, changes in self.special_cases["address_change"].items():
+            for package_id in changes:
+                held = held_until.get(package_id)
+                if held is not None and held >= time_str:
+                    continue
+                if held is not None:
+                    delayed[held].remove(package_id)
+                delayed.setdefault(time_str, []).append(package_id)
+                held_until[package_id] = time_str
+
+    def schedule_special_cases(self) -> None:
+        """Queues package-available events and known address corrections"""
+
+        sim_clock = self.simulation_manager.clock
+
+        # O(c log E) - ahead of the releases, so a package held for its
+        # correction is at its new address by the time it can be loaded
+        for time_str, changes in self.special_cases["address_change"].items():
+            change_time = sim_clock.to_datetime(parse_clock(time_str))
+            for package_id, address in changes.items():
+                self.submit_change(
+                    PackageChange(
+                        change_time, "address", package_id, address=address
+                    )
                 )
 
-                closest_package: Optional[Package] = None
-                closest_distance: float = float("inf")
-                closest_package_node: Optional[Node] = None
+        # O(d)
+        for time_str, package_ids in self.special_cases["delayed"].items():
+            if not package_ids:
+                continue
+            self.simulation_manager.schedule_event(
+                parse_clock(time_str),
+                "package_available",
+                payload=package_ids,
+            )
 
-                # O(p)
-                for package in truck.contents:
+    def submit_change(self, change: PackageChange) -> None:
+        """Feeds a package change into the simulation at its time, O(log E)"""
 
-                    if self.simulation_manager.is_simulation_over():
-                        continue
+        self.simulation_manager.schedule_event(
+            self.simulation_manager.clock.seconds(change.time),
+            "package_change",
+            payload=change,
+        )
 
-                    destination_node = self.distances.get_node(
-                        address=package.address
-                    )
+    def submit_road_change(self, change: RoadChange) -> None:
+        """Feeds a road distance change in at its time, O(log E)"""
 
-                    if destination_node in shortest_paths:
-                        distance = shortest_paths[destination_node]
-                        if distance < closest_distance:
-                            closest_distance = distance
-                            closest_package = package
-                            closest_package_node = destination_node
+        self.simulation_manager.schedule_event(
+            self.simulation_manager.clock.seconds(change.time),
+            "road_change",
+            payload=change,
+        )
 
-                if closest_package is not None:
-                    travel_time = truck.deliver_package(
-                        closest_package_node, closest_distance
-                    )
-                    truck.current_location = closest_package_node
-                    self.simulation_manager.total_milage += closest_distance
-                    self.simulation_manager.packages_delivered += 1
-                    self.simulation_manager.advance_time(travel_time)
-
-                    if (
-                        self.simulation_manager.get_current_time().time()
-                        >= time(10, 30)
-                    ):
-                        address_change_package = self.packages.get(9)
-                        if (
-                            address_change_package.address
-                            != "410 South State St"
-                        ):
-                            address_change_package.address = (
-                                "410 South State St"
-                            )
-                            address_change_package.city = "Salt Lake City"
-                            address_change_package.zip_code = "84111"
-                            self.simulation_manager.log_event(
-                                "Package 9 address updated to "
-                                + "410 S State St, Salt Lake City, UT 84111."
-                            )
-
-                    self.simulation_manager.log_event(
-                        f"Truck {truck.id + 1} delivered {closest_package} "
-                        + f"to {closest_package.address}."
-                    )
+    @property
+    def routes_in_order(self) -> bool:
+        """True when truck contents are kept in planned visit order"""
+        return self.optimize_routes or self.planner != "greedy"
 
-    def reload_truck(self, truck: Truck, packages: List) -> None:
+    def dispatch_truck(self, truck: Truck) -> None:
         """
-        Returns truck to the hub and reloads packages
+        Schedules a driven truck's next delivery. An empty truck out on the
+        road is handed to the dispatcher, which decides if it heads back.
 
-        Overall Complexity O(n log n)
+        Overall Complexity: O(p + log E)
         """
 
         if self.simulation_manager.is_simulation_over():
             return
+        if truck.id not in self.fleet.driven:
+            return
 
-        # O((V+E) log v) dijkstras
-        shortest_paths = shortest_path(truck.current_location, self.distances)
-        if self.hub in shortest_paths:
-            distance_to_hub = shortest_paths[self.hub]
-            travel_time = truck.travel_to_node(self.hub, distance_to_hub)
-            truck.current_location = self.hub
-            self.simulation_manager.advance_time(travel_time)
+        now = self.simulation_manager.get_current_time()
+        if truck.truck_time < now:
+            truck.truck_time = now
+
+        if not truck.contents:
+            if self.loading_queue.has_trips(truck.id):
+                # no other driver can take this truck's next trip
+                if truck.current_location != self.hub:
+                    self.send_to_hub(truck)
+                return
+            if truck.current_location != self.hub:
+                distance_to_hub = self.distances.distance(
+                    truck.current_location, self.hub
+                )
+                self.fleet.dispatcher.truck_idle(
+                    truck,
+                    truck.truck_time
+                    + truck.travel_to_node(self.hub, distance_to_hub),
+                )
+                self.rebalance()
+            return
+
+        closest_package: Optional[Package] = None
+        closest_distance: float = float("inf")
+        closest_package_node: Optional[Node] = None
+
+        if self.routes_in_order:
+            # O(1) - contents are already in planned visit order
+            closest_package = truck.contents[0]
+            closest_package_node = self.distances.get_node(
+                address=closest_package.address
+            )
+            closest_distance = self.distances.distance(
+                truck.current_location, closest_package_node
+            )
+        else:
+            # O(p) - one vectorized argmin over the truck's open stops
+            if truck.id not in self.stop_indexes:
+                self.stop_indexes[truck.id] = StopIndex.build(
+                    truck.contents, self.distances
+                )
+            stop_index = self.stop_indexes[truck.id]
+
+            position = stop_index.nearest(
+                self.distances.distance_matrix().row(truck.current_location),
+                truck.truck_time / 60,
+                truck.speed,
+            )
+            if position is not None:
+                closest_package = stop_index.packages[position]
+                closest_package_node = self.distances.get_node(
+                    address=closest_package.address
+                )
+                closest_distance = self.distances.distance(
+                    truck.current_location, closest_package_node
+                )
+
+        if closest_package is not None:
+            arrival = truck.truck_time + truck.travel_to_node(
+                closest_package_node, closest_distance
+            )
+            self.in_flight[truck.id] = (closest_package_node, arrival)
+            self.simulation_manager.schedule_event(
+                arrival,
+                "deliver",
+                truck_id=truck.id,
+                payload=(
+                    closest_package,
+                    closest_package_node,
+                    closest_distance,
+                ),
+            )
+
+    @profiled("simulation.plan_route")
+    def plan_route(self, truck: Truck) -> None:
+        """
+        Reorders a freshly loaded truck with the local search optimizer
+
+        Overall Complexity: O(k * s^2), bounded by the optimizer budget
+        """
+
+        if self.planner != "greedy" or not self.optimize_routes:
+            return
+        if not truck.contents:
+            return
+
+        result = optimize_route(
+            truck.current_location,
+            truck.contents,
+            self.distances,
+            truck.speed,
+            truck.truck_time,
+        )
+        truck.contents = result.packages
 
         self.simulation_manager.log_event(
-            f"Truck {truck.id + 1} returned to the hub."
+            f"Truck {truck.id + 1} route optimized from "
+            + f"{result.distance_before:.1f} to "
+            + f"{result.distance_after:.1f} miles "
+            + f"({result.late_before} late stops before, "
+            + f"{result.late_after} after).",
+            kind="route",
+            truck_id=truck.id,
         )
 
-        # O(n log n)
-        leftover_packages = Truck.load_trucks(
-            [truck],
-            self.leftover_packages,
-            self.special_cases,
-            self.simulation_manager.get_current_time(),
+    def depart(self, truck: Truck) -> None:
+        """A loaded, driven truck leaves the hub"""
+
+        now = self.simulation_manager.get_current_time()
+        if truck.truck_time < now:
+            truck.truck_time = now
+
+        self.fleet.waiting.discard(truck.id)
+        self.close_route(truck)
+        self.open_routes[truck.id] = [
+            self.distances.node_ids[truck.current_location]
+        ]
+        self.plan_route(truck)
+        self.dispatch_truck(truck)
+
+    def close_route(self, truck: Truck) -> None:
+        """Files the trip a truck was on with the finished ones, O(1)"""
+
+        route = self.open_routes.pop(truck.id, None)
+        if route is not None:
+            self.routes.append((truck.id, route))
+
+    def send_to_hub(self, truck: Truck) -> None:
+        """Schedules an empty truck's drive back to the hub"""
+
+        now = self.simulation_manager.get_current_time()
+        if truck.truck_time < now:
+            truck.truck_time = now
+
+        distance_to_hub = self.distances.distance(
+            truck.current_location, self.hub
+        )
+        self.fleet.hub_bound.add(truck.id)
+        self.simulation_manager.schedule_event(
+            truck.truck_time + truck.travel_to_node(self.hub, distance_to_hub),
+            "arrive_hub",
+            truck_id=truck.id,
+            payload=distance_to_hub,
+        )
+
+    def rebalance(self) -> None:
+        """
+        Sends idle trucks back to the hub, earliest arrival first, until
+        there are enough drivers there for the work waiting at the hub.
+
+        Overall Complexity: O(parked + r log T) for r returning trucks
+        """
+
+        needed = self.fleet.drivers_needed(self.loading_queue.remaining)
+        while needed > 0:
+            truck_id = self.fleet.dispatcher.next_truck()
+            if truck_id is None:
+                break
+            self.send_to_hub(self.trucks[truck_id])
+            needed -= 1
+
+    def staff_hub(self, truck: Truck) -> None:
+        """
+        Puts the driver of a truck at the hub back to work. Loaded parked
+        trucks go first since their packages have waited longest, otherwise
+        the driver's own truck is reloaded.
+        """
+
+        self.fleet.waiting.discard(truck.id)
+
+        parked_loaded = self.fleet.parked_loaded()
+        if parked_loaded:
+            parked_truck = parked_loaded[0]
+            self.fleet.switch_driver(truck, parked_truck)
+            self.simulation_manager.log_event(
+                f"Driver of truck {truck.id + 1} switched to "
+                + f"truck {parked_truck.id + 1}.",
+                kind="switch_driver",
+                truck_id=parked_truck.id,
+            )
+            self.reload_truck(truck)
+            self.depart(parked_truck)
+            return
+
+        self.reload_truck(truck)
+        if truck.contents:
+            self.depart(truck)
+        else:
+            self.fleet.waiting.add(truck.id)
+
+    def handle_deliver(self, event: Event) -> None:
+        """A truck reached a stop"""
+
+        truck: Truck = self.trucks[event.truck_id]
+        package, node, distance = event.payload
+        self.in_flight.pop(truck.id, None)
+
+        # the package the stop was chosen for, unless it was re-addressed
+        # while the truck was en route, then any other one for this address
+        delivered = next(
+            (
+                pkg
+                for pkg in truck.contents
+                if pkg is package and pkg.address == node.address
+            ),
+            None,
+        )
+        if delivered is None:
+            delivered = next(
+                (
+                    pkg
+                    for pkg in truck.contents
+                    if pkg.address == node.address
+                ),
+                None,
+            )
+        travel_time = truck.deliver_package(node, distance, delivered)
+        if delivered is not None and truck.id in self.stop_indexes:
+            self.stop_indexes[truck.id].close(delivered)
+        truck.current_location = node
+        truck.truck_time = event.time
+        self.simulation_manager.total_milage += distance
+
+        route = self.open_routes.get(truck.id)
+        stop = self.distances.node_ids[node]
+        if route is not None and route[-1] != stop:
+            route.append(stop)
+
+        # the package may have been re-addressed while the truck was en route
+        if travel_time is not None:
+            self.simulation_manager.packages_delivered += 1
+            self.timeline.record_package(delivered, event.time)
+            # the package changes later on, so render it now
+            if self.simulation_manager.event_log.enabled(LogLevel.DETAIL):
+                self.simulation_manager.log_event(
+                    f"Truck {truck.id + 1} delivered package {delivered.id} "
+                    + f"(weight: {delivered.weight} kg, "
+                    + f"delivery deadline: {delivered.delivery_deadline}, "
+                    + "loading time: "
+                    + f"{self.report_time(delivered.loading_time)}, "
+                    + "delivery time: "
+                    + f"{self.report_time(delivered.delivery_time)}, "
+                    + f"special notes: {delivered.special_notes}) "
+                    + f"to {delivered.address}.",
+                    kind="deliver",
+                    level=LogLevel.DETAIL,
+                    truck_id=truck.id,
+                    package_ids=(delivered.id,),
+                )
+
+        self.dispatch_truck(truck)
+
+    def handle_arrive_hub(self, event: Event) -> None:
+        """An empty truck got back to the hub"""
+
+        truck: Truck = self.trucks[event.truck_id]
+        truck.current_location = self.hub
+        truck.truck_time = event.time
+        self.simulation_manager.total_milage += event.payload
+        self.close_route(truck)
+
+        self.simulation_manager.log_event(
+            f"Truck {truck.id + 1} returned to the hub.",
+            kind="arrive_hub",
+            truck_id=truck.id,
         )
 
-        self.leftover_packages = leftover_packages
+        self.fleet.hub_bound.discard(truck.id)
+        self.staff_hub(truck)
+        self.rebalance()
+
+    def handle_package_available(self, event: Event) -> None:
+        """Delayed or held packages can be loaded now"""
+
+        # O(k log n) - release now so the timeline sees them at the hub
+        now = self.simulation_manager.get_current_time()
+        self.loading_queue.release(now)
+        for package_id in event.payload:
+            package = self.packages.get(package_id)
+            if (
+                package is not None
+                and package.delivery_status == PackageStatus.AT_HUB
+            ):
+                self.timeline.record_package(package, now)
+
         self.simulation_manager.log_event(
-            f"Truck {truck.id + 1} reloaded at the hub."
+            f"Packages {event.payload} are ready at the hub.",
+            kind="package_available",
+            package_ids=event.payload,
         )
 
-    def log_truck_contents(self) -> None:
-        """Logs the contents of all trucks"""
+        self.put_hub_to_work()
+
+    def put_hub_to_work(self) -> None:
+        """
+        Loads what waits at the hub onto empty parked trucks and idle
+        drivers, then calls back trucks if that is not enough
+
+        Overall Complexity: O(parked + waiting + k log n)
+        """
+
+        # O(parked) - top up the empty trucks at the hub
+        for truck_id in sorted(self.fleet.parked):
+            truck = self.trucks[truck_id]
+            if not truck.contents:
+                self.reload_truck(truck)
+
+        # O(waiting) - put idle drivers back to work
+        for truck_id in sorted(self.fleet.waiting):
+            self.staff_hub(self.trucks[truck_id])
+
+        self.rebalance()
+
+    @profiled("simulation.replan")
+    def handle_package_change(self, event: Event) -> None:
+        """
+        Applies a change from the feed, repairing only the route of the
+        truck carrying the package, and reports how long that took. A
+        change that cannot take effect, for a package already delivered or
+        cancelled, an address off the map or a delay for a loaded package,
+        is logged and reported as not applied.
+
+        Overall Complexity: O(s) for s stops on the affected truck
+        """
+
+        change: PackageChange = event.payload
+        started = clock.perf_counter()
+
+        package = self.packages.get(change.package_id)
+        if change.kind != "new" and (
+            package is None
+            or package.delivery_status
+            in (PackageStatus.DELIVERED, PackageStatus.CANCELLED)
+        ):
+            # too late to apply, but the change still leaves a trace
+            applied, truck = False, None
+            state = "unknown" if package is None else package.delivery_status
+            description = (
+                f"Package {change.package_id} {change.kind} change "
+                + f"not applied, package is {state}"
+            )
+        else:
+            applied, truck, remove, insert, description = getattr(
+                self, f"apply_{change.kind}"
+            )(change, package)
+
+        report = ReplanReport(
+            change.time,
+            change.kind,
+            change.package_id,
+            truck.id if truck is not None else None,
+            applied=applied,
+        )
+        if truck is not None:
+            self.repair_truck_route(truck, remove, insert, report)
+        report.latency_ms = (clock.perf_counter() - started) * 1000
+        self.replans.append(report)
+
+        self.simulation_manager.log_event(
+            f"{description} (replanned in {report.latency_ms:.2f} ms).",
+            kind=f"change_{change.kind}",
+            truck_id=report.truck_id,
+            package_ids=(change.package_id,),
+        )
+
+    def carrier(self, package: Package) -> Optional[Truck]:
+        """The truck a package is riding on, if any, O(1)"""
+
+        if package.delivery_status != PackageStatus.EN_ROUTE:
+            return None
+        truck_id = self.carriers.get(package.id)
+        return self.trucks[truck_id] if truck_id is not None else None
+
+    def apply_address(self, change: PackageChange, package: Package) -> Tuple:
+        """Moves a package's destination, re-inserting it if it is loaded"""
+
+        # trucks deliver by exact node address, so store the graph's form
+        node = self.distances.get_node(address=change.address["address"])
+        if node is None:
+            return (
+                False,
+                None,
+                (),
+                (),
+                f"Package {package.id} address change ignored, "
+                + f"{change.address['address']} is not on the map",
+            )
+
+        package.address = node.address
+        package.city = change.address["city"]
+        package.zip = change.address["zip"]
+        self.timeline.record_package(
+            package, self.simulation_manager.get_current_time()
+        )
+
+        truck = self.carrier(package)
+        return (
+            True,
+            truck,
+            [package],
+            [package],
+            f"Package {package.id} address updated to "
+            + f"{package.address}, {package.city}, UT {package.zip}",
+        )
+
+    def apply_new(self, change: PackageChange, package: Package) -> Tuple:
+        """Adds a package to the day's work at the hub"""
+
+        package = change.package
+        node = self.distances.get_node(address=package.address)
+        if node is None:
+            return (
+                False,
+                None,
+                (),
+                (),
+                f"Package {package.id} rejected, "
+                + f"{package.address} is not on the map",
+            )
+
+        package.address = node.address
+        self.packages.insert(package)
+        self.simulation_manager.package_count += 1
+        self.loading_queue.add(package)
+        self.timeline.record_package(
+            package, self.simulation_manager.get_current_time()
+        )
+        self.put_hub_to_work()
+        return (True, None, (), (), f"Package {package.id} added at the hub")
+
+    def apply_cancel(self, change: PackageChange, package: Package) -> Tuple:
+        """Drops a package from the hub queue or its truck's route"""
+
+        truck = self.carrier(package)
+        if truck is not None:
+            truck.unload_package(package)
+        else:
+            self.loading_queue.withdraw(package)
+
+        package.delivery_status = PackageStatus.CANCELLED
+        self.simulation_manager.package_count -= 1
+        self.timeline.record_package(
+            package, self.simulation_manager.get_current_time()
+        )
+        return (
+            True, truck, [package], (), f"Package {package.id} cancelled"
+        )
+
+    def apply_delay(self, change: PackageChange, package: Package) -> Tuple:
+        """Holds a package that has not been loaded yet until it arrives"""
+
+        if not self.loading_queue.withdraw(package):
+            return (
+                False,
+                None,
+                (),
+                (),
+                f"Package {package.id} delay ignored, already loaded",
+            )
+
+        available_at = self.simulation_manager.clock.seconds(
+            change.available_at
+        )
+        self.loading_queue.add(package, available_at)
+        self.timeline.record_package(
+            package, self.simulation_manager.get_current_time()
+        )
+        self.simulation_manager.schedule_event(
+            available_at, "package_available", payload=[package.id]
+        )
+        return (
+            True,
+            None,
+            (),
+            (),
+            f"Package {package.id} delayed until "
+            + f"{change.available_at.time()}",
+        )
+
+    def open_route(
+        self, truck: Truck, changed: Iterable[Package] = ()
+    ) -> Tuple[Node, int, List[Package], List[Package]]:
+        """
+        Splits a truck's remaining stops into the packages for the stop it
+        is driving to, which it is committed to unless they changed, and
+        the route after it. Returns (start, start time, committed, route).
+
+        Overall Complexity: O(s) for s stops on the truck
+        """
+
+        start, start_time = self.in_flight.get(
+            truck.id, (truck.current_location, truck.truck_time)
+        )
+        committed: List[Package] = []
+        route: List[Package] = []
+        changed = {id(package) for package in changed}
+        for package in truck.contents:
+            if (
+                truck.id in self.in_flight
+                and package.address == start.address
+                and id(package) not in changed
+            ):
+                committed.append(package)
+            else:
+                route.append(package)
+        return start, start_time, committed, route
+
+    def repair_truck_route(
+        self,
+        truck: Truck,
+        remove: List[Package],
+        insert: List[Package],
+        report: ReplanReport,
+    ) -> None:
+        """
+        Patches one truck's remaining stops. A truck on the road is already
+        committed to the stop it is driving to, so the repair starts there.
+
+        Overall Complexity: O(s) for s stops on the truck
+        """
+
+        # the nearest-neighbor policy re-picks its next stop on its own
+        self.stop_indexes.pop(truck.id, None)
+        if not self.routes_in_order:
+            return
+
+        start, start_time, committed, route = self.open_route(truck, remove)
+        result = repair_route(
+            start,
+            route,
+            self.distances,
+            truck.speed,
+            start_time,
+            remove,
+            insert,
+        )
+        truck.contents = committed + result.packages
+
+        report.distance_before = round(result.distance_before, 1)
+        report.distance_after = round(result.distance_after, 1)
+        report.late_before = result.late_before
+        report.late_after = result.late_after
+
+    @profiled("simulation.road_change")
+    def handle_road_change(self, event: Event) -> None:
+        """
+        Applies a new road distance. The graph repairs only the distance
+        pairs the edge affects, then each loaded truck with two or more of
+        its remaining stops among the changed nodes has its route checked
+        against the new costs.
+
+        Overall Complexity: O(V^2) for the repair, see
+        Graph.update_edge_weight, plus O(k * s^2) per rerouted truck
+        """
+
+        change: RoadChange = event.payload
+        started = clock.perf_counter()
+
+        one = self.distances.get_node(address=change.from_address)
+        two = self.distances.get_node(address=change.to_address)
+        if one is None or two is None or one == two:
+            reason = "not on the map" if one != two else "a single stop"
+            self.simulation_manager.log_event(
+                f"Road change from {change.from_address} to "
+                + f"{change.to_address} ignored, {reason}.",
+                kind="change_road",
+            )
+            return
 
+        if self.graph_shared:
+            # checkpoints and their forks read this graph, leave it be
+            self.distances = self.distances.copy()
+            self.graph_shared = False
+        changed = self.distances.update_edge_weight(one, two, change.distance)
+
+        # O(T * s) - a pair only changes if both its ends did
+        affected = set(changed.tolist())
+        node_ids = self.distances.node_ids
+        rerouted = []
         for truck in self.trucks:
-            log = f"truck {truck.id + 1} contents: \n"
+            if not truck.contents:
+                continue
+            start, _ = self.in_flight.get(
+                truck.id, (truck.current_location, 0)
+            )
+            touched = {node_ids[start]} & affected
             for package in truck.contents:
-                log += (
-                    f"ID: {package.id}, address: {package.address}, "
-                    + f"loading time: {package.loading_time}, "
-                    + f"delivery status: {package.delivery_status}, "
-                    + f"delivery deadline: {package.delivery_deadline}, "
-                    + f"special notes: {package.special_notes}\n"
+                node = self.distances.get_node(address=package.address)
+                if node_ids[node] in affected:
+                    touched.add(node_ids[node])
+            if len(touched) < 2:
+                continue
+
+            report = ReplanReport(change.time, "road", None, truck.id)
+            self.reevaluate_route(truck, report)
+            report.latency_ms = (clock.perf_counter() - started) * 1000
+            self.replans.append(report)
+            rerouted.append(truck.id + 1)
+
+        latency_ms = (clock.perf_counter() - started) * 1000
+        self.simulation_manager.log_event(
+            f"Road from {one.address} to {two.address} is now "
+            + f"{change.distance:.1f} miles, {len(changed)} locations "
+            + f"changed distances, trucks {rerouted} rechecked "
+            + f"(replanned in {latency_ms:.2f} ms).",
+            kind="change_road",
+            truck_id=rerouted[0] - 1 if len(rerouted) == 1 else None,
+        )
+
+    def reevaluate_route(self, truck: Truck, report: ReplanReport) -> None:
+        """
+        Prices a truck's remaining stops at the current distances and
+        switches to a re-optimized order when it is better: fewer late
+        packages wins even if the route gets longer, and with as many late
+        packages it has to be shorter, the ranking multistart uses for
+        whole plans. Both orders are priced by repair_route, so late_before
+        and late_after count packages. The stop the truck is driving to
+        stays first.
+
+        Overall Complexity: O(k * s^2), bounded by the optimizer budget
+        """
+
+        self.stop_indexes.pop(truck.id, None)
+        if not self.routes_in_order:
+            return
+
+        start, start_time, committed, route = self.open_route(truck)
+        current = repair_route(
+            start, route, self.distances, truck.speed, start_time
+        )
+        report.distance_before = report.distance_after = round(
+            current.distance_after, 1
+        )
+        report.late_before = report.late_after = current.late_after
+        if len(route) < 2:
+            return
+
+        result = optimize_route(
+            start, route, self.distances, truck.speed, start_time
+        )
+        # the optimizer counts late stops, re-price its order per package
+        # so both sides are compared in the same unit
+        candidate = repair_route(
+            start, result.packages, self.distances, truck.speed, start_time
+        )
+        # late packages first, then miles
+        if (candidate.late_after, candidate.distance_after) < (
+            current.late_after,
+            current.distance_after,
+        ):
+            truck.contents = committed + candidate.packages
+            report.distance_after = round(candidate.distance_after, 1)
+            report.late_after = candidate.late_after
+
+    def replan_report(self) -> List[Dict]:
+        """Every change from the feed with its replan latency, O(c)"""
+        return [asdict(report) for report in self.replans]
+
+    def driven_routes(self) -> List[Tuple[int, List[int]]]:
+        """Every trip so far, the ones still on the road last, O(r)"""
+        return self.routes + sorted(self.open_routes.items())
+
+    @profiled("report.route_gaps")
+    def route_report(self, exact_limit: int = 12) -> List[Dict]:
+        """
+        Every trip's miles against the optimal tour of its stops, exact up
+        to exact_limit stops and a lower bound above. Trips are priced as
+        closed tours, a truck still out counts its drive back.
+
+        Overall Complexity: O(r * 2^s * s^2), see optimality.gap_report
+        """
+
+        return [
+            {
+                **asdict(gap),
+                "driven": round(gap.driven, 2),
+                "bound": round(gap.bound, 2),
+                "gap": round(gap.gap, 4),
+            }
+            for gap in gap_report(
+                self.driven_routes(), self.distances, exact_limit
+            )
+        ]
+
+    @profiled("simulation.reload_truck")
+    def reload_truck(self, truck: Truck) -> None:
+        """
+        Reloads a truck waiting at the hub
+
+        Overall Complexity O(k log n) for k loaded packages
+        """
+
+        if self.simulation_manager.is_simulation_over():
+            return
+
+        # a truck that sat at the hub is loaded now, not when it got there
+        now = self.simulation_manager.get_current_time()
+        if truck.truck_time < now:
+            truck.truck_time = now
+
+        self.loading_queue.load([truck], now)
+        self.stop_indexes.pop(truck.id, None)
+        self.record_loaded(truck)
+        if truck.contents:
+            self.simulation_manager.log_event(
+                f"Truck {truck.id + 1} reloaded at the hub.",
+                kind="reload",
+                truck_id=truck.id,
+                package_ids=[package.id for package in truck.contents],
+            )
+            self.log_truck_contents()
+            self.log_leftover_packages()
+
+    def record_loaded(self, truck: Truck) -> None:
+        """Adds a freshly loaded truck's packages to the timeline, O(k)"""
+
+        for package in truck.contents:
+            self.carriers[package.id] = truck.id
+            self.timeline.record_package(package, package.loading_time)
+
+    def status_at(
+        self, package_id: int, time: datetime
+    ) -> Optional[PackageState]:
+        """
+        A package's status and address at any time in the run, O(log m)
+        for m recorded transitions
+        """
+        return self.timeline.status_at(package_id, time)
+
+    def snapshot_at(self, time: datetime) -> Dict[int, PackageState]:
+        """Every package's status at any time in the run, O(n log m)"""
+        return self.timeline.snapshot_at(time)
+
+    def report_time(self, seconds: Optional[int]) -> Optional[datetime]:
+        """A simulation time as a datetime for reports, None stays None"""
+
+        if seconds is None:
+            return None
+        return self.simulation_manager.clock.to_datetime(seconds)
+
+    def log_truck_contents(self) -> None:
+        """
+        Logs the contents of all trucks. The fields are captured now, the
+        text is only joined if a sink reads it.
+
+        Overall Complexity: O(n), nothing when detail records are dropped
+        """
+
+        if not self.simulation_manager.event_log.enabled(LogLevel.DETAIL):
+            return
+
+        for truck in self.trucks:
+            rows = [
+                (
+                    package.id,
+                    package.address,
+                    self.report_time(package.loading_time),
+                    package.delivery_status,
+                    package.delivery_deadline,
+                    package.special_notes,
                 )
-            self.simulation_manager.log_event(log)
+                for package in truck.contents
+            ]
+            self.simulation_manager.log_event(
+                lambda truck_id=truck.id, rows=rows: _package_table(
+                    f"truck {truck_id + 1} contents: \n",
+                    "ID: {}, address: {}, loading time: {}, "
+                    + "delivery status: {}, delivery deadline: {}, "
+                    + "special notes: {}\n",
+                    rows,
+                ),
+                kind="truck_contents",
+                level=LogLevel.DETAIL,
+                truck_id=truck.id,
+                package_ids=[row[0] for row in rows],
+            )
 
     def log_leftover_packages(self) -> None:
-        """Logs packages left at the hub"""
-
-        log = "Packages left at hub:\n"
-        for package in self.leftover_packages:
-            log += (
-                f"ID: {package.id}, address: {package.address}, "
-                + f"delivery status: {package.delivery_status}, "
-                + f"delivery deadline: {package.delivery_deadline}, "
-                + f"special notes: {package.special_notes}\n"
+        """
+        Logs packages left at the hub
+
+        Overall Complexity: O(n log n), nothing when detail records are
+        dropped
+        """
+
+        if not self.simulation_manager.event_log.enabled(LogLevel.DETAIL):
+            return
+
+        rows = [
+            (
+                package.id,
+                package.address,
+                package.delivery_status,
+                package.delivery_deadline,
+                package.special_notes,
             )
-        self.simulation_manager.log_event(log)
+            for package in self.loading_queue.leftovers()
+        ]
+        self.simulation_manager.log_event(
+            lambda: _package_table(
+                "Packages left at hub:\n",
+                "ID: {}, address: {}, delivery status: {}, "
+                + "delivery deadline: {}, special notes: {}\n",
+                rows,
+            ),
+            kind="leftovers",
+            level=LogLevel.DETAIL,
+            package_ids=[row[0] for row in rows],
+        )
 
-    def run_simulation(self) -> None:
-        """Main logic for WGUPS simulation"""
+    @profiled("report.summary")
+    def summary(self) -> Dict:
+        """
+        Delivery results for the run
 
-        current_time: datetime = self.simulation_manager.get_current_time()
-        package_list = self.packages.values()
+        Overall Complexity: O(n)
+        """
 
-        # We do not open until 08:00 AM
-        if current_time.time() < time(8, 0):
-            target_time = datetime.combine(current_time.date(), time(8, 0))
-            time_difference = target_time - current_time
+        # a package has to be loaded to be delivered, so a store only
+        # needs to look at the packages it handed out
+        if isinstance(self.packages, PackageStore):
+            packages = self.packages.materialized()
+        else:
+            packages = self.packages.values()
+
+        late_packages: List[int] = []
+        on_time = 0
+        for package in packages:
+            if package.delivery_status != PackageStatus.DELIVERED:
+                continue
+            if package.delivery_time <= package.deadline * 60:
+                on_time += 1
+            else:
+                late_packages.append(package.id)
 
-            self.simulation_manager.advance_time(time_difference)
+        return {
+            "mileage": round(self.simulation_manager.total_milage, 1),
+            "delivered": self.simulation_manager.packages_delivered,
+            "on_time": on_time,
+            "late_packages": sorted(late_packages),
+        }
+
+    @profiled("simulation.start_day")
+    def start_day(self) -> None:
+        """
+        Opens the hub and loads every truck
+
+        Overall Complexity: O(n log n)
+        """
+
+        self.day_started = True
+        current_time: int = self.simulation_manager.get_current_time()
+        # a store is compiled from its columns instead of its objects
+        if isinstance(self.packages, PackageStore):
+            package_list = self.packages
+        else:
+            package_list = list(self.packages.values())
+
+        # We do not open until 08:00 AM
+        if current_time < HUB_OPENS:
+            self.simulation_manager.advance_time(HUB_OPENS - current_time)
             for truck in self.trucks:
                 truck.truck_time = self.simulation_manager.get_current_time()
 
-            self.simulation_manager.log_event("Advanced time to 08:00 AM.")
+            self.simulation_manager.log_event(
+                "Advanced time to 08:00 AM.", kind="advance_time"
+            )
+            # plan and load for the time the trucks actually leave
+            current_time = self.simulation_manager.get_current_time()
 
         # Load truck and keep track on packages left at hub.
-        # O(n log n)
-        self.leftover_packages: List = Truck.load_trucks(
-            self.trucks,
-            package_list,
+        # O(n log n) once, later reloads only pay for what they load
+        if self.planner != "greedy":
+            self.loading_queue = self.plan_trips(package_list, current_time)
+        else:
+            self.loading_queue = LoadingQueue.compile(
+                package_list, self.special_cases, len(self.trucks)
+            )
+
+        # O(n) - every package starts the timeline at the hub or delayed
+        self.loading_queue.release(current_time)
+        self.timeline.record_packages(package_list, current_time)
+
+        self.loading_queue.load(self.trucks, current_time)
+        for truck in self.trucks:
+            self.record_loaded(truck)
+
+        leftover = self.loading_queue.remaining
+        self.simulation_manager.log_event(
+            "Trucks finsihed loading. "
+            + f"Loaded {len(package_list) - leftover}, "
+            + f"left {leftover} at hub.",
+            kind="start_day",
+        )
+
+        self.log_truck_contents()
+        self.log_leftover_packages()
+
+    @profiled("simulation.plan_trips")
+    def plan_trips(
+        self, package_list: List[Package], current_time: int
+    ) -> TripQueue:
+        """
+        Plans every truck's trips for the day with the insertion solver,
+        once or as a multi-start search, or by clustering the stops per
+        truck, assuming every truck has a driver. The planners work on
+        Package objects, so a PackageStore is materialized here and the
+        columnar memory saving only holds for the greedy loader.
+
+        Overall Complexity: O(t * s * u) per attempt, see
+        insertion_solver.solve, or clustering.plan_clusters
+        """
+
+        at_hub = [
+            package
+            for package in package_list
+            if package.delivery_status
+            in (PackageStatus.AT_HUB, PackageStatus.DELAYED)
+        ]
+        problem = (
+            at_hub,
+            self.distances,
+            self.hub,
             self.special_cases,
+            len(self.trucks),
             current_time,
         )
+        speed = self.trucks[0].speed
+        capacity = self.fleet.truck_capacity
+
+        if self.planner == "multistart":
+            result = solve_multistart(
+                *problem,
+                speed=speed,
+                capacity=capacity,
+                **self.planner_options,
+            )
+            plan = result.plan
+            search = (
+                f" Best of {result.attempts} attempts was "
+                + f"#{result.attempt}."
+            )
+        elif self.planner == "cluster":
+            plan = plan_clusters(
+                *problem,
+                speed=speed,
+                capacity=capacity,
+                **self.planner_options,
+            )
+            search = ""
+        else:
+            plan = solve_insertion(*problem, speed=speed, capacity=capacity)
+            search = ""
 
         self.simulation_manager.log_event(
-            "Trucks finsihed loading. "
-            + f"Loaded {len(package_list)-(len(self.leftover_packages))}, "
-            + f"left {len(self.leftover_packages)} at hub.",
+            f"Planned {len(plan.trips)} trips, {plan.distance():.1f} miles "
+            + f"with {plan.late()} late packages.{search}",
+            kind="plan",
         )
 
-        self.log_truck_contents(self)
-        self.log_leftover_packages(self)
+        return TripQueue.from_plan(
+            [(trip.truck_id, trip.packages) for trip in plan.trips],
+            package_list,
+            self.special_cases,
+            len(self.trucks),
+        )
 
-        while not self.simulation_manager.is_simulation_over():
-            # Deliver all loaded packages
-            self.start_delivery(self)
-
-            # if we have any leftovers, go grab and deliver them.
-            if self.leftover_packages:
-                truck_one_to_hub: float = shortest_path(
-                    self.trucks[0].current_location, self.distances
-                )[self.hub]
-                truck_two_to_hub: float = shortest_path(
-                    self.trucks[1].current_location, self.distances
-                )[self.hub]
-
-                if truck_one_to_hub < truck_two_to_hub:
-                    self.reload_truck(
-                        self,
-                        self.trucks[0],
-                        self.leftover_packages,
-                    )
+    @profiled("simulation.run_events")
+    def run_events(self, until: Optional[int] = None) -> None:
+        """
+        Sends the loaded trucks out, then processes events until the day
+        is over, or only up to simulation second until
+
+        Overall Complexity: O(E log E)
+        """
+
+        if not self.departed:
+            self.departed = True
+            self.schedule_special_cases()
+            for truck_id in sorted(self.fleet.driven):
+                truck = self.trucks[truck_id]
+                if truck.contents:
+                    self.depart(truck)
                 else:
-                    self.reload_truck(
-                        self,
-                        self.trucks[1],
-                        self.leftover_packages,
-                    )
-                if not self.simulation_manager.is_simulation_over():
-                    self.log_truck_contents(self)
-                    self.log_leftover_packages(self)
-                    self.start_delivery(self)
-
-        packages_log = "Final package states:\n"
-        for pakage in sorted(self.packages.values(), key=lambda x: x.id):
-            packages_log += (
-                f"ID: {pakage.id}, address: {pakage.address}, "
-                + f"delivery status: {pakage.delivery_status}, "
-                + f"delivery time: {pakage.delivery_time}, "
-                + f"special notes: {pakage.special_notes}\n"
+                    # nothing to load yet, it waits at the hub for work
+                    self.fleet.waiting.add(truck_id)
+
+        # O(log E) per event, trucks interleave on the global clock
+        while not self.simulation_manager.is_simulation_over():
+            event = self.simulation_manager.next_event(until)
+            if event is None:
+                break
+
+            getattr(self, f"handle_{event.kind}")(event)
+
+    @profiled("report.final_report")
+    def final_report(self, print_events: bool = True) -> None:
+        """Logs the final package states and prints the event log"""
+
+        if self.simulation_manager.event_log.enabled(LogLevel.DETAIL):
+            rows = [
+                (
+                    pakage.id,
+                    pakage.address,
+                    pakage.delivery_status,
+                    self.report_time(pakage.delivery_time),
+                    pakage.special_notes,
+                )
+                for pakage in sorted(
+                    self.packages.values(), key=lambda x: x.id
+                )
+            ]
+            self.simulation_manager.log_event(
+                lambda: _package_table(
+                    "Final package states:\n",
+                    "ID: {}, address: {}, delivery status: {}, "
+                    + "delivery time: {}, special notes: {}\n",
+                    rows,
+                ),
+                kind="final_states",
+                level=LogLevel.DETAIL,
             )
-        self.simulation_manager.log_event(packages_log)
 
         self.simulation_manager.log_event(
             f"Finished delivering {self.simulation_manager.packages_delivered}"
             + " packages with a total mileage of "
             + str(self.simulation_manager.total_milage),
+            kind="finished",
         )
 
-        for event in self.simulation_manager.events:
-            print(f"{event}\n\n")
+        if print_events:
+            with phase("report.print_events"):
+                for event in self.simulation_manager.events:
+                    print(f"{event}\n\n")
+        self.simulation_manager.event_log.close()
+
+    def run_simulation(self, print_events: bool = True) -> None:
+        """
+        Main logic for WGUPS simulation, writes the profile afterwards when
+        initialize was given a profile_dir
+        """
+
+        with phase("simulation.run_simulation"):
+            self.start_day()
+            self.run_events()
+            self.final_report(print_events)
+
+        if self.profile_dir is not None:
+            PROFILER.dump(self.profile_dir, self.profile_name)
+            PROFILER.disable()
+
+    def run_until(self, moment: datetime) -> None:
+        """
+        Runs every event up to and including moment and stops there, on
+        an event boundary a checkpoint can be taken from
+        """
+
+        if not self.day_started:
+            self.start_day()
+        self.run_events(self.simulation_manager.clock.seconds(moment))
+
+    def resume(self, print_events: bool = True) -> None:
+        """Runs a started or restored simulation to the end of the day"""
+
+        if not self.day_started:
+            self.start_day()
+        self.run_events()
+        self.final_report(print_events)
+
+    @profiled("simulation.checkpoint")
+    def checkpoint(self) -> Checkpoint:
+        """
+        Captures the whole run as it stands: trucks, packages, the clock,
+        pending events, the hub queue and the event log up to now. Only
+        the in-memory log sinks are kept.
+
+        Overall Complexity: O(n + E), the graph is never copied
+        """
+
+        manager = self.simulation_manager
+        # the run and every fork of it share the graph from now on
+        self.graph_shared = True
+        return Checkpoint.capture(
+            self,
+            self.distances,
+            manager.current_datetime(),
+            manager.event_log.emitted,
+        )
+
+    @classmethod
+    @profiled("simulation.fork")
+    def fork(
+        cls, checkpoint: Checkpoint, log_sinks: Optional[List] = None
+    ) -> "Simulation":
+        """
+        An independent copy of a checkpointed run, ready to be changed and
+        resumed. log_sinks replaces the in-memory sinks it carries over.
+
+        Overall Complexity: O(n + E)
+        """
+
+        simulation: Simulation = checkpoint.restore()
+        if log_sinks is not None:
+            simulation.simulation_manager.event_log.sinks = log_sinks
+        return simulation
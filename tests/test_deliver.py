@@ -0,0 +1,42 @@
+import unittest
+from datetime import datetime
+
+from classes import PackageStatus
+from simulation import Simulation
+
+
+class DeliverChosenPackageTest(unittest.TestCase):
+    def test_second_package_at_address_passes_deadline_mask(self):
+        day = datetime(2025, 8, 24)
+        simulation = Simulation()
+        simulation.initialize(
+            day.replace(hour=8), day.replace(hour=17), optimize_routes=False
+        )
+        truck = simulation.trucks[0]
+
+        # two packages for one far address, the first one already late
+        late, on_time = (simulation.packages.get(i) for i in (1, 2))
+        far = max(
+            simulation.distances.distance_matrix().node_ids,
+            key=lambda node: simulation.distances.distance(
+                simulation.hub, node
+            ),
+        )
+        for package in (late, on_time):
+            package.address = far.address
+        late.deadline, on_time.deadline = 8 * 60, 17 * 60
+        truck.contents = [late, on_time]
+
+        simulation.dispatch_truck(truck)
+        event = simulation.simulation_manager.next_event()
+        self.assertIs(event.payload[0], on_time)
+        simulation.handle_deliver(event)
+
+        self.assertEqual(on_time.delivery_status, PackageStatus.DELIVERED)
+        self.assertIsNotNone(on_time.delivery_time)
+        self.assertIn(late, truck.contents)
+        self.assertIsNone(late.delivery_time)
+
+
+if __name__ == "__main__":
+    unittest.main()